@@ -1,62 +1,88 @@
-import time
+from functools import partial
+
 import numpy as np
 from generated.proto.python.AprilTag_pb2 import AprilTags, RawAprilTagCorners
 from viz3.render.world import World
 from viz3.render.objects.apriltag import AprilTag
 from viz3.object_pipeline.pipeline import Pipeline
-from ursina import Vec3
+
+# Tags that have not been detected for this many seconds are removed
+TAG_TTL_S = 2
 
 
 @Pipeline.register("apriltag/tag")
 class AprilTagPipeline(Pipeline):
     """Pipeline for processing AprilTag detection data."""
 
-    def __init__(self) -> None:
-        """Initialize the AprilTag pipeline."""
-        super().__init__()
-        self.tags: list[int] = []
-
-    async def process(self, world: World, topic_pub_data: bytes) -> None:
-        """Process AprilTag detection data.
+    @staticmethod
+    def decode(topic_pub_data: bytes) -> list[tuple[int, tuple, np.ndarray]]:
+        """Parse AprilTag detection data off the scene thread.
 
         Args:
-            world: The 3D world instance
             topic_pub_data: The raw message data containing AprilTag information
+
+        Returns:
+            list: The id, position and rotation matrix of every detected tag
         """
-        try:
-            raw_tags = AprilTags.FromString(topic_pub_data)
-            for tag in raw_tags.tags:
-                if tag.tag_id not in self.tags:
-                    self.tags.append(tag.tag_id)
-
-                tag_key = f"tag_{tag.tag_id}"
-                if world.contains_object(tag_key):
-                    tag_entity = world.get_object(tag_key).get_entity()
-                else:
-                    tag_entity = AprilTag(tag.tag_id)
-                    world.add_object(tag_key, tag_entity)
-
-                assert isinstance(tag_entity, AprilTag)
-                tag_entity.set_position((tag.pose_t[0], tag.pose_t[1], tag.pose_t[2]))
-                tag_entity.set_rotation_matrix(np.array(tag.pose_R).reshape(3, 3))
-        except Exception as e:
-            print(f"Error processing AprilTag message: {e}")
-
-    def tick(self, world: World) -> None:
-        """Update the pipeline state and remove outdated tags.
+        raw_tags = AprilTags.FromString(topic_pub_data)
+        return [
+            (
+                tag.tag_id,
+                (tag.pose_t[0], tag.pose_t[1], tag.pose_t[2]),
+                np.array(tag.pose_R).reshape(3, 3),
+            )
+            for tag in raw_tags.tags
+        ]
+
+    async def apply(
+        self, world: World, decoded: list[tuple[int, tuple, np.ndarray]]
+    ) -> None:
+        """Queue updates of the AprilTag entities from decoded detection data.
+
+        Runs on the event loop thread, so entities are only created and
+        changed through queued commands that the render thread applies.
 
         Args:
             world: The 3D world instance
+            decoded: The tags returned by decode
         """
-        tags_to_remove = []
-        for tag_id in self.tags:
+        for tag_id, position, rotation_matrix in decoded:
             tag_key = f"tag_{tag_id}"
-            if world.contains_object(tag_key):
-                tag_entity = world.get_object(tag_key)
-                if time.time() - tag_entity.get_last_update() > 2:
-                    world.remove_object(tag_key)
-            else:
-                tags_to_remove.append(tag_id)
-
-        for tag_id in tags_to_remove:
-            self.tags.remove(tag_id)
+            if not world.contains_object(tag_key):
+                # adds of the same tag queued before the first one is
+                # applied are merged, so this check may be stale
+                world.queue_add_object(
+                    tag_key, partial(acquire_tag, world, tag_id), ttl=TAG_TTL_S
+                )
+            # applying the update also touches the tag, postponing its expiry
+            world.queue_update_object(
+                tag_key, partial(set_tag_pose, position, rotation_matrix), key="pose"
+            )
+
+
+def acquire_tag(world: World, tag_id: int) -> AprilTag:
+    """Get an AprilTag entity from the world's pool; runs on the render thread.
+
+    Expired tags go back to the pool, so a tag that flickers back into view
+    reuses its entity instead of rebuilding it.
+
+    Args:
+        world: The 3D world instance
+        tag_id: The id shown on the tag
+
+    Returns:
+        AprilTag: The new or recycled entity
+    """
+    return world.get_pool(AprilTag).acquire(tag_id=tag_id)
+
+
+def set_tag_pose(position: tuple, rotation_matrix: np.ndarray, tag: AprilTag) -> None:
+    """Move a tag entity; runs on the render thread.
+
+    Args:
+        position: The position of the tag
+        rotation_matrix: The rotation of the tag
+        tag: The tag entity
+    """
+    tag.set_position(position)
+    tag.set_rotation_matrix(rotation_matrix)
@@ -0,0 +1,83 @@
+"""
+Point Cloud Rebuild Benchmark
+
+Compares the time it takes to rebuild a CubePointCloud mesh with the original
+per-point Python loop against the vectorized NumPy builder, in both cube and
+single-vertex point mode, for increasing point counts. No window is opened; only the mesh data is built.
+
+Run with:
+    python examples/benchmark_point_cloud.py
+"""
+
+import time
+import numpy as np
+from ursina import Mesh, color
+from viz3.render.cube_point_cloud import build_point_cloud_mesh
+from viz3.render.custom_lowlevel_rendering import (
+    PointRenderMode,
+    get_cube_point_verts,
+    get_cube_triangles,
+)
+
+POINT_COUNTS = [1_000, 10_000, 100_000]
+POINT_SIZE = 0.01
+
+
+def build_with_python_loop(points: list[tuple[float, float, float]]) -> Mesh:
+    """Build the cube mesh the way CubePointCloud used to, one point at a time.
+
+    Args:
+        points: The point positions
+
+    Returns:
+        Mesh: The generated mesh
+    """
+    vertices = []
+    tris = []
+    colors = []
+    for i, (x, y, z) in enumerate(points):
+        vertices.extend(get_cube_point_verts(x, y, z, POINT_SIZE))
+        tris.extend(get_cube_triangles(i * 8))
+        colors.extend([color.white] * 8)
+
+    return Mesh(vertices=vertices, triangles=tris, colors=colors, mode="triangle")
+
+
+def time_call(function, *args) -> float:
+    """Time a single call of a function.
+
+    Returns:
+        float: Elapsed wall-clock time in milliseconds
+    """
+    start = time.perf_counter()
+    function(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def main() -> None:
+    """Run the benchmark and print a table of rebuild times."""
+    print(
+        f"{'points':>10} {'python loop (ms)':>18} {'vectorized (ms)':>17}"
+        f" {'speedup':>9} {'point mode (ms)':>17}"
+    )
+    for count in POINT_COUNTS:
+        points = np.random.default_rng(0).uniform(-10, 10, (count, 3)).astype(np.float32)
+        loop_ms = time_call(build_with_python_loop, [tuple(p) for p in points])
+        vectorized_ms = time_call(
+            build_point_cloud_mesh, points, POINT_SIZE, color.white
+        )
+        point_mode_ms = time_call(
+            build_point_cloud_mesh,
+            points,
+            POINT_SIZE,
+            color.white,
+            PointRenderMode.POINT,
+        )
+        print(
+            f"{count:>10} {loop_ms:>18.1f} {vectorized_ms:>17.1f}"
+            f" {loop_ms / vectorized_ms:>8.1f}x {point_mode_ms:>17.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
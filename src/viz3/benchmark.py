@@ -0,0 +1,548 @@
+"""Headless pipeline benchmarks.
+
+Runs pipelines against a `World(add_base_objects=False)` in an offscreen
+Ursina app, without a window or a broker, and reports their throughput,
+latency and peak memory. Every message goes through the same steps as in
+viz3: `process` (or `decode` and `apply`), the scene commands it queued,
+`tick` and, unless `--no-render` is given, one rendered frame.
+
+Built-in scenarios use synthetic payloads to cover point-cloud size, tag
+count and image resolution. Plugin pipelines are benchmarked with the
+payloads of a recording made with `--record`.
+
+Run with:
+    python -m viz3.benchmark
+    python -m viz3.benchmark --scenarios image --resolutions 3840x2160
+    python -m viz3.benchmark --plugin-dir plugins --recording recordings/run1
+"""
+
+import argparse
+import asyncio
+import json
+import resource
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+BUILTIN_SCENARIOS = ["point_cloud", "tags", "image"]
+
+
+@dataclass
+class Scenario:
+    """A pipeline and the payloads it is benchmarked with."""
+
+    name: str
+    create_pipeline: Callable[[], "Pipeline"]
+    # (topic, payload) pairs, repeated in order until enough messages were sent
+    payloads: list[tuple[str, bytes]]
+
+
+@dataclass
+class BenchmarkResult:
+    """The measurements of one scenario."""
+
+    name: str
+    messages: int
+    messages_per_s: float
+    p50_ms: float
+    p99_ms: float
+    max_ms: float
+    # peak of the memory allocated through Python, including NumPy arrays
+    peak_memory_mb: float
+
+    def format_row(self) -> str:
+        """Format the result as a row of the results table.
+
+        Returns:
+            str: The row, aligned with `TABLE_HEADER`
+        """
+        return (
+            f"{self.name:<28} {self.messages:>8} {self.messages_per_s:>10.1f}"
+            f" {self.p50_ms:>9.2f} {self.p99_ms:>9.2f} {self.max_ms:>9.2f}"
+            f" {self.peak_memory_mb:>10.1f}"
+        )
+
+
+TABLE_HEADER = (
+    f"{'scenario':<28} {'messages':>8} {'msg/s':>10} {'p50 (ms)':>9}"
+    f" {'p99 (ms)':>9} {'max (ms)':>9} {'peak (MB)':>10}"
+)
+
+
+def start_offscreen_app():
+    """Create the Ursina app with an offscreen buffer instead of a window.
+
+    Returns:
+        Ursina: The app; entities can be created once it exists
+    """
+    from panda3d.core import loadPrcFileData
+    from ursina import Ursina
+
+    loadPrcFileData("", "window-type offscreen\naudio-library-name null")
+    return Ursina(window_type="offscreen", development_mode=False)
+
+
+def _define_pipelines():
+    """Define the built-in benchmark pipelines.
+
+    They need Ursina entities, so they are defined once the app exists. They
+    are not registered, so they never show up next to the plugin pipelines.
+
+    Returns:
+        tuple: The point cloud, tag and camera pipeline classes
+    """
+    from viz3.object_pipeline.camera_pipeline import CameraStreamPipeline
+    from viz3.object_pipeline.pipeline import Pipeline
+    from viz3.render.cube_point_cloud import CubePointCloud
+    from viz3.render.objects.apriltag import AprilTag
+    from viz3.render.world import World
+
+    class PointCloudBenchmarkPipeline(Pipeline):
+        """Replaces a point cloud with every message of float32 XYZ points."""
+
+        @staticmethod
+        def decode(topic_pub_data: bytes) -> np.ndarray:
+            return np.frombuffer(topic_pub_data, dtype=np.float32).reshape(-1, 3)
+
+        async def apply(self, world: World, decoded: np.ndarray) -> None:
+            if not world.contains_object("point_cloud"):
+                world.queue_add_object(
+                    "point_cloud", lambda: CubePointCloud(decoded, point_size=0.02)
+                )
+                return
+
+            def set_points(entity: CubePointCloud) -> None:
+                entity.set_points(decoded)
+
+            world.queue_update_object("point_cloud", set_points, key="points")  # type: ignore
+
+    class TagBenchmarkPipeline(Pipeline):
+        """Moves one AprilTag per row of a float64 (id, t, R) array."""
+
+        @staticmethod
+        def decode(topic_pub_data: bytes) -> np.ndarray:
+            return np.frombuffer(topic_pub_data, dtype=np.float64).reshape(-1, 13)
+
+        async def apply(self, world: World, decoded: np.ndarray) -> None:
+            for row in decoded:
+                tag_key = f"tag_{int(row[0])}"
+                if world.contains_object(tag_key):
+                    tag_entity = world.get_object(tag_key).get_entity()
+                    world.touch_object(tag_key)
+                else:
+                    tag_entity = AprilTag(int(row[0]), size=0.2)
+                    world.add_object(tag_key, tag_entity)
+
+                assert isinstance(tag_entity, AprilTag)
+                tag_entity.set_position(tuple(row[1:4]))
+                tag_entity.set_rotation_matrix(row[4:].reshape(3, 3))
+
+    class ImageBenchmarkPipeline(CameraStreamPipeline):
+        report_interval_s = None
+
+    return PointCloudBenchmarkPipeline, TagBenchmarkPipeline, ImageBenchmarkPipeline
+
+
+def point_cloud_payloads(num_points: int, variants: int = 4) -> list[bytes]:
+    """Generate point clouds of random points.
+
+    Args:
+        num_points: The number of points of every cloud
+        variants: How many different clouds to generate
+
+    Returns:
+        list[bytes]: The clouds as float32 XYZ rows
+    """
+    rng = np.random.default_rng(0)
+    return [
+        rng.uniform(-5, 5, (num_points, 3)).astype(np.float32).tobytes()
+        for _ in range(variants)
+    ]
+
+
+def tag_payloads(num_tags: int, variants: int = 4) -> list[bytes]:
+    """Generate tag detections of tags in random poses.
+
+    Args:
+        num_tags: The number of tags in every detection
+        variants: How many different detections to generate
+
+    Returns:
+        list[bytes]: The detections as float64 (id, t, R) rows
+    """
+    from viz3.pose import euler_to_rotation_matrices
+
+    rng = np.random.default_rng(0)
+    payloads = []
+    for _ in range(variants):
+        rows = np.empty((num_tags, 13), dtype=np.float64)
+        rows[:, 0] = np.arange(num_tags)
+        rows[:, 1:4] = rng.uniform(-5, 5, (num_tags, 3))
+        rows[:, 4:] = euler_to_rotation_matrices(
+            rng.uniform(-180, 180, (num_tags, 3))
+        ).reshape(-1, 9)
+        payloads.append(rows.tobytes())
+    return payloads
+
+
+def image_payloads(width: int, height: int, variants: int = 4) -> list[bytes]:
+    """Generate JPEG frames of a moving gradient with noise.
+
+    Args:
+        width: The frame width in pixels
+        height: The frame height in pixels
+        variants: How many different frames to generate
+
+    Returns:
+        list[bytes]: The JPEG encoded frames
+    """
+    import cv2
+
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, np.newaxis]
+    payloads = []
+    for variant in range(variants):
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        frame[..., 0] = (x + variant * 32) % 256
+        frame[..., 1] = y
+        frame[..., 2] = (x + y) / 2
+        frame = cv2.add(frame, rng.integers(0, 24, frame.shape, dtype=np.uint8))
+        ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        if not ok:
+            raise RuntimeError("failed to encode a benchmark frame")
+        payloads.append(encoded.tobytes())
+    return payloads
+
+
+def _parse_resolution(resolution: str) -> tuple[int, int]:
+    width, _, height = resolution.lower().partition("x")
+    return int(width), int(height)
+
+
+def builtin_scenarios(args: argparse.Namespace) -> list[Scenario]:
+    """Create the selected built-in scenarios.
+
+    Args:
+        args: The parsed command line arguments
+
+    Returns:
+        list[Scenario]: One scenario per point count, tag count and resolution
+    """
+    point_cloud_pipeline, tag_pipeline, image_pipeline = _define_pipelines()
+    scenarios = []
+    if "point_cloud" in args.scenarios:
+        for num_points in args.point_counts:
+            scenarios.append(
+                Scenario(
+                    f"point_cloud/{num_points}",
+                    point_cloud_pipeline,
+                    [("benchmark/points", p) for p in point_cloud_payloads(num_points)],
+                )
+            )
+    if "tags" in args.scenarios:
+        for num_tags in args.tag_counts:
+            scenarios.append(
+                Scenario(
+                    f"tags/{num_tags}",
+                    tag_pipeline,
+                    [("benchmark/tags", p) for p in tag_payloads(num_tags)],
+                )
+            )
+    if "image" in args.scenarios:
+        for resolution in args.resolutions:
+            width, height = _parse_resolution(resolution)
+            scenarios.append(
+                Scenario(
+                    f"image/{width}x{height}",
+                    image_pipeline,
+                    [("benchmark/image", p) for p in image_payloads(width, height)],
+                )
+            )
+    return scenarios
+
+
+def recorded_scenarios(
+    recording_directory: str, pipeline_names: list[str] | None = None
+) -> list[Scenario]:
+    """Create a scenario for every registered pipeline with recorded traffic.
+
+    Args:
+        recording_directory: A recording made with `--record`
+        pipeline_names: Only benchmark pipelines with these class names
+
+    Returns:
+        list[Scenario]: The scenarios, with the recorded payloads in order
+    """
+    from viz3.object_pipeline.pipeline import Pipeline
+    from viz3.recording import Recording
+
+    recording = Recording(recording_directory)
+    records = [(topic, payload) for _, topic, payload in recording.records()]
+    recording.close()
+    recorded_topics = {topic for topic, _ in records}
+
+    scenarios = []
+    for topic_options, options in Pipeline.get_registry().items():
+        pipeline_type = options.pipeline_type
+        if pipeline_names and pipeline_type.__name__ not in pipeline_names:
+            continue
+        topics = set(topic_options.get_topics())
+        if not topics & recorded_topics:
+            continue
+
+        # keep the recorded interleaving of the pipeline's topics
+        payloads = [(topic, payload) for topic, payload in records if topic in topics]
+        scenarios.append(Scenario(pipeline_type.__name__, pipeline_type, payloads))
+    return scenarios
+
+
+async def _run_message(pipeline, world, payload: bytes, app) -> None:
+    await pipeline.process(world, payload)
+    while world.pending_command_count():
+        world.process_commands()
+    pipeline.tick(world)
+    if app is not None:
+        app.step()
+    else:
+        from viz3.render.deferred_rebuild import flush_deferred_rebuilds
+
+        flush_deferred_rebuilds()
+
+
+def _is_shown(entity) -> bool:
+    """Check if an entity and all of its parents are enabled."""
+    while entity is not None:
+        if not getattr(entity, "enabled", True):
+            return False
+        entity = getattr(entity, "parent", None)
+    return True
+
+
+async def run_scenario(
+    scenario: Scenario,
+    world,
+    app=None,
+    messages: int = 100,
+    warmup: int = 5,
+    memory_messages: int = 10,
+) -> BenchmarkResult:
+    """Benchmark a scenario.
+
+    Latency is measured from the start of `process` until the message's
+    scene commands are applied, `tick` returned and, with an app, a frame
+    was rendered. Memory is measured in a separate pass with tracemalloc,
+    so its overhead does not distort the timings.
+
+    Args:
+        scenario: The scenario to run
+        world: The world the pipeline draws into; cleared afterwards
+        app: The Ursina app to render a frame with after every message, or
+            None to skip rendering
+        messages: How many messages to time
+        warmup: How many messages to process before timing, so objects are
+            created and caches are warm
+        memory_messages: How many messages to process while tracing memory
+
+    Returns:
+        BenchmarkResult: The measurements
+    """
+    if not scenario.payloads:
+        raise ValueError(f"scenario {scenario.name} has no payloads")
+    from ursina import scene
+
+    pipeline = scenario.create_pipeline()
+    payloads = scenario.payloads
+    entities_before = {id(entity) for entity in scene.entities}
+
+    for i in range(warmup):
+        await _run_message(pipeline, world, payloads[i % len(payloads)][1], app)
+
+    latencies = np.empty(messages, dtype=np.float64)
+    start = time.perf_counter()
+    for i in range(messages):
+        message_start = time.perf_counter()
+        await _run_message(pipeline, world, payloads[i % len(payloads)][1], app)
+        latencies[i] = time.perf_counter() - message_start
+    duration = time.perf_counter() - start
+
+    tracemalloc.start()
+    for i in range(memory_messages):
+        await _run_message(pipeline, world, payloads[i % len(payloads)][1], app)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    world.clear_objects()
+    if app is not None:
+        app.step()
+    # the next scenario must not render or update what this one created;
+    # only entities kept disabled by a pool may remain
+    left_over = [
+        entity
+        for entity in scene.entities
+        if id(entity) not in entities_before and _is_shown(entity)
+    ]
+    assert not world.objects and not left_over, (
+        f"scenario {scenario.name} left {len(world.objects)} objects and "
+        f"{len(left_over)} entities in the scene"
+    )
+
+    latencies_ms = latencies * 1000
+    return BenchmarkResult(
+        name=scenario.name,
+        messages=messages,
+        messages_per_s=messages / duration if duration > 0 else float("inf"),
+        p50_ms=float(np.percentile(latencies_ms, 50)) if messages else 0.0,
+        p99_ms=float(np.percentile(latencies_ms, 99)) if messages else 0.0,
+        max_ms=float(latencies_ms.max()) if messages else 0.0,
+        peak_memory_mb=peak_memory / 1024**2,
+    )
+
+
+def peak_rss_mb() -> float:
+    """Get the peak resident set size of this process.
+
+    Returns:
+        float: The high-water mark in MB, including memory allocated by
+            Panda3D and other native code
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """Parse the benchmark's command line arguments.
+
+    Args:
+        argv: The arguments; sys.argv when None
+
+    Returns:
+        argparse.Namespace: The parsed arguments
+    """
+    parser = argparse.ArgumentParser(prog="python -m viz3.benchmark")
+    parser.add_argument(
+        "--scenarios",
+        nargs="*",
+        choices=BUILTIN_SCENARIOS,
+        default=BUILTIN_SCENARIOS,
+        help="Built-in scenarios to run; pass none to run only recorded ones",
+    )
+    parser.add_argument(
+        "--point_counts", type=int, nargs="+", default=[1_000, 10_000, 100_000]
+    )
+    parser.add_argument("--tag_counts", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument(
+        "--resolutions",
+        nargs="+",
+        default=["640x480", "1280x720", "1920x1080"],
+        help="Image resolutions as WIDTHxHEIGHT",
+    )
+    parser.add_argument(
+        "--recording",
+        help="Benchmark the plugin pipelines with the payloads of this recording",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="append",
+        dest="pipeline_names",
+        help="Only benchmark recorded pipelines with this class name"
+        " (can be used multiple times)",
+    )
+    parser.add_argument(
+        "--plugin-dir",
+        action="append",
+        dest="plugin_directories",
+        help="Add a plugin directory (can be used multiple times)",
+    )
+    parser.add_argument(
+        "--plugin-exclude",
+        action="append",
+        dest="plugin_exclude_files",
+        default=["__init__.py"],
+        help="Files to exclude from plugin loading",
+    )
+    parser.add_argument("--messages", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument(
+        "--memory_messages",
+        type=int,
+        default=10,
+        help="Messages processed while tracing memory, after the timed ones",
+    )
+    parser.add_argument(
+        "--no-render",
+        action="store_true",
+        dest="no_render",
+        help="Do not render a frame after every message",
+    )
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    return parser.parse_args(argv)
+
+
+async def run(args: argparse.Namespace) -> list[BenchmarkResult]:
+    """Run the benchmarks selected by the command line arguments.
+
+    Args:
+        args: The parsed command line arguments
+
+    Returns:
+        list[BenchmarkResult]: The result of every scenario
+    """
+    from viz3.object_pipeline.plugin_manager import Directory, PluginManager
+    from viz3.render.world import World
+
+    app = start_offscreen_app()
+    plugin_manager = PluginManager(
+        [
+            Directory(
+                path=Path(plugin_directory),
+                exclude_files=args.plugin_exclude_files or ["__init__.py"],
+            )
+            for plugin_directory in args.plugin_directories or []
+        ]
+    )
+    plugin_manager.load_plugins()
+
+    scenarios = builtin_scenarios(args)
+    if args.recording is not None:
+        scenarios += recorded_scenarios(args.recording, args.pipeline_names)
+    if not scenarios:
+        print("No scenarios to run")
+        return []
+
+    world = World(add_base_objects=False)
+    print(TABLE_HEADER)
+    results = []
+    for scenario in scenarios:
+        result = await run_scenario(
+            scenario,
+            world,
+            None if args.no_render else app,
+            args.messages,
+            args.warmup,
+            args.memory_messages,
+        )
+        print(result.format_row())
+        results.append(result)
+    print(f"Peak RSS of the benchmark process: {peak_rss_mb():.1f} MB")
+    return results
+
+
+def main() -> None:
+    """Run the benchmarks and optionally write the results to JSON."""
+    args = parse_args()
+    results = asyncio.run(run(args))
+    if args.json is not None:
+        with open(args.json, "w") as json_file:
+            json.dump([asdict(result) for result in results], json_file, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
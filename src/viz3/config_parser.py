@@ -38,6 +38,93 @@ def parse_args(additional_args: list[str] = []):
         help="Index of the window (used for positioning multiple windows)",
     )
 
+    parser.add_argument(
+        "--no_prefork",
+        action="store_true",
+        help="Start every window as a new process instead of forking the windows"
+        " from a process that imported the dependencies and loaded the plugins"
+        " once; forking is only used on Linux",
+    )
+
+    parser.add_argument(
+        "--max_restarts",
+        type=int,
+        default=5,
+        help="How many crashes in a row a window is restarted after",
+    )
+    parser.add_argument(
+        "--restart_backoff_s",
+        type=float,
+        default=1.0,
+        help="Seconds before restarting a crashed window; doubles with every"
+        " crash in a row, up to 60",
+    )
+    parser.add_argument(
+        "--telemetry_interval_s",
+        type=float,
+        default=10.0,
+        help="Seconds between samples of every window's CPU, memory and frame"
+        " rate; 0 disables them",
+    )
+    parser.add_argument(
+        "--telemetry_log",
+        type=str,
+        default=None,
+        help="Append the window samples to this file as JSON lines instead of"
+        " printing them as a table",
+    )
+    parser.add_argument(
+        "--telemetry_fd",
+        type=int,
+        default=None,
+        help="File descriptor to report telemetry to the supervisor on; set by"
+        " viz3.main",
+    )
+
+    parser.add_argument(
+        "--decode_threads",
+        type=int,
+        default=4,
+        help="Worker threads for pipeline decode stages",
+    )
+    parser.add_argument(
+        "--decode_processes",
+        type=int,
+        default=2,
+        help="Worker processes for pipeline decode stages that ask for a process pool",
+    )
+
+    parser.add_argument(
+        "--hub",
+        action="store_true",
+        help="Subscribe and decode once in a data hub process shared by all windows",
+    )
+    parser.add_argument(
+        "--hub_address",
+        type=str,
+        default=None,
+        help="Address of the data hub; set by viz3.main in hub mode",
+    )
+
+    parser.add_argument(
+        "--record",
+        type=str,
+        default=None,
+        help="Record all received topic traffic to this directory",
+    )
+    parser.add_argument(
+        "--replay",
+        type=str,
+        default=None,
+        help="Replay a recording instead of connecting to the server",
+    )
+    parser.add_argument(
+        "--replay_speed",
+        type=float,
+        default=1.0,
+        help="Replay speed multiplier; 0 replays as fast as possible",
+    )
+
     parser.add_argument("--host", type=str, default="localhost")
     parser.add_argument("--port", type=int, default=8080)
 
@@ -54,6 +141,53 @@ def parse_args(additional_args: list[str] = []):
         default=["__init__.py"],
         help="Files to exclude from plugin loading",
     )
+    parser.add_argument(
+        "--plugin-manifest",
+        type=str,
+        default=None,
+        dest="plugin_manifest",
+        help="Cache of the topics and windows of every plugin's pipelines,"
+        " used to skip plugins a window does not show;"
+        " default ~/.cache/viz3/plugin_manifest.json",
+    )
+    parser.add_argument(
+        "--no-plugin-manifest",
+        action="store_true",
+        dest="no_plugin_manifest",
+        help="Load every plugin without reading or writing the plugin manifest",
+    )
+
+    parser.add_argument(
+        "--cull_offscreen_updates",
+        action="store_true",
+        help="Skip the per-frame update of world objects outside the camera view",
+    )
+
+    parser.add_argument(
+        "--metrics_hud",
+        action="store_true",
+        help="Show the metrics overlay on start; F3 toggles it either way",
+    )
+    parser.add_argument(
+        "--metrics_file",
+        type=str,
+        default=None,
+        help="Write metrics to this file periodically; Prometheus text if it ends"
+        " in .prom, JSON otherwise. Windows after the first add their number",
+    )
+    parser.add_argument(
+        "--metrics_port",
+        type=int,
+        default=None,
+        help="Serve metrics on this localhost port at /metrics and /metrics.json;"
+        " windows after the first use the following ports",
+    )
+    parser.add_argument(
+        "--metrics_interval_s",
+        type=float,
+        default=5.0,
+        help="Seconds between metrics file writes",
+    )
 
     if additional_args:
         for arg in additional_args:
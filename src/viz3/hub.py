@@ -0,0 +1,622 @@
+"""Single-subscriber data hub shared by all windows.
+
+Without the hub, every window process subscribes to every topic and decodes
+every message itself, so N windows cost N times the network traffic and
+decode work. In hub mode one extra process subscribes once, runs each
+pipeline's decode stage once, and fans the results out to the windows over
+local IPC:
+
+- control frames go over a `multiprocessing.connection` socket (a Unix
+  socket, or a named pipe on Windows)
+- bulk buffers, such as the numpy arrays inside decoded messages, are
+  placed in shared memory and only their names are sent
+- decoded messages that are a single large array, typically camera frames,
+  are written to a FrameRing per pipeline and topic, which the windows map
+  and read without copying; a frame is checked when it is applied and when
+  its texture is uploaded, so one the hub overwrote in the meantime is
+  dropped or replaced by the newest frame
+
+Pipelines without a decode stage receive the raw message bytes instead.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import pickle
+import queue
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from multiprocessing import resource_tracker
+from multiprocessing.connection import Client, Connection, Listener
+from multiprocessing.shared_memory import SharedMemory
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Type
+
+import numpy as np
+
+from viz3.object_pipeline.delivery import DecodeExecutor
+from viz3.shared_frames import FrameRing, RingFrame
+
+if TYPE_CHECKING:
+    from viz3.object_pipeline.pipeline import Pipeline
+    from viz3.recording import Recorder
+
+HUB_AUTHKEY = b"viz3-hub"
+# buffers at least this large go through shared memory instead of the socket
+SHARED_MEMORY_THRESHOLD = 64 * 1024
+
+
+def default_hub_address() -> str:
+    """Get a hub address that is unique to this process.
+
+    Returns:
+        str: A Unix socket path, or a named pipe on Windows
+    """
+    if sys.platform == "win32":
+        return rf"\\.\pipe\viz3-hub-{os.getpid()}"
+    return os.path.join(tempfile.gettempdir(), f"viz3-hub-{os.getpid()}.sock")
+
+
+def pipeline_key(pipeline_type: Type["Pipeline"]) -> str:
+    """Get the name a pipeline is routed by; the same in every process.
+
+    Args:
+        pipeline_type: The pipeline class
+
+    Returns:
+        str: The module and qualified name of the class
+    """
+    return f"{pipeline_type.__module__}.{pipeline_type.__qualname__}"
+
+
+@dataclass
+class SharedBuffer:
+    """Reference to a buffer the hub placed in shared memory."""
+
+    name: str
+    nbytes: int
+
+
+@dataclass
+class FrameRef:
+    """Reference to a frame the hub wrote to a FrameRing."""
+
+    ring_name: str
+    sequence: int
+
+
+class SharedBufferPool:
+    """Shared memory segments published by the hub.
+
+    Segments stay alive until `max_segments` newer ones were published, which
+    gives every window that long to copy them out. A window that falls further
+    behind than that drops the message.
+    """
+
+    def __init__(self, max_segments: int = 64) -> None:
+        """Initialize the pool.
+
+        Args:
+            max_segments: How many published segments are kept alive
+        """
+        self.max_segments = max_segments
+        self._segments: deque[SharedMemory] = deque()
+
+    def publish(self, data: memoryview) -> SharedBuffer:
+        """Copy a buffer into a new shared memory segment.
+
+        Args:
+            data: The buffer to publish
+
+        Returns:
+            SharedBuffer: The reference to send to the windows
+        """
+        segment = SharedMemory(create=True, size=max(data.nbytes, 1))
+        segment.buf[: data.nbytes] = data.cast("B")
+        self._segments.append(segment)
+        while len(self._segments) > self.max_segments:
+            self._release(self._segments.popleft())
+        return SharedBuffer(segment.name, data.nbytes)
+
+    def close(self) -> None:
+        """Release every segment."""
+        while self._segments:
+            self._release(self._segments.popleft())
+
+    def _release(self, segment: SharedMemory) -> None:
+        segment.close()
+        try:
+            segment.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def encode_payload(
+    payload: Any, pool: SharedBufferPool
+) -> tuple[bytes, list[bytes | SharedBuffer]]:
+    """Pickle a payload, moving its large buffers into shared memory.
+
+    Args:
+        payload: Any picklable object; numpy arrays are stored out of band
+        pool: The pool large buffers are published to
+
+    Returns:
+        tuple: The pickled payload and its out-of-band buffers
+    """
+    buffers: list[pickle.PickleBuffer] = []
+    body = pickle.dumps(payload, protocol=5, buffer_callback=buffers.append)
+    refs: list[bytes | SharedBuffer] = []
+    for buffer in buffers:
+        raw = buffer.raw()
+        if raw.nbytes >= SHARED_MEMORY_THRESHOLD:
+            refs.append(pool.publish(raw))
+        else:
+            refs.append(raw.tobytes())
+    return body, refs
+
+
+def attach_shared_memory(name: str) -> SharedMemory:
+    """Open a shared memory segment created by another process.
+
+    Args:
+        name: The name of the segment
+
+    Returns:
+        SharedMemory: The segment
+    """
+    segment = SharedMemory(name=name)
+    # the creating process owns the segment; without this the resource
+    # tracker of this process would unlink it when this process exits
+    resource_tracker.unregister(segment._name, "shared_memory")  # type: ignore
+    return segment
+
+
+def decode_payload(body: bytes, refs: list[bytes | SharedBuffer]) -> Any:
+    """Unpickle a payload encoded by `encode_payload`.
+
+    Args:
+        body: The pickled payload
+        refs: Its out-of-band buffers
+
+    Returns:
+        Any: The payload; its arrays own copies of the shared memory
+
+    Raises:
+        FileNotFoundError: If a shared buffer was already released by the hub
+    """
+    buffers: list[bytes | bytearray] = []
+    for ref in refs:
+        if isinstance(ref, SharedBuffer):
+            segment = attach_shared_memory(ref.name)
+            try:
+                buffers.append(bytearray(segment.buf[: ref.nbytes]))
+            finally:
+                segment.close()
+        else:
+            buffers.append(ref)
+    return pickle.loads(body, buffers=buffers)
+
+
+class LocalBroker:
+    """In-process stand-in for the Autobahn client.
+
+    Has the same `subscribe` call as Autobahn, so the hub can be run and
+    tested on one machine without a server.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the broker without subscribers."""
+        self._subscribers: dict[str, list[Callable[[bytes], Awaitable[None]]]] = (
+            defaultdict(list)
+        )
+
+    async def subscribe(
+        self, topic: str, callback: Callable[[bytes], Awaitable[None]]
+    ) -> None:
+        """Subscribe to a topic.
+
+        Args:
+            topic: The topic to subscribe to
+            callback: Called with every message published to the topic
+        """
+        self._subscribers[topic].append(callback)
+
+    async def publish(self, topic: str, message: bytes) -> None:
+        """Deliver a message to every subscriber of a topic.
+
+        Args:
+            topic: The topic to publish to
+            message: The raw message
+        """
+        for callback in self._subscribers[topic]:
+            await callback(message)
+
+
+class HubConnection:
+    """A window connected to the hub.
+
+    Frames are sent from a dedicated thread through a bounded queue, so a
+    window that stops reading only loses its own oldest frames and never
+    stalls the hub or the other windows.
+    """
+
+    def __init__(self, connection: Connection, keys: set[str], queue_size: int):
+        """Initialize the connection and start its sender thread.
+
+        Args:
+            connection: The accepted connection
+            keys: The keys of the pipelines the window runs
+            queue_size: How many frames may wait to be sent
+        """
+        self.connection = connection
+        self.keys = keys
+        self.dropped = 0
+        self.closed = False
+        self._frames: queue.Queue[bytes] = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._send_frames, daemon=True)
+        self._thread.start()
+
+    def send(self, frame: bytes) -> None:
+        """Queue a frame, dropping the oldest one if the window is behind.
+
+        Args:
+            frame: The frame to send
+        """
+        while True:
+            try:
+                self._frames.put_nowait(frame)
+                return
+            except queue.Full:
+                try:
+                    self._frames.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def _send_frames(self) -> None:
+        try:
+            while True:
+                self.connection.send_bytes(self._frames.get())
+        except (OSError, EOFError):
+            self.closed = True
+            self.connection.close()
+
+
+class DataHub:
+    """Subscribes to every registered topic once and fans messages out to windows."""
+
+    def __init__(
+        self,
+        address: str,
+        decode_threads: int = 4,
+        decode_processes: int = 2,
+        process_initializer: Callable[[], None] | None = None,
+        max_shared_segments: int = 64,
+        client_queue_size: int = 64,
+        frame_ring_slots: int = 8,
+    ) -> None:
+        """Initialize the hub.
+
+        Args:
+            address: The address windows connect to
+            decode_threads: Worker threads for decode stages
+            decode_processes: Worker processes for decode stages that ask for them
+            process_initializer: Run in every decode worker process, typically
+                to load the plugins; must be picklable, since the workers are
+                spawned
+            max_shared_segments: How many shared memory segments are kept alive
+            client_queue_size: How many frames may wait for each window
+            frame_ring_slots: How many array frames of each pipeline and topic
+                stay readable; windows drop frames they get to later than that
+        """
+        self.address = address
+        self.decode_threads = decode_threads
+        self.decode_processes = decode_processes
+        self.process_initializer = process_initializer
+        self.client_queue_size = client_queue_size
+        self.shared_buffers = SharedBufferPool(max_shared_segments)
+        self.frame_ring_slots = frame_ring_slots
+        self.frame_rings: dict[tuple[str, str], FrameRing] = {}
+        self.connections: list[HubConnection] = []
+
+        self._listener: Listener | None = None
+        self._connections_lock = threading.Lock()
+        self._thread_pool: ThreadPoolExecutor | None = None
+        self._process_pool: ProcessPoolExecutor | None = None
+
+    def start(self) -> None:
+        """Start listening for windows."""
+        if sys.platform != "win32" and os.path.exists(self.address):
+            os.unlink(self.address)
+        self._listener = Listener(self.address, authkey=HUB_AUTHKEY)
+        threading.Thread(target=self._accept_connections, daemon=True).start()
+
+    def close(self) -> None:
+        """Stop listening and release the shared memory."""
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+        with self._connections_lock:
+            for connection in self.connections:
+                connection.connection.close()
+            self.connections.clear()
+        self.shared_buffers.close()
+        for ring in self.frame_rings.values():
+            ring.close()
+        self.frame_rings.clear()
+        for pool in (self._thread_pool, self._process_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+
+    def _accept_connections(self) -> None:
+        while self._listener is not None:
+            try:
+                connection = self._listener.accept()
+                # the window starts by sending the keys of its pipelines
+                keys = set(connection.recv())
+            except (OSError, EOFError):
+                continue
+            with self._connections_lock:
+                self.connections.append(
+                    HubConnection(connection, keys, self.client_queue_size)
+                )
+            print(f"Window connected to hub with {len(keys)} pipelines")
+
+    def _get_executor(self, pipeline_type: Type["Pipeline"]) -> Executor:
+        options = next(
+            options
+            for options in pipeline_type.get_registry().values()
+            if options.pipeline_type is pipeline_type
+        )
+        if options.decode_executor == DecodeExecutor.PROCESS:
+            if self._process_pool is None:
+                # spawned, since the hub's threads would not survive a fork
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self.decode_processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=self.process_initializer,
+                )
+            return self._process_pool
+
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(
+                max_workers=self.decode_threads, thread_name_prefix="viz3-hub-decode"
+            )
+        return self._thread_pool
+
+    async def subscribe(self, broker: Any, recorder: "Recorder | None" = None) -> None:
+        """Subscribe to the topics of every registered pipeline.
+
+        Args:
+            broker: An Autobahn client, a LocalBroker or a Replayer
+            recorder: Records every received message when given
+        """
+        from viz3.object_pipeline.pipeline import Pipeline
+
+        pipelines_by_topic: dict[str, list[Type[Pipeline]]] = defaultdict(list)
+        for topic_options, options in Pipeline.get_registry().items():
+            for topic in topic_options.get_topics():
+                pipelines_by_topic[topic].append(options.pipeline_type)
+
+        for topic, pipeline_types in pipelines_by_topic.items():
+            callback = self._callback(topic, pipeline_types)
+            if recorder is not None:
+                callback = recorder.callback(topic, callback)
+            await broker.subscribe(topic, callback)
+
+    def _callback(
+        self, topic: str, pipeline_types: list[Type["Pipeline"]]
+    ) -> Callable[[bytes], Awaitable[None]]:
+        async def callback(message: bytes) -> None:
+            loop = asyncio.get_running_loop()
+            for pipeline_type in pipeline_types:
+                key = pipeline_key(pipeline_type)
+                if not self._has_subscribers(key):
+                    continue
+
+                if not pipeline_type.has_decode_stage():
+                    self.publish(key, topic, message, decoded=False)
+                    continue
+
+                try:
+                    decoded = await loop.run_in_executor(
+                        self._get_executor(pipeline_type),
+                        pipeline_type.decode,
+                        message,
+                    )
+                except Exception as e:
+                    print(f"Error in {pipeline_type.__name__}.decode: {e}")
+                    continue
+                self.publish(key, topic, decoded, decoded=True)
+
+        return callback
+
+    def _has_subscribers(self, key: str) -> bool:
+        with self._connections_lock:
+            return any(key in connection.keys for connection in self.connections)
+
+    def publish(self, key: str, topic: str, payload: Any, decoded: bool) -> None:
+        """Send a message to every window that runs a pipeline.
+
+        Args:
+            key: The pipeline key, see `pipeline_key`
+            topic: The topic the message was received on
+            payload: The raw message, or the output of the decode stage
+            decoded: Whether the payload is the output of the decode stage
+        """
+        with self._connections_lock:
+            self.connections = [c for c in self.connections if not c.closed]
+            targets = [c for c in self.connections if key in c.keys]
+        if not targets:
+            return
+
+        # encoded once, however many windows receive it
+        if (
+            isinstance(payload, np.ndarray)
+            and payload.nbytes >= SHARED_MEMORY_THRESHOLD
+        ):
+            sequence = self._frame_ring(key, topic, payload).write(payload)
+            body, refs = None, [FrameRef(self.frame_rings[key, topic].name, sequence)]
+        else:
+            body, refs = encode_payload(payload, self.shared_buffers)
+        frame = pickle.dumps((key, topic, decoded, body, refs), protocol=5)
+        for connection in targets:
+            connection.send(frame)
+
+    def _frame_ring(self, key: str, topic: str, frame: np.ndarray) -> FrameRing:
+        ring = self.frame_rings.get((key, topic))
+        if ring is not None and ring.fits(frame):
+            return ring
+        if ring is not None:
+            # the windows keep their mapping of the old ring until they see
+            # a frame of the new one
+            ring.close()
+        ring = FrameRing.create(frame.shape, frame.dtype, self.frame_ring_slots)
+        self.frame_rings[key, topic] = ring
+        return ring
+
+
+class HubClient:
+    """A window's connection to the data hub."""
+
+    def __init__(self, address: str) -> None:
+        """Initialize the client.
+
+        Args:
+            address: The address of the hub
+        """
+        self.address = address
+        # messages whose shared memory was released or overwritten before
+        # they were read
+        self.dropped = 0
+        self._connection: Connection | None = None
+        # the frame ring currently used by each pipeline and topic
+        self._frame_rings: dict[tuple[str, str], FrameRing] = {}
+
+    def connect(self, keys: list[str], timeout_s: float = 10.0) -> None:
+        """Connect to the hub, waiting for it to start.
+
+        Args:
+            keys: The keys of the pipelines this window runs
+            timeout_s: How long to wait for the hub
+
+        Raises:
+            ConnectionError: If the hub did not accept the connection in time
+        """
+        deadline = time.monotonic() + timeout_s
+        while True:
+            try:
+                self._connection = Client(self.address, authkey=HUB_AUTHKEY)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                if time.monotonic() > deadline:
+                    raise ConnectionError(f"No data hub at {self.address}")
+                time.sleep(0.05)
+        self._connection.send(keys)
+
+    def start(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        deliver: Callable[[str, str, Any, bool], None],
+    ) -> None:
+        """Receive messages on a background thread.
+
+        Args:
+            loop: The event loop `deliver` is called on
+            deliver: Called with the pipeline key, topic, payload and whether
+                the payload was decoded
+        """
+        threading.Thread(
+            target=self._receive, args=(loop, deliver), daemon=True
+        ).start()
+
+    def _receive(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        deliver: Callable[[str, str, Any, bool], None],
+    ) -> None:
+        assert self._connection is not None
+        while True:
+            try:
+                frame = self._connection.recv_bytes()
+            except (OSError, EOFError):
+                print("Data hub disconnected")
+                return
+
+            key, topic, decoded, body, refs = pickle.loads(frame)
+            try:
+                if body is None:
+                    payload = self._read_frame(key, topic, refs[0])
+                else:
+                    payload = decode_payload(body, refs)
+            except FileNotFoundError:
+                payload = None
+            if payload is None:
+                self.dropped += 1
+                continue
+            loop.call_soon_threadsafe(deliver, key, topic, payload, decoded)
+
+    def _read_frame(self, key: str, topic: str, ref: FrameRef) -> RingFrame | None:
+        ring = self._frame_rings.get((key, topic))
+        if ring is None or ring.name != ref.ring_name:
+            if ring is not None:
+                ring.close()
+            ring = FrameRing.attach(ref.ring_name)
+            self._frame_rings[key, topic] = ring
+        # a view, only valid until the hub wraps around to its slot; the
+        # delivery and the texture upload check that it is still intact
+        return ring.read(ref.sequence)
+
+
+async def main() -> None:
+    """Run the hub process started by `viz3.main` in hub mode."""
+    from autobahn_client.client import Autobahn
+    from autobahn_client.util import Address
+    from viz3.config_parser import parse_args
+    from viz3.object_pipeline.plugin_manager import plugin_manager_from_args
+    from viz3.recording import Recorder, Recording, Replayer
+
+    args = parse_args()
+    # the hub serves every window, so it loads every plugin
+    plugin_manager = plugin_manager_from_args(args)
+    plugin_manager.load_plugins()
+
+    hub = DataHub(
+        args.hub_address,
+        args.decode_threads,
+        args.decode_processes,
+        process_initializer=partial(plugin_manager.load_plugins, save_manifest=False),
+    )
+    hub.start()
+    print(f"Data hub listening on {args.hub_address}")
+
+    recorder = None
+    if args.record is not None:
+        recorder = Recorder(args.record)
+        print(f"Recording topic traffic to {args.record}")
+
+    if args.replay is not None:
+        replayer = Replayer(Recording(args.replay), args.replay_speed or None)
+        await hub.subscribe(replayer, recorder)
+        print(f"Replaying {args.replay} at speed {args.replay_speed or 'max'}")
+        asyncio.get_running_loop().create_task(replayer.run())
+    else:
+        autobahn_server = Autobahn(Address(args.host, args.port))
+        await autobahn_server.begin()
+        await hub.subscribe(autobahn_server, recorder)
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        hub.close()
+        if recorder is not None:
+            recorder.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
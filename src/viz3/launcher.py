@@ -0,0 +1,190 @@
+"""Pre-forked window launcher for multi-window mode.
+
+Starting every window as a new interpreter repeats the interpreter startup,
+the numpy, Panda3D and Ursina imports and the plugin loading once per
+window. `WindowLauncher` does all of that once, in the launching process,
+and then forks a child per window. The fork happens before any graphics
+context exists; each child only parses its own window settings, such as
+its index, position and window filter, and opens its window.
+
+Forking needs a process without threads or graphics state, so the
+launcher is only used on Linux. Elsewhere, and with `--no_prefork`,
+windows are started as new processes.
+"""
+
+import multiprocessing
+import os
+import sys
+import time
+
+from viz3.config_parser import parse_args
+from viz3.metrics import StartupTimer
+
+
+def window_arguments(
+    window_index: int,
+    hub_address: str | None = None,
+    telemetry_fd: int | None = None,
+) -> list[str]:
+    """Get the command line arguments of a window process.
+
+    Args:
+        window_index: Index of the window for positioning
+        hub_address: The address of the data hub, when running in hub mode
+        telemetry_fd: The file descriptor the window reports its telemetry
+            to the supervisor on, or None
+
+    Returns:
+        list[str]: The launcher's arguments with the window's settings added
+    """
+    arguments = sys.argv[1:] + [
+        f"--window-number={window_index}",
+        f"--window_index={window_index}",
+    ]
+    if hub_address is not None:
+        arguments.append(f"--hub_address={hub_address}")
+    if telemetry_fd is not None:
+        arguments.append(f"--telemetry_fd={telemetry_fd}")
+    return arguments
+
+
+def can_prefork() -> bool:
+    """Check if windows can be forked from a launcher on this platform.
+
+    Returns:
+        bool: True on Linux
+    """
+    return sys.platform.startswith("linux") and hasattr(os, "fork")
+
+
+def _run_window(argv: list[str], plugin_manager, forked_at: float) -> None:
+    """Run a forked window; the body of the child process."""
+    import viz3.viz3 as window
+
+    sys.argv = argv
+    # the imports the timer would have measured happened before the fork
+    window.startup = StartupTimer(launched_at=forked_at)
+    window.start(plugin_manager)
+
+
+class ForkedWindow:
+    """A forked window process.
+
+    Has the parts of subprocess.Popen's interface that viz3.main uses.
+    """
+
+    def __init__(self, process: multiprocessing.Process) -> None:
+        """Wrap a started process.
+
+        Args:
+            process: The window process
+        """
+        self.process = process
+
+    @property
+    def pid(self) -> int | None:
+        """The process ID."""
+        return self.process.pid
+
+    @property
+    def sentinel(self) -> int:
+        """A file descriptor that becomes ready when the process exits."""
+        return self.process.sentinel
+
+    def poll(self) -> int | None:
+        """Get the exit code if the process has exited.
+
+        Returns:
+            int | None: The exit code, negative for a signal, or None while
+                the process runs
+        """
+        return self.process.exitcode
+
+    def terminate(self) -> None:
+        """Ask the process to exit with SIGTERM."""
+        self.process.terminate()
+
+    def wait(self, timeout: float | None = None) -> int | None:
+        """Wait for the process to exit.
+
+        Args:
+            timeout: The maximum seconds to wait, or None to wait until it exits
+
+        Returns:
+            int | None: The exit code, or None if it is still running
+        """
+        self.process.join(timeout)
+        return self.process.exitcode
+
+
+class WindowLauncher:
+    """Forks window processes from a process that has loaded everything once.
+
+    The launcher must not open a window itself, or start threads before it
+    forks, since neither survives a fork.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the launcher; `preload` prepares it."""
+        self.plugin_manager = None
+        self._context = multiprocessing.get_context("fork")
+
+    def preload(self) -> float:
+        """Import the window's dependencies and load every plugin.
+
+        Plugins are loaded for all windows, with no window number, and every
+        window shows the pipelines its window filter allows. The plugin
+        manifest therefore never skips a plugin on this path, the default
+        for several windows on Linux; it only shortens the startup of
+        windows started as new processes, with `--no_prefork` or on other
+        platforms.
+
+        Returns:
+            float: The seconds it took
+        """
+        start = time.perf_counter()
+        # viz3.viz3 only imports these when a window is set up; importing
+        # them here does not open a window
+        import ursina  # noqa: F401
+        import viz3.render.world  # noqa: F401
+        import viz3.viz3  # noqa: F401
+        from viz3.object_pipeline.plugin_manager import plugin_manager_from_args
+
+        self.plugin_manager = plugin_manager_from_args(parse_args())
+        self.plugin_manager.load_plugins()
+        return time.perf_counter() - start
+
+    def launch(
+        self,
+        window_index: int,
+        hub_address: str | None = None,
+        telemetry_fd: int | None = None,
+    ) -> ForkedWindow:
+        """Fork a window process.
+
+        Args:
+            window_index: Index of the window for positioning
+            hub_address: The address of the data hub, when running in hub mode
+            telemetry_fd: The write end of the window's telemetry pipe, which
+                the child inherits, or None
+
+        Returns:
+            ForkedWindow: The started process
+        """
+        if self.plugin_manager is None:
+            self.preload()
+        # output buffered before the fork would be written by every child
+        sys.stdout.flush()
+        sys.stderr.flush()
+        process = self._context.Process(
+            target=_run_window,
+            args=(
+                [sys.argv[0]]
+                + window_arguments(window_index, hub_address, telemetry_fd),
+                self.plugin_manager,
+                time.time(),
+            ),
+            name=f"viz3-window-{window_index}",
+        )
+        process.start()
+        return ForkedWindow(process)
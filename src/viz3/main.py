@@ -5,22 +5,52 @@ import os
 import time
 
 from viz3.config_parser import parse_args
+from viz3.launcher import WindowLauncher, can_prefork, window_arguments
+from viz3.metrics import LAUNCH_TIME_ENV
+from viz3.supervisor import WindowSupervisor
 
 
-def start_window(args, window_index: int = 0):
+def start_window(
+    args,
+    window_index: int = 0,
+    hub_address: str | None = None,
+    telemetry_fd: int | None = None,
+):
     """Start a window process.
 
     Args:
         args: Parsed command line arguments
         window_index: Index of the window for positioning
+        hub_address: The address of the data hub, when running in hub mode
+        telemetry_fd: The write end of the window's telemetry pipe, passed on
+            to the process, or None
+
+    Returns:
+        subprocess.Popen: The started process
+    """
+    cmd = [sys.executable, "-m", "viz3.viz3"] + window_arguments(
+        window_index, hub_address, telemetry_fd
+    )
+    # lets the window report its startup time including interpreter startup
+    env = dict(os.environ, **{LAUNCH_TIME_ENV: str(time.time())})
+    pass_fds = (telemetry_fd,) if telemetry_fd is not None else ()
+    process = subprocess.Popen(cmd, env=env, pass_fds=pass_fds)
+    return process
+
+
+def start_hub(hub_address: str):
+    """Start the data hub process that subscribes on behalf of all windows.
+
+    Args:
+        hub_address: The address the windows connect to
 
     Returns:
         subprocess.Popen: The started process
     """
     cmd = (
-        [sys.executable, "-m", "viz3.viz3"]
+        [sys.executable, "-m", "viz3.hub"]
         + sys.argv[1:]
-        + [f"--window-number={window_index}"]
+        + [f"--hub_address={hub_address}"]
     )
     process = subprocess.Popen(cmd)
     return process
@@ -29,22 +59,44 @@ def start_window(args, window_index: int = 0):
 def main() -> None:
     """Main entry point for the application."""
     args = parse_args()
-    processes = []
-    for i in range(args.number_of_windows_to_open):
-        process = start_window(args, i)
-        processes.append(process)
-        print(f"Started window process {i+1} with PID: {process.pid}")
+    hub = None
+    hub_address = None
+    if args.hub:
+        from viz3.hub import default_hub_address
+
+        hub_address = default_hub_address()
+        hub = start_hub(hub_address)
+        print(f"Started data hub process with PID: {hub.pid}")
 
+    launcher = None
+    if args.number_of_windows_to_open > 1 and not args.no_prefork and can_prefork():
+        launcher = WindowLauncher()
+        preload_seconds = launcher.preload()
+        print(f"Loaded window dependencies and plugins in {preload_seconds:.2f} s")
+
+    def start(window_index: int, telemetry_fd: int | None):
+        if launcher is not None:
+            return launcher.launch(window_index, hub_address, telemetry_fd)
+        return start_window(args, window_index, hub_address, telemetry_fd)
+
+    supervisor = WindowSupervisor(
+        start,
+        args.number_of_windows_to_open,
+        max_restarts=args.max_restarts,
+        backoff_s=args.restart_backoff_s,
+        telemetry_interval_s=args.telemetry_interval_s,
+        telemetry_log=args.telemetry_log,
+    )
     try:
-        while any(process.poll() is None for process in processes):
-            time.sleep(0.01)
+        supervisor.run()
     except KeyboardInterrupt:
         print("\nReceived interrupt signal. Shutting down processes...")
-        for process in processes:
-            process.terminate()
-        for process in processes:
-            process.wait()
+        supervisor.terminate_all()
         print("All processes terminated.")
+    finally:
+        if hub is not None:
+            hub.terminate()
+            hub.wait()
 
 
 if __name__ == "__main__":
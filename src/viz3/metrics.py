@@ -0,0 +1,635 @@
+"""End-to-end latency, queue and frame-time metrics of a viz3 window.
+
+Every message is timed at four points:
+
+- received: the subscription callback submitted it to a pipeline's queue
+- started: the pipeline started processing it, or decoding it for
+  pipelines with a decode stage
+- finished: `process` or `apply` returned
+- shown: the first frame that includes the scene commands the message
+  queued was rendered
+
+which splits its latency into queue wait, processing and time to frame.
+Per topic and per pipeline the registry also keeps message rates, queue
+depth, drop counts and tick timing, and per window the frame time.
+
+`StartupTimer` times the phases of a window's startup, which the registry
+reports with the other metrics.
+
+Snapshots are plain dicts, shown by `viz3.render.metrics_overlay` and
+exported by `MetricsExporter` to a file or a local HTTP endpoint.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+    from viz3.object_pipeline.delivery import DeliveryStats
+    from viz3.object_pipeline.scheduler import TickStats
+    from viz3.render.world import World
+
+
+class LatencyWindow:
+    """The most recent samples of a latency, for percentiles."""
+
+    def __init__(self, size: int = 512) -> None:
+        """Initialize an empty window.
+
+        Args:
+            size: How many recent samples to keep
+        """
+        self._samples: deque[float] = deque(maxlen=size)
+        self.count = 0
+        self.max_ms = 0.0
+
+    def add(self, ms: float) -> None:
+        """Record a sample.
+
+        Args:
+            ms: The latency in milliseconds
+        """
+        self._samples.append(ms)
+        self.count += 1
+        self.max_ms = max(self.max_ms, ms)
+
+    def summary(self) -> dict[str, float]:
+        """Summarize the recent samples.
+
+        Returns:
+            dict: The mean, p50 and p99 of the recent samples and the max
+                of all samples, in milliseconds
+        """
+        samples = sorted(self._samples)
+        if not samples:
+            return {"mean": 0.0, "p50": 0.0, "p99": 0.0, "max": 0.0}
+        return {
+            "mean": sum(samples) / len(samples),
+            "p50": samples[int(0.5 * (len(samples) - 1))],
+            "p99": samples[int(0.99 * (len(samples) - 1))],
+            "max": self.max_ms,
+        }
+
+
+class RateMeter:
+    """Events per second over the last few whole seconds."""
+
+    def __init__(self, window_s: int = 5) -> None:
+        """Initialize the meter.
+
+        Args:
+            window_s: How many completed seconds the rate is averaged over
+        """
+        self.window_s = window_s
+        self.total = 0
+        self._buckets: dict[int, int] = {}
+
+    def mark(self, now: float | None = None) -> None:
+        """Count an event.
+
+        Args:
+            now: The time of the event, from time.perf_counter()
+        """
+        second = int(time.perf_counter() if now is None else now)
+        self._buckets[second] = self._buckets.get(second, 0) + 1
+        self.total += 1
+        if len(self._buckets) > self.window_s + 2:
+            for old in [s for s in self._buckets if s < second - self.window_s]:
+                del self._buckets[old]
+
+    def rate(self) -> float:
+        """Get the event rate.
+
+        Returns:
+            float: Events per second over the last `window_s` completed seconds
+        """
+        current = int(time.perf_counter())
+        buckets = dict(self._buckets)
+        count = sum(
+            n
+            for second, n in buckets.items()
+            if current - self.window_s <= second < current
+        )
+        return count / self.window_s
+
+
+class PipelineMetrics:
+    """The metrics of one pipeline, fed by its PipelineDelivery."""
+
+    def __init__(
+        self,
+        registry: "MetricsRegistry",
+        name: str,
+        topics: list[str],
+        delivery_stats: "DeliveryStats | None" = None,
+        tick_stats: "TickStats | None" = None,
+    ) -> None:
+        """Initialize the metrics; use `MetricsRegistry.add_pipeline` instead.
+
+        Args:
+            registry: The registry that tracks rendered frames
+            name: The pipeline's name
+            topics: The topics the pipeline is subscribed to
+            delivery_stats: The message counters of the pipeline's queue
+            tick_stats: The tick timing of the pipeline
+        """
+        self.registry = registry
+        self.name = name
+        self.topics = topics
+        self.delivery_stats = delivery_stats
+        self.tick_stats = tick_stats
+        self.received = RateMeter()
+        self.processed = RateMeter()
+        self.queue_wait = LatencyWindow()
+        self.process = LatencyWindow()
+        self.to_frame = LatencyWindow()
+        self.end_to_end = LatencyWindow()
+
+    def record_received(self, topic: str, received_at: float) -> None:
+        """Count a message submitted to the pipeline's queue.
+
+        Args:
+            topic: The topic of the message
+            received_at: When it was received, from time.perf_counter()
+        """
+        self.received.mark(received_at)
+        self.registry.topic_rate(topic).mark(received_at)
+
+    def record_processed(
+        self, received_at: float, started_at: float, finished_at: float
+    ) -> None:
+        """Record a message the pipeline finished processing.
+
+        Its time to frame is recorded once its scene commands are rendered.
+
+        Args:
+            received_at: When the message was received
+            started_at: When processing or decoding started
+            finished_at: When `process` or `apply` returned
+        """
+        self.processed.mark(finished_at)
+        self.queue_wait.add((started_at - received_at) * 1000)
+        self.process.add((finished_at - started_at) * 1000)
+        self.registry._await_frame(self, received_at, finished_at)
+
+    def snapshot(self) -> dict[str, Any]:
+        """Summarize the pipeline's metrics.
+
+        Returns:
+            dict: The pipeline's rates, counters and latencies
+        """
+        snapshot: dict[str, Any] = {
+            "topics": self.topics,
+            "received": self.received.total,
+            "received_per_s": self.received.rate(),
+            "processed_per_s": self.processed.rate(),
+            "queue_wait_ms": self.queue_wait.summary(),
+            "process_ms": self.process.summary(),
+            "to_frame_ms": self.to_frame.summary(),
+            "end_to_end_ms": self.end_to_end.summary(),
+        }
+        if self.delivery_stats is not None:
+            snapshot.update(
+                processed=self.delivery_stats.processed,
+                queue_depth=self.delivery_stats.pending(),
+                dropped=self.delivery_stats.dropped,
+                coalesced=self.delivery_stats.coalesced,
+            )
+        if self.tick_stats is not None:
+            snapshot.update(
+                tick_ms=self.tick_stats.mean_duration_ms,
+                max_tick_ms=self.tick_stats.max_duration_ms,
+                tick_overruns=self.tick_stats.overruns,
+            )
+        return snapshot
+
+
+# set by viz3.main to the time.time() it started a window process at
+LAUNCH_TIME_ENV = "VIZ3_LAUNCH_TIME"
+
+
+class StartupTimer:
+    """Times the phases of a window's startup.
+
+    Every `mark` ends a phase that started at the previous mark, or when
+    the timer was created. If the process was started by `viz3.main`, the
+    time from its launch to the timer's creation, interpreter startup
+    included, is reported as the "launch" phase.
+    """
+
+    def __init__(self, launched_at: float | None = None) -> None:
+        """Start timing.
+
+        Args:
+            launched_at: The time.time() the process was launched at;
+                defaults to the one passed in the environment by viz3.main
+        """
+        if launched_at is None and os.environ.get(LAUNCH_TIME_ENV):
+            launched_at = float(os.environ[LAUNCH_TIME_ENV])
+        self.phases: dict[str, float] = {}
+        if launched_at is not None:
+            self.phases["launch"] = max(time.time() - launched_at, 0.0)
+        self._last_mark = time.perf_counter()
+
+    def mark(self, phase: str) -> float:
+        """End a phase.
+
+        Args:
+            phase: The name of the phase that ends now
+
+        Returns:
+            float: The duration of the phase in seconds
+        """
+        now = time.perf_counter()
+        duration = now - self._last_mark
+        self._last_mark = now
+        self.phases[phase] = self.phases.get(phase, 0.0) + duration
+        return duration
+
+    @property
+    def total(self) -> float:
+        """The duration of all phases in seconds."""
+        return sum(self.phases.values())
+
+    def format(self) -> str:
+        """Format the phases as a single line.
+
+        Returns:
+            str: The total and every phase's duration
+        """
+        phases = ", ".join(
+            f"{phase} {seconds:.2f} s" for phase, seconds in self.phases.items()
+        )
+        return f"Startup took {self.total:.2f} s ({phases})"
+
+
+class MetricsRegistry:
+    """All metrics of a window.
+
+    Pipelines are timed on the asyncio thread and frames on the render
+    thread, which reports every frame through `frame_started` and
+    `commands_applied`.
+    """
+
+    def __init__(self, world: "World | None" = None, window: int = 0) -> None:
+        """Initialize the registry.
+
+        Args:
+            world: The world whose scene command backlog is reported
+            window: The window number, added to exported metrics
+        """
+        self.world = world
+        self.window = window
+        self.pipelines: list[PipelineMetrics] = []
+        self.topics: dict[str, RateMeter] = {}
+        self.frame_time = LatencyWindow(size=240)
+        self.frames = 0
+        self.startup: StartupTimer | None = None
+
+        self._last_frame_start: float | None = None
+        # (pipeline, received_at, finished_at) of messages whose scene
+        # commands are queued but not applied yet; bounded, in case no
+        # frames are reported
+        self._awaiting_commands: deque[tuple[PipelineMetrics, float, float]] = deque(
+            maxlen=4096
+        )
+        # messages whose commands were applied in the frame being rendered
+        self._awaiting_render: list[tuple[PipelineMetrics, float, float]] = []
+        self._lock = threading.Lock()
+
+    def add_pipeline(
+        self,
+        name: str,
+        topics: list[str],
+        delivery_stats: "DeliveryStats | None" = None,
+        tick_stats: "TickStats | None" = None,
+    ) -> PipelineMetrics:
+        """Start tracking a pipeline.
+
+        Args:
+            name: The pipeline's name
+            topics: The topics the pipeline is subscribed to
+            delivery_stats: The message counters of the pipeline's queue
+            tick_stats: The tick timing of the pipeline
+
+        Returns:
+            PipelineMetrics: The pipeline's metrics, to assign to its delivery
+        """
+        pipeline_metrics = PipelineMetrics(
+            self, name, topics, delivery_stats, tick_stats
+        )
+        self.pipelines.append(pipeline_metrics)
+        for topic in topics:
+            self.topic_rate(topic)
+        return pipeline_metrics
+
+    def topic_rate(self, topic: str) -> RateMeter:
+        """Get the message rate meter of a topic, creating it on first use.
+
+        Args:
+            topic: The topic
+
+        Returns:
+            RateMeter: Counts every message received on the topic once per
+                pipeline it is delivered to
+        """
+        meter = self.topics.get(topic)
+        if meter is None:
+            meter = self.topics.setdefault(topic, RateMeter())
+        return meter
+
+    def _await_frame(
+        self, pipeline: PipelineMetrics, received_at: float, finished_at: float
+    ) -> None:
+        with self._lock:
+            self._awaiting_commands.append((pipeline, received_at, finished_at))
+
+    def frame_started(self, now: float | None = None) -> None:
+        """Report the start of a frame, on the render thread.
+
+        The previous frame has been rendered by now, so messages whose
+        commands it applied are recorded as shown.
+
+        Args:
+            now: The frame's start time, from time.perf_counter()
+        """
+        if now is None:
+            now = time.perf_counter()
+        if self._last_frame_start is not None:
+            self.frame_time.add((now - self._last_frame_start) * 1000)
+        self._last_frame_start = now
+        self.frames += 1
+
+        for pipeline, received_at, finished_at in self._awaiting_render:
+            pipeline.to_frame.add((now - finished_at) * 1000)
+            pipeline.end_to_end.add((now - received_at) * 1000)
+        self._awaiting_render.clear()
+
+    def commands_applied(self, applied_since: float, backlog: int) -> None:
+        """Report that the frame's scene commands were applied, on the render thread.
+
+        Args:
+            applied_since: When this frame started applying commands; messages
+                finished before that had all their commands queued
+            backlog: The number of commands left for later frames; while any
+                are left, messages wait for a frame that applies everything
+        """
+        if backlog:
+            return
+        with self._lock:
+            while (
+                self._awaiting_commands
+                and self._awaiting_commands[0][2] <= applied_since
+            ):
+                self._awaiting_render.append(self._awaiting_commands.popleft())
+
+    def snapshot(self) -> dict[str, Any]:
+        """Summarize all metrics.
+
+        Returns:
+            dict: The frame, topic and pipeline metrics
+        """
+        frame_time = self.frame_time.summary()
+        snapshot: dict[str, Any] = {
+            "timestamp": time.time(),
+            "window": self.window,
+            "frame": {
+                "frames": self.frames,
+                "fps": 1000 / frame_time["mean"] if frame_time["mean"] else 0.0,
+                "frame_ms": frame_time,
+            },
+            "topics": {
+                topic: {"received": meter.total, "received_per_s": meter.rate()}
+                for topic, meter in list(self.topics.items())
+            },
+            "pipelines": {
+                pipeline.name: pipeline.snapshot() for pipeline in self.pipelines
+            },
+        }
+        if self.world is not None:
+            snapshot["frame"]["command_backlog"] = self.world.pending_command_count()
+        if self.startup is not None:
+            snapshot["startup_s"] = dict(self.startup.phases, total=self.startup.total)
+        return snapshot
+
+    def format_text(self) -> str:
+        """Format the current metrics as a compact table for the overlay.
+
+        Returns:
+            str: The table
+        """
+        snapshot = self.snapshot()
+        frame = snapshot["frame"]
+        lines = [
+            f"fps {frame['fps']:5.1f}  frame {frame['frame_ms']['mean']:5.1f} ms"
+            f"  p99 {frame['frame_ms']['p99']:5.1f} ms"
+            f"  backlog {frame.get('command_backlog', 0)}",
+            f"{'pipeline':<22}{'msg/s':>7}{'queue':>6}{'drop':>6}"
+            f"{'wait':>7}{'proc':>7}{'frame':>7}{'e2e p99':>9}{'tick':>6}",
+        ]
+        for name, pipeline in snapshot["pipelines"].items():
+            lines.append(
+                f"{name[:21]:<22}{pipeline['received_per_s']:>7.1f}"
+                f"{pipeline.get('queue_depth', 0):>6}"
+                f"{pipeline.get('dropped', 0) + pipeline.get('coalesced', 0):>6}"
+                f"{pipeline['queue_wait_ms']['p50']:>7.1f}"
+                f"{pipeline['process_ms']['p50']:>7.1f}"
+                f"{pipeline['to_frame_ms']['p50']:>7.1f}"
+                f"{pipeline['end_to_end_ms']['p99']:>9.1f}"
+                f"{pipeline.get('tick_ms', 0.0):>6.1f}"
+            )
+        return "\n".join(lines)
+
+
+def window_metrics_path(path: str | Path, window: int) -> Path:
+    """Get the metrics file of a window, so windows do not overwrite each other.
+
+    Args:
+        path: The file given on the command line
+        window: The window number
+
+    Returns:
+        Path: The path itself for the first window, and the path with the
+            window number added to its name for the others
+    """
+    path = Path(path)
+    if window == 0:
+        return path
+    return path.with_name(f"{path.stem}-{window}{path.suffix}")
+
+
+def _label_value(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def format_prometheus(snapshot: dict[str, Any]) -> str:
+    """Format a snapshot in the Prometheus text exposition format.
+
+    Args:
+        snapshot: A snapshot returned by `MetricsRegistry.snapshot`
+
+    Returns:
+        str: The metrics, one sample per line
+    """
+    window = snapshot["window"]
+    lines = []
+
+    def sample(name: str, value: float, **labels: Any) -> None:
+        label_text = ",".join(
+            f'{key}="{_label_value(label)}"'
+            for key, label in {"window": window, **labels}.items()
+        )
+        lines.append(f"viz3_{name}{{{label_text}}} {value}")
+
+    frame = snapshot["frame"]
+    sample("frames_total", frame["frames"])
+    sample("fps", frame["fps"])
+    for statistic, value in frame["frame_ms"].items():
+        sample("frame_time_ms", value, statistic=statistic)
+    if "command_backlog" in frame:
+        sample("scene_command_backlog", frame["command_backlog"])
+    for phase, seconds in snapshot.get("startup_s", {}).items():
+        sample("startup_seconds", seconds, phase=phase)
+
+    for topic, metrics in snapshot["topics"].items():
+        sample("topic_received_total", metrics["received"], topic=topic)
+        sample("topic_received_per_second", metrics["received_per_s"], topic=topic)
+
+    for name, metrics in snapshot["pipelines"].items():
+        sample("pipeline_received_total", metrics["received"], pipeline=name)
+        sample("pipeline_received_per_second", metrics["received_per_s"], pipeline=name)
+        sample(
+            "pipeline_processed_per_second", metrics["processed_per_s"], pipeline=name
+        )
+        for counter in ("processed", "dropped", "coalesced", "tick_overruns"):
+            if counter in metrics:
+                sample(f"pipeline_{counter}_total", metrics[counter], pipeline=name)
+        if "queue_depth" in metrics:
+            sample("pipeline_queue_depth", metrics["queue_depth"], pipeline=name)
+        if "tick_ms" in metrics:
+            sample("pipeline_tick_ms", metrics["tick_ms"], pipeline=name)
+        for stage in ("queue_wait", "process", "to_frame", "end_to_end"):
+            for statistic, value in metrics[f"{stage}_ms"].items():
+                sample(
+                    "pipeline_latency_ms",
+                    value,
+                    pipeline=name,
+                    stage=stage,
+                    statistic=statistic,
+                )
+    return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    """Exports a registry's metrics to a file and/or a local HTTP endpoint.
+
+    The file is rewritten every `interval_s`, as Prometheus text if its name
+    ends in `.prom` and as JSON otherwise; it is replaced atomically, so
+    readers never see a partial file. The HTTP endpoint binds to localhost
+    only and serves `/metrics` as Prometheus text and `/metrics.json` as
+    JSON, computed when requested.
+    """
+
+    def __init__(
+        self,
+        registry: MetricsRegistry,
+        file_path: str | Path | None = None,
+        http_port: int | None = None,
+        interval_s: float = 5.0,
+    ) -> None:
+        """Initialize the exporter.
+
+        Args:
+            registry: The metrics to export
+            file_path: The file to write, or None
+            http_port: The localhost port to serve the metrics on, or None
+            interval_s: Seconds between file writes
+        """
+        self.registry = registry
+        self.file_path = Path(file_path) if file_path is not None else None
+        self.http_port = http_port
+        self.interval_s = interval_s
+        self._server: "ThreadingHTTPServer | None" = None
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def start(self) -> None:
+        """Start the file writer and HTTP server threads."""
+        if self.file_path is not None:
+            thread = threading.Thread(
+                target=self._write_periodically, name="viz3-metrics-file", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+        if self.http_port is not None:
+            from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+            registry = self.registry
+
+            class MetricsHandler(BaseHTTPRequestHandler):
+                def do_GET(self) -> None:
+                    path = self.path.split("?")[0]
+                    if path == "/metrics":
+                        body = format_prometheus(registry.snapshot()).encode()
+                        content_type = "text/plain; version=0.0.4"
+                    elif path == "/metrics.json":
+                        body = json.dumps(registry.snapshot()).encode()
+                        content_type = "application/json"
+                    else:
+                        self.send_error(404)
+                        return
+                    self.send_response(200)
+                    self.send_header("Content-Type", content_type)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format: str, *args: Any) -> None:
+                    pass
+
+            self._server = ThreadingHTTPServer(
+                ("127.0.0.1", self.http_port), MetricsHandler
+            )
+            thread = threading.Thread(
+                target=self._server.serve_forever, name="viz3-metrics-http", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def write_file(self) -> None:
+        """Write the current metrics to the file."""
+        if self.file_path is None:
+            return
+        snapshot = self.registry.snapshot()
+        if self.file_path.suffix == ".prom":
+            text = format_prometheus(snapshot)
+        else:
+            text = json.dumps(snapshot, indent=2)
+        temporary_path = self.file_path.with_name(self.file_path.name + ".tmp")
+        temporary_path.write_text(text)
+        os.replace(temporary_path, self.file_path)
+
+    def _write_periodically(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.write_file()
+            except Exception as e:
+                print(f"Error writing metrics to {self.file_path}: {e}")
+
+    def close(self) -> None:
+        """Stop exporting, writing the file a last time."""
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        try:
+            self.write_file()
+        except Exception as e:
+            print(f"Error writing metrics to {self.file_path}: {e}")
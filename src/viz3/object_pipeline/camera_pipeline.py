@@ -0,0 +1,208 @@
+import threading
+import time
+from dataclasses import dataclass
+import cv2
+import numpy as np
+from ursina import Entity
+from viz3.object_pipeline.delivery import DeliveryPolicy
+from viz3.object_pipeline.pipeline import Pipeline
+from viz3.render.objects.image_object import ColorOrder, ImageObject
+from viz3.render.world import World
+
+
+@dataclass
+class DecodedFrame:
+    """A camera frame returned by `CameraStreamPipeline.decode`."""
+
+    image: np.ndarray
+    decode_ms: float
+
+
+@dataclass
+class CameraStreamStats:
+    """Frame counters and decode timing of a camera stream."""
+
+    decoded: int = 0
+    # frames whose texture upload was replaced by a newer frame
+    replaced: int = 0
+    shown: int = 0
+    mean_decode_ms: float = 0.0
+    max_decode_ms: float = 0.0
+
+    def record_decode(self, decode_ms: float) -> None:
+        """Record the decode time of a frame.
+
+        Args:
+            decode_ms: How long the frame took to decode
+        """
+        # exponential moving average, so the report reflects recent frames
+        weight = 1 / min(self.decoded + 1, 100)
+        self.decoded += 1
+        self.mean_decode_ms += (decode_ms - self.mean_decode_ms) * weight
+        self.max_decode_ms = max(self.max_decode_ms, decode_ms)
+
+
+class CameraStreamPipeline(Pipeline):
+    """Shows a stream of JPEG or PNG frames as an image in the world.
+
+    Frames are decoded with OpenCV in the decode pool, then streamed into a
+    single texture. Subclasses are registered with DeliveryPolicy.LATEST
+    unless `register` is given another policy, so frames that are superseded
+    while waiting are dropped before they are decoded. Decoded frames wait
+    for the render thread in a single slot, and a frame superseded before
+    the next render frame is dropped before its texture upload. Decode
+    timing and skipped frames are printed every `report_interval_s`.
+
+    Example:
+        @Pipeline.register("camera/front")
+        class FrontCamera(CameraStreamPipeline):
+            object_name = "front_camera"
+            position = (0, 2, 0)
+    """
+
+    # name of the image in the world
+    object_name: str = "camera"
+    position: tuple[float, float, float] = (0, 0, 0)
+    scale: float = 1.0
+    report_interval_s: float | None = 10.0
+    # a stream is only worth showing live; every queued frame is stale
+    default_delivery_policy = DeliveryPolicy.LATEST
+
+    def __init__(self) -> None:
+        """Initialize the pipeline's counters."""
+        self.stats = CameraStreamStats()
+        # whether an add of the image object is queued and not yet applied
+        self._add_pending = False
+        # the newest decoded frame not yet uploaded; written by apply on the
+        # event loop thread and taken by the render thread
+        self._pending_frame: np.ndarray | None = None
+        # the newest decoded frame, which a re-added image object starts with
+        self._latest_frame: np.ndarray | None = None
+        self._frame_lock = threading.Lock()
+        self._next_report = (
+            time.perf_counter() + self.report_interval_s
+            if self.report_interval_s
+            else None
+        )
+
+    @staticmethod
+    def decode(topic_pub_data: bytes) -> DecodedFrame:
+        """Decode a compressed frame.
+
+        Args:
+            topic_pub_data: A JPEG or PNG image
+
+        Returns:
+            DecodedFrame: The grayscale, BGR or BGRA image and its decode time
+        """
+        start = time.perf_counter()
+        image = cv2.imdecode(
+            np.frombuffer(topic_pub_data, dtype=np.uint8), cv2.IMREAD_UNCHANGED
+        )
+        if image is None:
+            raise ValueError("message is not a JPEG or PNG image")
+        if image.dtype == np.uint16:
+            # 16 bit PNGs
+            image = (image >> 8).astype(np.uint8)
+        return DecodedFrame(image, (time.perf_counter() - start) * 1000)
+
+    async def apply(self, world: World, decoded: DecodedFrame) -> None:
+        """Queue the frame's texture upload.
+
+        Args:
+            world: The 3D world instance
+            decoded: The frame returned by decode
+        """
+        self.stats.record_decode(decoded.decode_ms)
+
+        with self._frame_lock:
+            if self._pending_frame is not None:
+                self.stats.replaced += 1
+            self._pending_frame = decoded.image
+            self._latest_frame = decoded.image
+            # the image object is added again after it expired or was removed
+            add = not self._add_pending and not world.contains_object(self.object_name)
+            if add:
+                self._add_pending = True
+        if add:
+            world.queue_add_object(self.object_name, self._create_image)
+        else:
+            world.queue_update_object(
+                self.object_name, self._show_pending_frame, key="texture"
+            )
+
+    def _take_pending_frame(self) -> np.ndarray | None:
+        with self._frame_lock:
+            image = self._pending_frame
+            self._pending_frame = None
+            if image is not None:
+                self.stats.shown += 1
+            return image
+
+    def _create_image(self) -> ImageObject:
+        """Create the image object from the newest frame; runs on the render thread.
+
+        Returns:
+            ImageObject: The image object of the stream
+        """
+        image = self._take_pending_frame()
+        with self._frame_lock:
+            self._add_pending = False
+            if image is None:
+                # already taken by an update of the previous image object
+                image = self._latest_frame
+        return ImageObject(
+            image,
+            position=self.position,
+            scale=self.scale,
+            streaming=True,
+            color_order=ColorOrder.BGR,
+        )
+
+    def _show_pending_frame(self, entity: Entity) -> None:
+        """Upload the newest pending frame; runs on the render thread.
+
+        Args:
+            entity: The image object of the stream
+        """
+        if not isinstance(entity, ImageObject):
+            # another object took the stream's name
+            return
+        image = self._take_pending_frame()
+        if image is not None:
+            entity.update_texture(image)
+
+    def skipped_frames(self) -> int:
+        """Get the number of frames that were received but never shown.
+
+        Returns:
+            int: Frames dropped before decode plus frames replaced before upload
+        """
+        skipped = self.stats.replaced
+        if self.delivery_stats is not None:
+            skipped += self.delivery_stats.dropped + self.delivery_stats.coalesced
+        return skipped
+
+    def format_report(self) -> str:
+        """Format the stream's counters.
+
+        Returns:
+            str: The report
+        """
+        return (
+            f"{self.__class__.__name__}: {self.stats.shown} shown,"
+            f" {self.skipped_frames()} skipped, decode"
+            f" {self.stats.mean_decode_ms:.2f} ms mean"
+            f" / {self.stats.max_decode_ms:.2f} ms max"
+        )
+
+    def tick(self, world: World) -> None:
+        """Print the report every `report_interval_s`.
+
+        Args:
+            world: The 3D world instance
+        """
+        if self._next_report is None or time.perf_counter() < self._next_report:
+            return
+        print(self.format_report())
+        self._next_report += self.report_interval_s  # type: ignore
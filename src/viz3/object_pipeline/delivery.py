@@ -0,0 +1,247 @@
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from enum import Enum
+from typing import TYPE_CHECKING, Any, Awaitable, Callable
+
+from viz3.shared_frames import is_intact
+
+if TYPE_CHECKING:
+    from viz3.metrics import PipelineMetrics
+    from viz3.object_pipeline.pipeline import Pipeline
+    from viz3.render.world import World
+
+
+class DeliveryPolicy(Enum):
+    """How messages are handed to a pipeline that cannot keep up."""
+
+    # every message is processed, in order, however far behind that gets
+    ALL = "all"
+    # only the newest pending message of each topic is processed
+    LATEST = "latest"
+    # at most `queue_size` messages wait; the oldest is dropped on overflow
+    DROP_OLDEST = "drop_oldest"
+
+
+class DecodeExecutor(Enum):
+    """Where a pipeline's decode stage runs."""
+
+    THREAD = "thread"
+    # for CPU-heavy decoders; decode must be a static method of a pipeline
+    # that the worker processes can load, and its result must be picklable
+    PROCESS = "process"
+
+
+@dataclass
+class DeliveryStats:
+    """Message counters of a single pipeline."""
+
+    received: int = 0
+    processed: int = 0
+    # messages discarded because the bounded queue was full, or because
+    # their shared-memory frame was overwritten before it was applied
+    dropped: int = 0
+    # messages replaced by a newer message of the same topic
+    coalesced: int = 0
+
+    def pending(self) -> int:
+        """Get the number of messages waiting to be processed.
+
+        Returns:
+            int: The queue depth
+        """
+        return self.received - self.processed - self.dropped - self.coalesced
+
+
+class PipelineDelivery:
+    """Queue between the topic subscriptions and a pipeline's process method.
+
+    Subscription callbacks only enqueue messages and return immediately. A
+    single worker task processes the queue in arrival order, so a slow
+    pipeline never blocks the network, and the delivery policy decides what
+    happens to messages that arrive while it is busy.
+    """
+
+    def __init__(
+        self,
+        pipeline: "Pipeline",
+        world: "World",
+        policy: DeliveryPolicy = DeliveryPolicy.ALL,
+        queue_size: int = 16,
+        decode_executor: Executor | None = None,
+        max_decodes_in_flight: int = 2,
+    ) -> None:
+        """Initialize the delivery queue.
+
+        Args:
+            pipeline: The pipeline to deliver messages to
+            world: The world passed to the pipeline
+            policy: What to do with messages that arrive while the pipeline is busy
+            queue_size: The maximum queue length for DeliveryPolicy.DROP_OLDEST
+            decode_executor: The pool that runs the pipeline's decode stage; when
+                None, or when the pipeline has no decode stage, messages are
+                passed to `process` on the event loop
+            max_decodes_in_flight: How many messages may be decoded ahead of
+                the one being applied
+        """
+        self.pipeline = pipeline
+        self.world = world
+        self.policy = policy
+        self.decode_executor = decode_executor if pipeline.has_decode_stage() else None
+        self.max_decodes_in_flight = max_decodes_in_flight
+        self.stats = DeliveryStats()
+        pipeline.delivery_stats = self.stats
+        # latency and rate metrics, set when the window tracks metrics
+        self.metrics: "PipelineMetrics | None" = None
+
+        # (topic, message, decoded, received_at) in arrival order
+        self._queue: deque[tuple[str, Any, bool, float]] = deque(
+            maxlen=queue_size if policy == DeliveryPolicy.DROP_OLDEST else None
+        )
+        # newest pending (message, decoded, received_at) per topic, in order
+        # of first arrival
+        self._latest: dict[str, tuple[Any, bool, float]] = {}
+        self._ready = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """Start the worker task on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        """Stop the worker task; pending messages are discarded."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def submit(self, topic: str, message: Any, decoded: bool = False) -> None:
+        """Queue a message according to the delivery policy.
+
+        Args:
+            topic: The topic the message was received on
+            message: The raw message, or the output of the pipeline's decode
+                stage when `decoded` is set
+            decoded: Whether the message was already decoded elsewhere, e.g. by
+                the data hub, and only needs to be applied
+        """
+        self.stats.received += 1
+        received_at = time.perf_counter()
+        if self.metrics is not None:
+            self.metrics.record_received(topic, received_at)
+
+        if self.policy == DeliveryPolicy.LATEST:
+            if topic in self._latest:
+                self.stats.coalesced += 1
+            self._latest[topic] = (message, decoded, received_at)
+        else:
+            if (
+                self._queue.maxlen is not None
+                and len(self._queue) == self._queue.maxlen
+            ):
+                self.stats.dropped += 1
+            self._queue.append((topic, message, decoded, received_at))
+
+        self._ready.set()
+
+    def callback(self, topic: str) -> Callable[[bytes], Awaitable[None]]:
+        """Create a subscription callback that submits messages of a topic.
+
+        Args:
+            topic: The topic the callback is subscribed to
+
+        Returns:
+            Callable: An async callback taking the raw message
+        """
+
+        async def callback(message: bytes) -> None:
+            self.submit(topic, message)
+
+        return callback
+
+    def _pop(self) -> tuple[Any, bool, float] | None:
+        if self._latest:
+            topic = next(iter(self._latest))
+            return self._latest.pop(topic)
+        if self._queue:
+            _, message, decoded, received_at = self._queue.popleft()
+            return message, decoded, received_at
+        return None
+
+    def _record_processed(self, received_at: float, started_at: float) -> None:
+        self.stats.processed += 1
+        if self.metrics is not None:
+            self.metrics.record_processed(received_at, started_at, time.perf_counter())
+
+    async def _run(self) -> None:
+        if self.decode_executor is not None:
+            await self._run_decoded()
+            return
+
+        while True:
+            await self._ready.wait()
+            popped = self._pop()
+            if popped is None:
+                self._ready.clear()
+                continue
+
+            message, decoded, received_at = popped
+            if decoded and not is_intact(message):
+                self.stats.dropped += 1
+                continue
+            stage = "apply" if decoded else "process"
+            started_at = time.perf_counter()
+            try:
+                if decoded:
+                    await self.pipeline.apply(self.world, message)
+                else:
+                    await self.pipeline.process(self.world, message)
+            except Exception as e:
+                print(f"Error in {self.pipeline.__class__.__name__}.{stage}: {e}")
+            self._record_processed(received_at, started_at)
+            # let the subscriptions and other pipelines run between messages
+            await asyncio.sleep(0)
+
+    async def _run_decoded(self) -> None:
+        loop = asyncio.get_running_loop()
+        # decodes run concurrently in the pool, but are applied in order
+        # (decode future, received_at, started_at)
+        in_flight: deque[tuple[asyncio.Future, float, float]] = deque()
+        while True:
+            while len(in_flight) < self.max_decodes_in_flight:
+                popped = self._pop()
+                if popped is None:
+                    break
+                message, decoded, received_at = popped
+                started_at = time.perf_counter()
+                if decoded:
+                    future = loop.create_future()
+                    future.set_result(message)
+                else:
+                    future = loop.run_in_executor(
+                        self.decode_executor, self.pipeline.decode, message
+                    )
+                in_flight.append((future, received_at, started_at))
+
+            if not in_flight:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+
+            name = self.pipeline.__class__.__name__
+            future, received_at, started_at = in_flight.popleft()
+            try:
+                decoded = await future
+                if not is_intact(decoded):
+                    self.stats.dropped += 1
+                    continue
+                try:
+                    await self.pipeline.apply(self.world, decoded)
+                except Exception as e:
+                    print(f"Error in {name}.apply: {e}")
+            except Exception as e:
+                print(f"Error in {name}.decode: {e}")
+            self._record_processed(received_at, started_at)
+            await asyncio.sleep(0)
@@ -1,23 +1,35 @@
 from dataclasses import dataclass
 from enum import Enum
-from viz3.render.world import World
-from typing import Dict, Type
-from ursina import color
-
-
-@dataclass
+from viz3.object_pipeline.delivery import (
+    DecodeExecutor,
+    DeliveryPolicy,
+    DeliveryStats,
+)
+from viz3.object_pipeline.scheduler import TickRate
+from typing import TYPE_CHECKING, Any, Dict, Type
+
+if TYPE_CHECKING:
+    # only needed for annotations; importing the pipeline API does not
+    # import Ursina
+    from viz3.render.world import World
+
+
+# hashable, so instances are allowed as class-level defaults of
+# PipelineGlobalConfig on Python 3.11+
+@dataclass(unsafe_hash=True)
 class AxesOptions:
     length: float = 1
     thickness: float = 0.02
     show: bool = True
 
 
-@dataclass
+@dataclass(unsafe_hash=True)
 class PlaneOptions:
     size: int = 10
     spacing: float = 1.0
     thickness: float = 0.01
-    line_color = color.light_gray
+    # an Ursina color; None keeps the grid's default, light gray
+    line_color = None
     show: bool = True
 
 
@@ -25,6 +37,10 @@ class PlaneOptions:
 class PipelineOptions:
     pipeline_type: Type["Pipeline"]
     window_number_to_show_in: int | list[int] | None = None
+    delivery_policy: DeliveryPolicy = DeliveryPolicy.ALL
+    queue_size: int = 16
+    tick_rate: float | TickRate = 20.0
+    decode_executor: DecodeExecutor = DecodeExecutor.THREAD
 
 
 class PointOfView(Enum):
@@ -90,6 +106,14 @@ class Pipeline:
     """
 
     _registry: Dict[PipelineTopicOptions, PipelineOptions] = {}
+    # message counters of the queue feeding this pipeline, set when the
+    # pipeline is connected to its topics
+    delivery_stats: DeliveryStats | None = None
+    # the delivery policy of registrations that do not pass one
+    default_delivery_policy: DeliveryPolicy = DeliveryPolicy.ALL
+    # run `tick` in a worker thread instead of on the event loop; set it for
+    # ticks that block, so they do not delay other pipelines
+    slow_tick: bool = False
 
     @classmethod
     def get_registry(cls) -> Dict[PipelineTopicOptions, PipelineOptions]:
@@ -105,26 +129,91 @@ class Pipeline:
         cls,
         topic: str | list[str],
         window_number_to_show_in: int | list[int] | None = None,
+        delivery_policy: DeliveryPolicy | None = None,
+        queue_size: int = 16,
+        tick_rate: float | TickRate = 20.0,
+        decode_executor: DecodeExecutor = DecodeExecutor.THREAD,
     ):
         """Decorator to register a pipeline class for a specific topic.
 
         Args:
             topic: The topic name to register the pipeline for
             window_number_to_show_in: The window number to show the pipeline in, or a list of window numbers to show the pipeline in. Default is None, which means the pipeline will not be shown in all windows.
+            delivery_policy: What to do with messages that arrive while the pipeline is still processing. DeliveryPolicy.LATEST keeps only the newest message per topic, DeliveryPolicy.DROP_OLDEST keeps a bounded queue and DeliveryPolicy.ALL delivers every message. Default is None, which uses the pipeline class's `default_delivery_policy`, DeliveryPolicy.ALL unless the class changes it.
+            queue_size: The maximum number of waiting messages for DeliveryPolicy.DROP_OLDEST.
+            tick_rate: How many times per second `tick` is called, or TickRate.EVERY_FRAME to call it once per rendered frame. Default is 20.
+            decode_executor: Where `decode` runs for pipelines that define it, DecodeExecutor.THREAD (the default) or DecodeExecutor.PROCESS.
         """
 
         def decorator(pipeline_class):
             cls._registry[PipelineTopicOptions(topic)] = PipelineOptions(
                 pipeline_type=pipeline_class,
                 window_number_to_show_in=window_number_to_show_in,
+                delivery_policy=(
+                    delivery_policy
+                    if delivery_policy is not None
+                    else pipeline_class.default_delivery_policy
+                ),
+                queue_size=queue_size,
+                tick_rate=tick_rate,
+                decode_executor=decode_executor,
             )
 
             return pipeline_class
 
         return decorator
 
-    async def process(self, world: World, topic_pub_data: bytes):
+    @classmethod
+    def has_decode_stage(cls) -> bool:
+        """Check if the pipeline splits processing into `decode` and `apply`.
+
+        Returns:
+            bool: True if the pipeline overrides `decode`
+        """
+        return cls.decode is not Pipeline.decode
+
+    @staticmethod
+    def decode(topic_pub_data: bytes) -> Any:
+        """Decode a raw message, off the scene thread.
+
+        Override this as a pure static method, together with `apply`, instead
+        of overriding `process`. It runs in a thread or process pool, so it
+        must not touch the world or the pipeline's state.
+
+        Args:
+            topic_pub_data: The raw message
+
+        Returns:
+            Any: The decoded message, passed to `apply`
+        """
+        raise NotImplementedError
+
+    async def apply(self, world: "World", decoded: Any):
+        """Apply a message returned by `decode` to the world.
+
+        Messages are applied in the order they were received.
+
+        Args:
+            world: The 3D world instance
+            decoded: The value returned by `decode`
+        """
         raise NotImplementedError
 
-    def tick(self, world: World):
+    async def process(self, world: "World", topic_pub_data: bytes):
+        if self.has_decode_stage():
+            await self.apply(world, self.decode(topic_pub_data))
+            return
+        raise NotImplementedError
+
+    def tick(self, world: "World"):
+        """Update the world periodically, at the registered tick rate.
+
+        Ticks run on the event loop, unless the pipeline sets `slow_tick` or
+        a tick takes longer than the tick period; from then on they run in a
+        worker thread, concurrently with `process` and `apply`, so state
+        they share must be guarded by a lock.
+
+        Args:
+            world: The 3D world instance
+        """
         pass
@@ -3,12 +3,15 @@ from pathlib import Path
 import importlib.util
 import random
 import sys
+import time
 from typing import Dict, Type
 from viz3.object_pipeline.pipeline import (
     Pipeline,
+    PipelineGlobalConfig,
     PipelineOptions,
     PipelineTopicOptions,
 )
+from viz3.object_pipeline.plugin_manifest import PluginManifest, default_manifest_path
 
 
 @dataclass
@@ -18,12 +21,39 @@ class Directory:
 
 
 class PluginManager:
-    def __init__(self, plugin_directories: list[Directory]):
+    def __init__(
+        self,
+        plugin_directories: list[Directory],
+        window_number: int | None = None,
+        manifest: PluginManifest | None = None,
+    ):
+        """Initialize the plugin manager.
+
+        Args:
+            plugin_directories: The directories to load plugins from
+            window_number: The window the plugins are loaded for; with a
+                manifest, plugins whose pipelines are all filtered out of
+                this window are skipped. None loads every plugin
+            manifest: The cache of what every plugin registers, or None to
+                load every plugin
+        """
         self.plugins = []
         self.plugin_directories = plugin_directories
+        self.window_number = window_number
+        self.manifest = manifest
+        self.loaded_files: list[Path] = []
+        self.skipped_files: list[Path] = []
+        self.load_seconds = 0.0
+
+    def load_plugins(self, save_manifest: bool = True):
+        """Load plugins from all configured directories.
 
-    def load_plugins(self):
-        """Load plugins from all configured directories."""
+        Args:
+            save_manifest: Whether to write the entries of the loaded plugins
+                to the manifest; decode worker processes pass False, so only
+                the process that owns them writes the file
+        """
+        start = time.perf_counter()
         for directory in self.plugin_directories:
             if not directory.path.exists():
                 print(f"Warning: Plugin directory does not exist: {directory.path}")
@@ -33,11 +63,31 @@ class PluginManager:
 
             for file in directory.path.glob("*.py"):
                 if file.name not in directory.exclude_files:
+                    if self._can_skip(file):
+                        self.skipped_files.append(file)
+                        continue
                     try:
                         self._load_plugin_file(file)
+                        self.loaded_files.append(file)
                     except Exception as e:
                         print(f"Error loading plugin {file}: {e}")
 
+        if self.manifest is not None and save_manifest:
+            self.manifest.save()
+        self.load_seconds = time.perf_counter() - start
+        if self.skipped_files:
+            print(
+                f"Skipped {len(self.skipped_files)} plugins without pipelines for"
+                f" window {self.window_number}"
+            )
+
+    def _can_skip(self, file_path: Path) -> bool:
+        """Check the manifest for whether this window needs a plugin file."""
+        if self.manifest is None or self.window_number is None:
+            return False
+        entry = self.manifest.lookup(file_path)
+        return entry is not None and not entry.needed_in_window(self.window_number)
+
     def _load_plugin_file(self, file_path: Path):
         """Load a single Python file as a plugin module."""
         module_name = f"viz3_plugin_{file_path.stem}"
@@ -46,10 +96,27 @@ class PluginManager:
         if spec is None or spec.loader is None:
             raise ImportError(f"Cannot create spec for {file_path}")
 
+        registry = Pipeline.get_registry()
+        # kept alive, so replaced options cannot share an id with new ones
+        options_before = list(registry.values())
+        registered_before = {id(options) for options in options_before}
+        global_config_before = PipelineGlobalConfig._registry
+
         module = importlib.util.module_from_spec(spec)
         sys.modules[module_name] = module
         spec.loader.exec_module(module)
 
+        if self.manifest is not None:
+            self.manifest.record(
+                file_path,
+                [
+                    (topic.get_topics(), options.window_number_to_show_in)
+                    for topic, options in registry.items()
+                    if id(options) not in registered_before
+                ],
+                PipelineGlobalConfig._registry is not global_config_before,
+            )
+
         print(f"Loaded plugin: {file_path.name}")
 
     def get_available_pipelines(
@@ -61,3 +128,27 @@ class PluginManager:
     def list_topics(self) -> list[PipelineTopicOptions]:
         """List all available pipeline topics."""
         return list(Pipeline.get_registry().keys())
+
+
+def plugin_manager_from_args(args, window_number: int | None = None) -> PluginManager:
+    """Create a plugin manager from the command line arguments.
+
+    Args:
+        args: Parsed command line arguments
+        window_number: The window the plugins are loaded for, or None to load
+            every plugin
+
+    Returns:
+        PluginManager: The plugin manager, with plugins not loaded yet
+    """
+    plugin_dirs = [
+        Directory(
+            path=Path(plugin_directory),
+            exclude_files=args.plugin_exclude_files or ["__init__.py"],
+        )
+        for plugin_directory in args.plugin_directories or []
+    ]
+    manifest = None
+    if not args.no_plugin_manifest:
+        manifest = PluginManifest(args.plugin_manifest or default_manifest_path())
+    return PluginManager(plugin_dirs, window_number, manifest)
@@ -0,0 +1,208 @@
+"""Cache of the pipelines every plugin file registers.
+
+Finding a plugin's pipelines means executing the plugin file, together with
+everything it imports. The manifest records, per plugin file, the topics
+and window filters of the pipelines it registered the last time it was
+loaded, so a window can skip the files whose pipelines it does not show
+without executing them.
+
+Entries are keyed by the file's absolute path and checked against its
+modification time and size, and, when those changed, its SHA-256 hash. A
+changed file is loaded and its entry rewritten. Changes to modules a
+plugin imports are not detected; disable the manifest while editing them.
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+# bump when the format of the entries changes
+MANIFEST_VERSION = 1
+
+
+def default_manifest_path() -> Path:
+    """Get the manifest file in the user's cache directory.
+
+    Returns:
+        Path: `viz3/plugin_manifest.json` in $XDG_CACHE_HOME or ~/.cache
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "viz3" / "plugin_manifest.json"
+
+
+def shows_in_window(
+    window_number_to_show_in: int | list[int] | None, window_number: int | None
+) -> bool:
+    """Check if a pipeline's window filter includes a window.
+
+    Args:
+        window_number_to_show_in: The filter the pipeline was registered with
+        window_number: The number of the window
+
+    Returns:
+        bool: True if the pipeline is shown in the window
+    """
+    if window_number_to_show_in is None:
+        return True
+    if isinstance(window_number_to_show_in, int):
+        return window_number == window_number_to_show_in
+    return window_number in window_number_to_show_in
+
+
+def _file_hash(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+@dataclass
+class PluginEntry:
+    """What loading one plugin file registered."""
+
+    mtime_ns: int
+    size: int
+    sha256: str
+    # (topics, window_number_to_show_in) of every registered pipeline
+    pipelines: list[tuple[list[str], int | list[int] | None]] = field(
+        default_factory=list
+    )
+    # the file registered a PipelineGlobalConfig, which every window needs
+    registers_global_config: bool = False
+
+    def needed_in_window(self, window_number: int) -> bool:
+        """Check if a window has to load the plugin.
+
+        Args:
+            window_number: The number of the window
+
+        Returns:
+            bool: False only if every pipeline of the plugin is filtered out
+                of the window; plugins without pipelines are always needed
+        """
+        if self.registers_global_config or not self.pipelines:
+            return True
+        return any(
+            shows_in_window(window_filter, window_number)
+            for _, window_filter in self.pipelines
+        )
+
+
+class PluginManifest:
+    """Plugin entries by file path, stored as JSON.
+
+    Several windows may share one manifest file; `save` merges the entries
+    of this process into the file's current contents and replaces it
+    atomically.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        """Read the manifest, starting empty if it is missing or unreadable.
+
+        Args:
+            path: The manifest file
+        """
+        self.path = Path(path)
+        self.entries: dict[str, PluginEntry] = self._read()
+        self._changed: set[str] = set()
+
+    def _read(self) -> dict[str, PluginEntry]:
+        try:
+            data = json.loads(self.path.read_text())
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"Warning: Ignoring unreadable plugin manifest {self.path}: {e}")
+            return {}
+        if data.get("version") != MANIFEST_VERSION:
+            return {}
+        try:
+            return {
+                path: PluginEntry(
+                    mtime_ns=entry["mtime_ns"],
+                    size=entry["size"],
+                    sha256=entry["sha256"],
+                    pipelines=[
+                        (topics, window_filter)
+                        for topics, window_filter in entry["pipelines"]
+                    ],
+                    registers_global_config=entry["registers_global_config"],
+                )
+                for path, entry in data["plugins"].items()
+            }
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"Warning: Ignoring malformed plugin manifest {self.path}: {e}")
+            return {}
+
+    def lookup(self, file_path: Path) -> PluginEntry | None:
+        """Get the entry of a plugin file if it is still up to date.
+
+        Args:
+            file_path: The plugin file
+
+        Returns:
+            PluginEntry | None: The entry, or None if the file is unknown or
+                its contents changed since it was recorded
+        """
+        key = str(file_path.resolve())
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        stat = file_path.stat()
+        if stat.st_mtime_ns == entry.mtime_ns and stat.st_size == entry.size:
+            return entry
+        if stat.st_size != entry.size or _file_hash(file_path) != entry.sha256:
+            return None
+        # touched but not changed
+        entry.mtime_ns = stat.st_mtime_ns
+        self._changed.add(key)
+        return entry
+
+    def record(
+        self,
+        file_path: Path,
+        pipelines: list[tuple[list[str], int | list[int] | None]],
+        registers_global_config: bool,
+    ) -> PluginEntry:
+        """Record what loading a plugin file registered.
+
+        Args:
+            file_path: The plugin file
+            pipelines: The topics and window filter of every pipeline it
+                registered
+            registers_global_config: Whether it registered a global config
+
+        Returns:
+            PluginEntry: The new entry
+        """
+        key = str(file_path.resolve())
+        stat = file_path.stat()
+        entry = PluginEntry(
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size,
+            sha256=_file_hash(file_path),
+            pipelines=pipelines,
+            registers_global_config=registers_global_config,
+        )
+        self.entries[key] = entry
+        self._changed.add(key)
+        return entry
+
+    def save(self) -> None:
+        """Write the entries changed by this process to the manifest file."""
+        if not self._changed:
+            return
+        entries = self._read()
+        entries.update({key: self.entries[key] for key in self._changed})
+        data = {
+            "version": MANIFEST_VERSION,
+            "plugins": {path: asdict(entry) for path, entry in entries.items()},
+        }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temporary_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            temporary_path.write_text(json.dumps(data, indent=2))
+            os.replace(temporary_path, self.path)
+        except OSError as e:
+            print(f"Warning: Could not write plugin manifest {self.path}: {e}")
+            return
+        self._changed.clear()
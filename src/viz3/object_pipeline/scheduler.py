@@ -0,0 +1,301 @@
+import asyncio
+import heapq
+import itertools
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from functools import partial
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from viz3.object_pipeline.pipeline import Pipeline
+    from viz3.render.world import World
+
+
+class TickRate(Enum):
+    """Special tick rates a pipeline can register with."""
+
+    # tick once per rendered frame
+    EVERY_FRAME = "every_frame"
+
+
+@dataclass
+class TickStats:
+    """Timing of a single pipeline's ticks."""
+
+    ticks: int = 0
+    # ticks that took longer than the tick period
+    overruns: int = 0
+    # ticks skipped because a previous tick ran past their deadline
+    missed: int = 0
+    # lateness of a tick's start relative to its deadline, in milliseconds
+    mean_jitter_ms: float = 0.0
+    max_jitter_ms: float = 0.0
+    mean_duration_ms: float = 0.0
+    max_duration_ms: float = 0.0
+
+    def record(self, jitter_ms: float, duration_ms: float, period_ms: float) -> None:
+        """Record one tick.
+
+        Args:
+            jitter_ms: How late the tick started
+            duration_ms: How long the tick took
+            period_ms: The tick period the duration is compared against
+        """
+        # exponential moving averages, so the report reflects recent behavior
+        weight = 1 / min(self.ticks + 1, 100)
+        self.ticks += 1
+        self.mean_jitter_ms += (jitter_ms - self.mean_jitter_ms) * weight
+        self.max_jitter_ms = max(self.max_jitter_ms, jitter_ms)
+        self.mean_duration_ms += (duration_ms - self.mean_duration_ms) * weight
+        self.max_duration_ms = max(self.max_duration_ms, duration_ms)
+        if duration_ms > period_ms:
+            self.overruns += 1
+
+
+@dataclass
+class ScheduledTick:
+    """A pipeline registered with the scheduler."""
+
+    pipeline: "Pipeline"
+    tick_rate: float | TickRate
+    stats: TickStats = field(default_factory=TickStats)
+    # whether the tick runs in a worker thread instead of on the event loop
+    off_loop: bool = False
+    # the tick running in a worker thread, if any
+    in_flight: "asyncio.Future | None" = None
+
+    def period(self) -> float:
+        """Get the tick period in seconds; 0 for every-frame pipelines.
+
+        Returns:
+            float: The tick period
+        """
+        if self.tick_rate == TickRate.EVERY_FRAME:
+            return 0.0
+        return 1.0 / self.tick_rate  # type: ignore
+
+
+class TickScheduler:
+    """Runs every pipeline's tick at its own rate on the asyncio loop.
+
+    Fixed-rate ticks are kept on a heap ordered by deadline, so each pipeline
+    is ticked at its own rate instead of all pipelines sharing one loop
+    period. Every-frame ticks run whenever the render thread reports a new
+    frame through `notify_frame`. Ticks that start late or take longer than
+    their period are recorded per pipeline and reported periodically.
+
+    Ticks run on the event loop, one after another, so a slow tick would
+    delay every other tick and message. Ticks of pipelines that set
+    `slow_tick`, and of pipelines whose tick once took longer than its
+    period, therefore run in a worker thread instead, at most one per
+    pipeline at a time; a deadline that comes while the previous tick is
+    still running is skipped and counted as missed.
+    """
+
+    def __init__(self, world: "World", report_interval_s: float | None = 30.0) -> None:
+        """Initialize the scheduler.
+
+        Args:
+            world: The world passed to every tick
+            report_interval_s: Seconds between timing reports, or None to
+                disable them
+        """
+        self.world = world
+        self.report_interval_s = report_interval_s
+        self.scheduled: list[ScheduledTick] = []
+
+        self._heap: list[tuple[float, int, ScheduledTick]] = []
+        self._sequence = itertools.count()
+        self._frame_ticks: list[ScheduledTick] = []
+        self._frame_time = 0.0
+        self._frame_period = 0.0
+        self._last_frame_time: float | None = None
+        self._frame_event: asyncio.Event | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def add(self, pipeline: "Pipeline", tick_rate: float | TickRate) -> ScheduledTick:
+        """Schedule a pipeline's tick.
+
+        Args:
+            pipeline: The pipeline to tick
+            tick_rate: Ticks per second, or TickRate.EVERY_FRAME
+
+        Returns:
+            ScheduledTick: The scheduled tick, with the pipeline's tick stats
+        """
+        scheduled = ScheduledTick(pipeline, tick_rate, off_loop=pipeline.slow_tick)
+        self.scheduled.append(scheduled)
+        if tick_rate == TickRate.EVERY_FRAME:
+            self._frame_ticks.append(scheduled)
+        else:
+            if tick_rate <= 0:  # type: ignore
+                raise ValueError(f"tick_rate must be positive, got {tick_rate}")
+            heapq.heappush(
+                self._heap, (time.perf_counter(), next(self._sequence), scheduled)
+            )
+        return scheduled
+
+    def notify_frame(self) -> None:
+        """Report that a frame was rendered; safe to call from the render thread."""
+        if not self._frame_ticks or self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._on_frame, time.perf_counter())
+
+    def _on_frame(self, frame_time: float) -> None:
+        if self._last_frame_time is not None:
+            self._frame_period = frame_time - self._last_frame_time
+        self._last_frame_time = frame_time
+        self._frame_time = frame_time
+        self._frame_event.set()  # type: ignore
+
+    def _tick(self, scheduled: ScheduledTick) -> tuple[float, float]:
+        start = time.perf_counter()
+        try:
+            scheduled.pipeline.tick(self.world)
+        except Exception as e:
+            print(f"Error in {scheduled.pipeline.__class__.__name__}.tick: {e}")
+        return start, time.perf_counter()
+
+    def _record_tick(
+        self,
+        scheduled: ScheduledTick,
+        deadline: float,
+        period: float,
+        start: float,
+        end: float,
+    ) -> None:
+        scheduled.stats.record(
+            max(start - deadline, 0.0) * 1000, (end - start) * 1000, period * 1000
+        )
+        if end - start > period and not scheduled.off_loop:
+            scheduled.off_loop = True
+            print(
+                f"{scheduled.pipeline.__class__.__name__}.tick took"
+                f" {(end - start) * 1000:.1f} ms, longer than its period;"
+                " running it in a worker thread from now on"
+            )
+
+    def _finish_tick(
+        self,
+        scheduled: ScheduledTick,
+        deadline: float,
+        period: float,
+        future: asyncio.Future,
+    ) -> None:
+        scheduled.in_flight = None
+        if future.cancelled():
+            return
+        self._record_tick(scheduled, deadline, period, *future.result())
+
+    def _run_tick(
+        self, scheduled: ScheduledTick, deadline: float, period: float
+    ) -> bool:
+        """Run or start a tick.
+
+        Args:
+            scheduled: The tick to run
+            deadline: When the tick was due
+            period: The tick period its duration is compared against
+
+        Returns:
+            bool: False if the tick was skipped because the previous tick of
+                the pipeline is still running in a worker thread
+        """
+        if scheduled.in_flight is not None:
+            return False
+        if scheduled.off_loop:
+            future = self._loop.run_in_executor(  # type: ignore
+                None, self._tick, scheduled
+            )
+            scheduled.in_flight = future
+            future.add_done_callback(
+                partial(self._finish_tick, scheduled, deadline, period)
+            )
+            return True
+        self._record_tick(scheduled, deadline, period, *self._tick(scheduled))
+        return True
+
+    def _run_frame_ticks(self) -> None:
+        for scheduled in self._frame_ticks:
+            if not self._run_tick(
+                scheduled, self._frame_time, self._frame_period or float("inf")
+            ):
+                scheduled.stats.missed += 1
+
+    def _run_due_ticks(self) -> None:
+        now = time.perf_counter()
+        while self._heap and self._heap[0][0] <= now:
+            deadline, _, scheduled = heapq.heappop(self._heap)
+            period = scheduled.period()
+            if not self._run_tick(scheduled, deadline, period):
+                scheduled.stats.missed += 1
+
+            next_deadline = deadline + period
+            now = time.perf_counter()
+            if next_deadline < now:
+                # fell behind: skip the missed ticks instead of bursting
+                missed = int((now - next_deadline) / period) + 1
+                scheduled.stats.missed += missed
+                next_deadline += missed * period
+            heapq.heappush(self._heap, (next_deadline, next(self._sequence), scheduled))
+
+    def format_report(self) -> str:
+        """Format the tick timing of every pipeline as a table.
+
+        Returns:
+            str: The report
+        """
+        lines = [
+            f"{'pipeline':<30} {'rate':>8} {'ticks':>8} {'overruns':>8} {'missed':>7}"
+            f" {'jitter ms':>10} {'max jitter':>10} {'tick ms':>8} {'max tick':>8}"
+        ]
+        for scheduled in self.scheduled:
+            stats = scheduled.stats
+            rate = (
+                "frame"
+                if scheduled.tick_rate == TickRate.EVERY_FRAME
+                else f"{scheduled.tick_rate:g}Hz"
+            )
+            lines.append(
+                f"{scheduled.pipeline.__class__.__name__:<30} {rate:>8}"
+                f" {stats.ticks:>8} {stats.overruns:>8} {stats.missed:>7}"
+                f" {stats.mean_jitter_ms:>10.2f} {stats.max_jitter_ms:>10.2f}"
+                f" {stats.mean_duration_ms:>8.2f} {stats.max_duration_ms:>8.2f}"
+            )
+        return "\n".join(lines)
+
+    async def run(self) -> None:
+        """Run the scheduled ticks forever."""
+        self._loop = asyncio.get_running_loop()
+        self._frame_event = asyncio.Event()
+        next_report = (
+            time.perf_counter() + self.report_interval_s
+            if self.report_interval_s
+            else None
+        )
+
+        while True:
+            timeout = None
+            if self._heap:
+                timeout = max(self._heap[0][0] - time.perf_counter(), 0.0)
+            if next_report is not None:
+                until_report = max(next_report - time.perf_counter(), 0.0)
+                timeout = (
+                    until_report if timeout is None else min(timeout, until_report)
+                )
+
+            try:
+                await asyncio.wait_for(self._frame_event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+            if self._frame_event.is_set():
+                self._frame_event.clear()
+                self._run_frame_ticks()
+
+            self._run_due_ticks()
+
+            if next_report is not None and time.perf_counter() >= next_report:
+                print(self.format_report())
+                next_report += self.report_interval_s  # type: ignore
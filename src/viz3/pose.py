@@ -0,0 +1,273 @@
+"""Batched rotation and pose conversions.
+
+Every function takes arrays of N poses and converts them in a few NumPy
+operations, instead of one scalar Python conversion per pose. The
+conventions are the ones used by the entity classes:
+
+- quaternions are (x, y, z, w), as assigned with `Vec4(x, y, z, w)` by
+  `Axes.set_rotation_matrix`, and are computed with the same Shepperd
+  branches, so both give identical quaternions
+- Euler angles are (pitch, yaw, roll) in degrees, as assigned to
+  `entity.rotation` by `AprilTag.set_rotation_matrix`, and are computed with
+  the same formulas
+
+Rotation matrices map local to world directions, acting on column vectors.
+"""
+
+import numpy as np
+
+
+def _as_matrices(rotation_matrices: np.ndarray) -> np.ndarray:
+    rotation_matrices = np.asarray(rotation_matrices, dtype=np.float64)
+    if rotation_matrices.shape[-2:] != (3, 3):
+        raise ValueError(
+            f"rotation matrices must have shape (N, 3, 3), got {rotation_matrices.shape}"
+        )
+    return rotation_matrices.reshape(-1, 3, 3)
+
+
+def rotation_matrices_to_quaternions(rotation_matrices: np.ndarray) -> np.ndarray:
+    """Convert rotation matrices to quaternions with Shepperd's method.
+
+    For each matrix the branch is chosen like `Axes.set_rotation_matrix`
+    does: the trace if it is positive, otherwise the largest diagonal element.
+
+    Args:
+        rotation_matrices: An (N, 3, 3) array of rotation matrices
+
+    Returns:
+        np.ndarray: An (N, 4) array of (x, y, z, w) quaternions
+    """
+    m = _as_matrices(rotation_matrices)
+    m00, m01, m02 = m[:, 0, 0], m[:, 0, 1], m[:, 0, 2]
+    m10, m11, m12 = m[:, 1, 0], m[:, 1, 1], m[:, 1, 2]
+    m20, m21, m22 = m[:, 2, 0], m[:, 2, 1], m[:, 2, 2]
+    trace = m00 + m11 + m22
+
+    use_trace = trace > 0
+    use_x = ~use_trace & (m00 > m11) & (m00 > m22)
+    use_y = ~use_trace & ~use_x & (m11 > m22)
+    use_z = ~use_trace & ~use_x & ~use_y
+
+    # the square root of each branch, clamped so unused branches stay finite
+    s = np.where(
+        use_trace,
+        np.sqrt(np.maximum(trace + 1.0, 1e-12)) * 2,
+        np.where(
+            use_x,
+            np.sqrt(np.maximum(1.0 + m00 - m11 - m22, 1e-12)) * 2,
+            np.where(
+                use_y,
+                np.sqrt(np.maximum(1.0 + m11 - m00 - m22, 1e-12)) * 2,
+                np.sqrt(np.maximum(1.0 + m22 - m00 - m11, 1e-12)) * 2,
+            ),
+        ),
+    )
+
+    quaternions = np.empty((len(m), 4), dtype=np.float64)
+    x, y, z, w = (quaternions[:, i] for i in range(4))
+    x[:] = np.select(
+        [use_trace, use_x, use_y, use_z],
+        [(m21 - m12) / s, 0.25 * s, (m01 + m10) / s, (m02 + m20) / s],
+    )
+    y[:] = np.select(
+        [use_trace, use_x, use_y, use_z],
+        [(m02 - m20) / s, (m01 + m10) / s, 0.25 * s, (m12 + m21) / s],
+    )
+    z[:] = np.select(
+        [use_trace, use_x, use_y, use_z],
+        [(m10 - m01) / s, (m02 + m20) / s, (m12 + m21) / s, 0.25 * s],
+    )
+    w[:] = np.select(
+        [use_trace, use_x, use_y, use_z],
+        [0.25 * s, (m21 - m12) / s, (m02 - m20) / s, (m10 - m01) / s],
+    )
+    return quaternions
+
+
+def quaternions_to_rotation_matrices(quaternions: np.ndarray) -> np.ndarray:
+    """Convert quaternions to rotation matrices.
+
+    The inverse of `rotation_matrices_to_quaternions`; quaternions are
+    normalized first.
+
+    Args:
+        quaternions: An (N, 4) array of (x, y, z, w) quaternions
+
+    Returns:
+        np.ndarray: An (N, 3, 3) array of rotation matrices
+    """
+    q = np.asarray(quaternions, dtype=np.float64).reshape(-1, 4)
+    q = q / np.linalg.norm(q, axis=1, keepdims=True)
+    x, y, z, w = q[:, 0], q[:, 1], q[:, 2], q[:, 3]
+
+    matrices = np.empty((len(q), 3, 3), dtype=np.float64)
+    matrices[:, 0, 0] = 1 - 2 * (y * y + z * z)
+    matrices[:, 0, 1] = 2 * (x * y - z * w)
+    matrices[:, 0, 2] = 2 * (x * z + y * w)
+    matrices[:, 1, 0] = 2 * (x * y + z * w)
+    matrices[:, 1, 1] = 1 - 2 * (x * x + z * z)
+    matrices[:, 1, 2] = 2 * (y * z - x * w)
+    matrices[:, 2, 0] = 2 * (x * z - y * w)
+    matrices[:, 2, 1] = 2 * (y * z + x * w)
+    matrices[:, 2, 2] = 1 - 2 * (x * x + y * y)
+    return matrices
+
+
+def rotation_matrices_to_euler(rotation_matrices: np.ndarray) -> np.ndarray:
+    """Convert rotation matrices to Euler angles like `AprilTag.set_rotation_matrix`.
+
+    Pitch and yaw are exact for matrices built by
+    `euler_to_rotation_matrices`; roll is exact when pitch or yaw is zero,
+    as in the scalar code.
+
+    Args:
+        rotation_matrices: An (N, 3, 3) array of rotation matrices
+
+    Returns:
+        np.ndarray: An (N, 3) array of (pitch, yaw, roll) angles in degrees
+    """
+    m = _as_matrices(rotation_matrices)
+    pitch = np.arctan2(-m[:, 2, 1], m[:, 2, 2])
+    yaw = np.arctan2(m[:, 2, 0], np.sqrt(m[:, 2, 1] ** 2 + m[:, 2, 2] ** 2))
+    roll = np.arctan2(-m[:, 0, 1], m[:, 1, 1])
+    return np.degrees(np.stack([pitch, yaw, roll], axis=1))
+
+
+def euler_to_rotation_matrices(angles: np.ndarray) -> np.ndarray:
+    """Convert Euler angles to rotation matrices.
+
+    Builds R = Rz(roll) Ry(-yaw) Rx(-pitch), the composition whose angles
+    `rotation_matrices_to_euler` recovers.
+
+    Args:
+        angles: An (N, 3) array of (pitch, yaw, roll) angles in degrees
+
+    Returns:
+        np.ndarray: An (N, 3, 3) array of rotation matrices
+    """
+    angles = np.radians(np.asarray(angles, dtype=np.float64).reshape(-1, 3))
+    cp, sp = np.cos(-angles[:, 0]), np.sin(-angles[:, 0])
+    cy, sy = np.cos(-angles[:, 1]), np.sin(-angles[:, 1])
+    cr, sr = np.cos(angles[:, 2]), np.sin(angles[:, 2])
+
+    matrices = np.empty((len(angles), 3, 3), dtype=np.float64)
+    matrices[:, 0, 0] = cr * cy
+    matrices[:, 0, 1] = cr * sy * sp - sr * cp
+    matrices[:, 0, 2] = cr * sy * cp + sr * sp
+    matrices[:, 1, 0] = sr * cy
+    matrices[:, 1, 1] = sr * sy * sp + cr * cp
+    matrices[:, 1, 2] = sr * sy * cp - cr * sp
+    matrices[:, 2, 0] = -sy
+    matrices[:, 2, 1] = cy * sp
+    matrices[:, 2, 2] = cy * cp
+    return matrices
+
+
+def quaternions_to_euler(quaternions: np.ndarray) -> np.ndarray:
+    """Convert (x, y, z, w) quaternions to (pitch, yaw, roll) degrees.
+
+    Args:
+        quaternions: An (N, 4) array of quaternions
+
+    Returns:
+        np.ndarray: An (N, 3) array of Euler angles
+    """
+    return rotation_matrices_to_euler(quaternions_to_rotation_matrices(quaternions))
+
+
+def euler_to_quaternions(angles: np.ndarray) -> np.ndarray:
+    """Convert (pitch, yaw, roll) degrees to (x, y, z, w) quaternions.
+
+    Args:
+        angles: An (N, 3) array of Euler angles
+
+    Returns:
+        np.ndarray: An (N, 4) array of quaternions
+    """
+    return rotation_matrices_to_quaternions(euler_to_rotation_matrices(angles))
+
+
+def compose_transforms(
+    positions: np.ndarray,
+    rotation_matrices: np.ndarray | None = None,
+    scales: np.ndarray | float | None = None,
+) -> np.ndarray:
+    """Build homogeneous transforms from their parts.
+
+    Args:
+        positions: An (N, 3) array of positions
+        rotation_matrices: Optional (N, 3, 3) rotation matrices; identity when
+            omitted
+        scales: Optional uniform scale, (3,) per-axis scale shared by every
+            transform or (N, 3) per-axis scales, applied before the rotation
+
+    Returns:
+        np.ndarray: An (N, 4, 4) float32 array of transforms
+    """
+    positions = np.asarray(positions, dtype=np.float32).reshape(-1, 3)
+    num_transforms = len(positions)
+
+    transforms = np.zeros((num_transforms, 4, 4), dtype=np.float32)
+    if rotation_matrices is None:
+        transforms[:, :3, :3] = np.eye(3, dtype=np.float32)
+    else:
+        transforms[:, :3, :3] = np.asarray(rotation_matrices).reshape(-1, 3, 3)
+    if scales is not None:
+        scales = np.asarray(scales, dtype=np.float32)
+        if scales.ndim == 0:
+            scales = np.full(3, scales, dtype=np.float32)
+        # scaling the local axes scales the columns of the rotation
+        transforms[:, :3, :3] *= scales.reshape(-1, 1, 3)
+    transforms[:, :3, 3] = positions
+    transforms[:, 3, 3] = 1.0
+    return transforms
+
+
+def decompose_transforms(transforms: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Split rigid homogeneous transforms into positions and rotations.
+
+    Args:
+        transforms: An (N, 4, 4) array of transforms without scale
+
+    Returns:
+        tuple: The (N, 3) positions and (N, 3, 3) rotation matrices
+    """
+    transforms = np.asarray(transforms).reshape(-1, 4, 4)
+    return transforms[:, :3, 3].copy(), transforms[:, :3, :3].copy()
+
+
+def invert_rigid_transforms(transforms: np.ndarray) -> np.ndarray:
+    """Invert rigid homogeneous transforms without a general matrix inverse.
+
+    Args:
+        transforms: An (N, 4, 4) array of transforms without scale
+
+    Returns:
+        np.ndarray: The (N, 4, 4) inverse transforms
+    """
+    transforms = np.asarray(transforms).reshape(-1, 4, 4)
+    rotations_t = np.swapaxes(transforms[:, :3, :3], 1, 2)
+    inverses = np.zeros_like(transforms)
+    inverses[:, :3, :3] = rotations_t
+    inverses[:, :3, 3] = -np.einsum("nij,nj->ni", rotations_t, transforms[:, :3, 3])
+    inverses[:, 3, 3] = 1
+    return inverses
+
+
+def transform_points(transforms: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """Apply homogeneous transforms to points.
+
+    Args:
+        transforms: A (4, 4) transform applied to every point, or (N, 4, 4)
+            transforms applied to the matching row of `points`
+        points: An (N, 3) array of points
+
+    Returns:
+        np.ndarray: The (N, 3) transformed points
+    """
+    transforms = np.asarray(transforms)
+    points = np.asarray(points).reshape(-1, 3)
+    if transforms.ndim == 2:
+        return points @ transforms[:3, :3].T + transforms[:3, 3]
+    return np.einsum("nij,nj->ni", transforms[:, :3, :3], points) + transforms[:, :3, 3]
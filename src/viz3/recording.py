@@ -0,0 +1,356 @@
+"""Recording and replay of topic traffic.
+
+A recording is a directory of memory-mapped log segments plus an index:
+
+- `segment-NNNNNN.log` files hold the records back to back; a segment is
+  preallocated at `segment_size` bytes, written through a memory map and
+  truncated to its used size when it is finished
+- `index.bin` holds one fixed-size entry per record with its timestamp and
+  location, so any record, or the first record after a timestamp, is found
+  without reading the records before it
+
+Windows that subscribe on their own each record the topics of their own
+pipelines, into a `window-N` directory inside the recording directory.
+"""
+
+import asyncio
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Awaitable, Callable, Iterator
+
+import numpy as np
+
+INDEX_FILE_NAME = "index.bin"
+# timestamp, topic length, payload length
+_RECORD_HEADER = struct.Struct("<dHI")
+INDEX_DTYPE = np.dtype(
+    [
+        ("timestamp", "<f8"),
+        ("segment", "<u4"),
+        ("offset", "<u8"),
+        ("length", "<u4"),
+    ]
+)
+
+
+def _segment_path(directory: Path, segment: int) -> Path:
+    return directory / f"segment-{segment:06d}.log"
+
+
+def window_recording_directory(
+    directory: str | Path, window_number: int | None
+) -> Path:
+    """Get the directory a window records its topic traffic to.
+
+    Args:
+        directory: The directory given with `--record`
+        window_number: The number of the window, or None for the only window
+
+    Returns:
+        Path: `directory` itself for the only window, its `window-N`
+            subdirectory otherwise
+    """
+    directory = Path(directory)
+    if window_number is None:
+        return directory
+    return directory / f"window-{window_number}"
+
+
+def find_window_recording(directory: str | Path, window_number: int | None) -> Path:
+    """Get the recording a window replays.
+
+    Args:
+        directory: The directory given with `--replay`
+        window_number: The number of the window, or None for the only window
+
+    Returns:
+        Path: The window's own recording if the directory holds one per
+            window, otherwise the directory, whose recording every window
+            replays
+    """
+    window_directory = window_recording_directory(directory, window_number)
+    if (window_directory / INDEX_FILE_NAME).exists():
+        return window_directory
+    return Path(directory)
+
+
+class Recorder:
+    """Appends `(timestamp, topic, payload)` records to a recording."""
+
+    def __init__(self, directory: str | Path, segment_size: int = 64 * 1024**2):
+        """Start a new recording.
+
+        Args:
+            directory: The directory to write to; created if it does not exist,
+                and must not contain a recording yet
+            segment_size: The size a segment is preallocated at; records
+                larger than this get a segment of their own
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if (self.directory / INDEX_FILE_NAME).exists():
+            raise FileExistsError(f"{self.directory} already contains a recording")
+
+        self.segment_size = segment_size
+        self.num_records = 0
+        self._segment = -1
+        self._segment_file = None
+        self._segment_map: mmap.mmap | None = None
+        self._offset = 0
+        self._index_file = open(self.directory / INDEX_FILE_NAME, "wb")
+        self._lock = threading.Lock()
+
+    def _finish_segment(self) -> None:
+        if self._segment_map is None:
+            return
+        self._segment_map.flush()
+        self._segment_map.close()
+        self._segment_file.truncate(self._offset)  # type: ignore
+        self._segment_file.close()  # type: ignore
+        self._segment_map = None
+
+    def _start_segment(self, min_size: int) -> None:
+        self._finish_segment()
+        self._segment += 1
+        size = max(self.segment_size, min_size)
+        self._segment_file = open(_segment_path(self.directory, self._segment), "w+b")
+        self._segment_file.truncate(size)
+        self._segment_map = mmap.mmap(self._segment_file.fileno(), size)
+        self._offset = 0
+
+    def record(self, topic: str, payload: bytes, timestamp: float | None = None):
+        """Append a record.
+
+        Args:
+            topic: The topic the payload was received on
+            payload: The raw message
+            timestamp: The receive time in seconds since the epoch; now when None
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        topic_bytes = topic.encode()
+        length = _RECORD_HEADER.size + len(topic_bytes) + len(payload)
+
+        with self._lock:
+            if self._segment_map is None or self._offset + length > len(
+                self._segment_map
+            ):
+                self._start_segment(length)
+
+            segment_map = self._segment_map
+            offset = self._offset
+            _RECORD_HEADER.pack_into(
+                segment_map, offset, timestamp, len(topic_bytes), len(payload)
+            )
+            start = offset + _RECORD_HEADER.size
+            segment_map[start : start + len(topic_bytes)] = topic_bytes
+            start += len(topic_bytes)
+            segment_map[start : start + len(payload)] = payload
+            self._offset += length
+
+            entry = np.array(
+                [(timestamp, self._segment, offset, length)], dtype=INDEX_DTYPE
+            )
+            self._index_file.write(entry.tobytes())
+            # the index decides what is in the recording, so records are
+            # readable even if the process is killed
+            self._index_file.flush()
+            self.num_records += 1
+
+    def callback(
+        self, topic: str, callback: Callable[[bytes], Awaitable[None]]
+    ) -> Callable[[bytes], Awaitable[None]]:
+        """Wrap a subscription callback so every message is recorded first.
+
+        Args:
+            topic: The topic the callback is subscribed to
+            callback: The callback to wrap
+
+        Returns:
+            Callable: The wrapped callback
+        """
+
+        async def recording_callback(message: bytes) -> None:
+            self.record(topic, message)
+            await callback(message)
+
+        return recording_callback
+
+    def close(self) -> None:
+        """Finish the recording."""
+        with self._lock:
+            self._finish_segment()
+            self._index_file.close()
+
+
+class Recording:
+    """Random access to a recording made by Recorder."""
+
+    def __init__(self, directory: str | Path) -> None:
+        """Open a recording.
+
+        Args:
+            directory: The directory the recording was written to
+        """
+        self.directory = Path(directory)
+        index_path = self.directory / INDEX_FILE_NAME
+        num_entries = os.path.getsize(index_path) // INDEX_DTYPE.itemsize
+        self.index = (
+            np.memmap(index_path, dtype=INDEX_DTYPE, mode="r", shape=(num_entries,))
+            if num_entries
+            else np.zeros(0, dtype=INDEX_DTYPE)
+        )
+        self._segment_maps: dict[int, mmap.mmap] = {}
+
+    def __len__(self) -> int:
+        """Get the number of records.
+
+        Returns:
+            int: The number of records
+        """
+        return len(self.index)
+
+    def start_time(self) -> float:
+        """Get the timestamp of the first record.
+
+        Returns:
+            float: Seconds since the epoch
+        """
+        return float(self.index["timestamp"][0]) if len(self) else 0.0
+
+    def duration(self) -> float:
+        """Get the time between the first and the last record.
+
+        Returns:
+            float: The duration in seconds
+        """
+        if not len(self):
+            return 0.0
+        return float(self.index["timestamp"][-1]) - self.start_time()
+
+    def seek(self, offset_s: float) -> int:
+        """Find the first record at or after a point in the recording.
+
+        Args:
+            offset_s: Seconds since the first record
+
+        Returns:
+            int: The position of the record, or len(self) if there is none
+        """
+        return int(
+            np.searchsorted(self.index["timestamp"], self.start_time() + offset_s)
+        )
+
+    def _segment_map(self, segment: int) -> mmap.mmap:
+        segment_map = self._segment_maps.get(segment)
+        if segment_map is None:
+            with open(_segment_path(self.directory, segment), "rb") as segment_file:
+                segment_map = mmap.mmap(
+                    segment_file.fileno(), 0, access=mmap.ACCESS_READ
+                )
+            self._segment_maps[segment] = segment_map
+        return segment_map
+
+    def read(self, position: int) -> tuple[float, str, bytes]:
+        """Read a record.
+
+        Args:
+            position: The position of the record
+
+        Returns:
+            tuple: The timestamp, topic and payload of the record
+        """
+        entry = self.index[position]
+        segment_map = self._segment_map(int(entry["segment"]))
+        offset = int(entry["offset"])
+        timestamp, topic_length, payload_length = _RECORD_HEADER.unpack_from(
+            segment_map, offset
+        )
+        start = offset + _RECORD_HEADER.size
+        topic = segment_map[start : start + topic_length].decode()
+        start += topic_length
+        return timestamp, topic, segment_map[start : start + payload_length]
+
+    def records(self, start: int = 0) -> Iterator[tuple[float, str, bytes]]:
+        """Iterate over the records from a position on.
+
+        Args:
+            start: The position of the first record
+
+        Yields:
+            tuple: The timestamp, topic and payload of every record
+        """
+        for position in range(start, len(self)):
+            yield self.read(position)
+
+    def close(self) -> None:
+        """Unmap the segments."""
+        for segment_map in self._segment_maps.values():
+            segment_map.close()
+        self._segment_maps.clear()
+
+
+class Replayer:
+    """Feeds a recording to subscribers, standing in for the Autobahn client.
+
+    Has the same `subscribe` call as Autobahn, so pipelines, deliveries and
+    the data hub subscribe to it unchanged; `run` then publishes the records
+    with their original timing scaled by `speed`.
+    """
+
+    def __init__(
+        self, recording: Recording, speed: float | None = 1.0, start_s: float = 0.0
+    ) -> None:
+        """Initialize the replayer.
+
+        Args:
+            recording: The recording to replay
+            speed: How many times faster than recorded to replay, or None to
+                replay as fast as the subscribers take the messages
+            start_s: Where to start, in seconds since the first record
+        """
+        self.recording = recording
+        self.speed = speed
+        self.start_s = start_s
+        self.replayed = 0
+        self._subscribers: dict[str, list[Callable[[bytes], Awaitable[None]]]] = (
+            defaultdict(list)
+        )
+
+    async def subscribe(
+        self, topic: str, callback: Callable[[bytes], Awaitable[None]]
+    ) -> None:
+        """Subscribe to a recorded topic.
+
+        Args:
+            topic: The topic to subscribe to
+            callback: Called with every recorded message of the topic
+        """
+        self._subscribers[topic].append(callback)
+
+    async def run(self) -> None:
+        """Replay the recording from `start_s` to its end."""
+        start = self.recording.seek(self.start_s)
+        if start >= len(self.recording):
+            return
+
+        first_timestamp = float(self.recording.index["timestamp"][start])
+        wall_start = time.perf_counter()
+        for timestamp, topic, payload in self.recording.records(start):
+            if self.speed is not None:
+                due = wall_start + (timestamp - first_timestamp) / self.speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            for callback in self._subscribers.get(topic, ()):
+                await callback(payload)
+            self.replayed += 1
+            if self.speed is None:
+                # let the deliveries run between messages
+                await asyncio.sleep(0)
@@ -1,12 +1,20 @@
 from typing import Any
 from ursina import *
 import numpy as np
+from .deferred_rebuild import DeferredRebuild
 
 
-class Axes(Entity):
+class Axes(DeferredRebuild, Entity):
+    """Red, green and blue bars along the X, Y and Z axes.
+
+    `set_thickness` is applied at the end of the frame, or of a
+    `with axes.batch():` block.
+    """
+
     def __init__(self, thickness: float = 0.02, **kwargs):
         super().__init__(**kwargs)
         self.scale = Vec3(1, 1, 1)
+        self.thickness = thickness
 
         # X axis
         self.x_axis = Entity(
@@ -40,6 +48,11 @@ class Axes(Entity):
         self.scale = scale
 
     def set_thickness(self, thickness: float):
+        self.thickness = thickness
+        self.mark_dirty("thickness")
+
+    def _rebuild(self, parts: set[str]):
+        thickness = self.thickness
         self.x_axis.scale = (self.x_axis.scale.x, thickness, thickness)
         self.y_axis.scale = (thickness, self.y_axis.scale.y, thickness)
         self.z_axis.scale = (thickness, thickness, self.z_axis.scale.z)
@@ -1,79 +1,405 @@
 from ursina import *
+import numpy as np
 from ursina.color import white
-from .custom_lowlevel_rendering import get_cube_point_verts, get_cube_triangles
+from .custom_lowlevel_rendering import (
+    PointCloudGeom,
+    PointRenderMode,
+    as_color_array,
+    as_point_array,
+    build_point_cloud_arrays,
+)
+from .deferred_rebuild import DeferredRebuild
 
 
 class BasePointCloud(Entity):
-    def __init__(self, point_size: float = 0.01, color=color.white, parent=None):
+    def __init__(
+        self,
+        point_size: float = 0.01,
+        color=color.white,
+        parent=None,
+        render_mode: PointRenderMode = PointRenderMode.CUBE,
+    ):
         super().__init__(parent=parent)
         self.point_size = point_size
+        self.render_mode = render_mode
         self.color = color
 
 
-class CubePointCloud(BasePointCloud):
+def build_point_cloud_mesh(
+    points,
+    point_size: float,
+    colors,
+    render_mode: PointRenderMode = PointRenderMode.CUBE,
+) -> Mesh:
+    """Build a mesh with one cube or one sized point per point.
+
+    Args:
+        points: An (N, 3) array-like of point positions
+        point_size: The side length of every point
+        colors: A single color, or an (N, 4) array-like of per-point colors
+        render_mode: How each point is drawn
+
+    Returns:
+        Mesh: The mesh, built without per-point Python objects
+    """
+    vertices, indices, vertex_colors = build_point_cloud_arrays(
+        points, point_size, colors, render_mode=render_mode
+    )
+    if render_mode == PointRenderMode.POINT:
+        mesh = Mesh(
+            vertices=vertices,
+            triangles=indices,
+            colors=vertex_colors,
+            mode="point",
+            thickness=point_size,
+            render_points_in_3d=True,
+        )
+        # a single vertex has no faces to light
+        mesh.set_light_off()
+        return mesh
+
+    return Mesh(
+        vertices=vertices, triangles=indices, colors=vertex_colors, mode="triangle"
+    )
+
+
+class CubePointCloud(DeferredRebuild, BasePointCloud):
+    """Point cloud whose mesh is rebuilt from all of its points on every change.
+
+    Changes through the setters and `extend_point_cloud` are collected and
+    rebuilt once at the end of the frame, or of a `with cloud.batch():` block.
+    """
+
     def __init__(
         self,
-        points: list[tuple[float, float, float]],
+        points: list[tuple[float, float, float]] | np.ndarray,
         point_size: float = 0.01,
         color=color.white,
         parent=None,
+        render_mode: PointRenderMode = PointRenderMode.CUBE,
     ):
-        super().__init__(point_size, color, parent)
-        self.points = points
+        super().__init__(point_size, color, parent, render_mode)
+        self.points = as_point_array(points)
         self._render_point_cloud()
 
     def _render_point_cloud(self):
-        vertices = []
-        tris = []
-        colors = []
+        self.model = build_point_cloud_mesh(
+            self.points, self.point_size, self.color, self.render_mode
+        )
 
-        for i, pos in enumerate(self.points):
-            base_idx = i * 8
-            x, y, z = pos
-            vertices.extend(get_cube_point_verts(x, y, z, self.point_size))
+    def _rebuild(self, parts: set[str]):
+        self._render_point_cloud()
 
-            tris.extend(get_cube_triangles(base_idx))
+    def set_points(self, points: list[tuple[float, float, float]] | np.ndarray):
+        """Replace every point of the cloud.
 
-            point_color = self.color[i] if isinstance(self.color, list) else self.color
-            colors.extend([point_color] * 8)
+        Args:
+            points: An (N, 3) array-like of point positions
+        """
+        self.points = as_point_array(points)
+        self.mark_dirty("mesh")
 
-        mesh = Mesh(vertices=vertices, triangles=tris, colors=colors, mode="triangle")
-        self.model = mesh
+    def set_point_size(self, point_size: float):
+        """Change the side length of every point.
 
-    def extend_point_cloud(self, added_points: list[tuple[float, float, float]]):
-        self.points.extend(added_points)
-        self._render_point_cloud()
+        Args:
+            point_size: The new side length
+        """
+        self.point_size = point_size
+        self.mark_dirty("mesh")
 
+    def extend_point_cloud(
+        self, added_points: list[tuple[float, float, float]] | np.ndarray
+    ):
+        self.points = np.concatenate([self.points, as_point_array(added_points)])
+        self.mark_dirty("mesh")
+
+
+class NamedCubePointCloud(DeferredRebuild, BasePointCloud):
+    """Point cloud of named points that can be moved, added and removed one at a time.
+
+    Every name is mapped to a fixed slot of preallocated geometry. Moving,
+    adding or removing a point only rewrites the rows of its own slot, and the
+    slots of removed points are reused through a free list. `points_dict`
+    changes right away, while the slot writes are collected and done in one
+    pass at the end of the frame, or of a `with cloud.batch():` block, so a
+    point moved several times in a frame is only written once.
+    """
 
-class NamedCubePointCloud(BasePointCloud):
     def __init__(
         self,
         points: dict[str, tuple[float, float, float]],
         point_size: float = 0.01,
         color=color.white,
         parent=None,
+        render_mode: PointRenderMode = PointRenderMode.CUBE,
+        initial_capacity: int = 64,
     ):
-        super().__init__(point_size, color, parent)
-        self.points_dict = points
+        """Initialize the point cloud.
+
+        Args:
+            points: The initial points by name
+            point_size: The side length of every point
+            color: The color of every point, or a list with the color of each
+                initial point, in the order of `points`
+            parent: The parent entity
+            render_mode: How each point is drawn
+            initial_capacity: The number of points to preallocate storage for
+        """
+        per_point_colors = isinstance(color, list)
+        super().__init__(
+            point_size, white if per_point_colors else color, parent, render_mode
+        )
+        self.points_dict: dict[str, tuple[float, float, float]] = {}
+        # colors of points with a color of their own, by name, which the
+        # cloud's color tints
+        self.point_colors: dict[str, Color] = {}
+        self.slots: dict[str, int] = {}
+        self._free_slots: list[int] = []
+        # the live slot every free slot is drawn on top of, or None
+        self._hidden_anchor: int | None = None
+        # slot writes and removals waiting for the next rebuild
+        self._pending_writes: dict[str, tuple[float, float, float]] = {}
+        self._pending_removals: set[str] = set()
+        self._geom = PointCloudGeom(
+            point_size, max(initial_capacity, len(points)), render_mode
+        )
+
+        self.model = NodePath("named_point_cloud")
+        self.model.attach_new_node(self._geom.node)
+
+        with self.batch():
+            self.extend_point_cloud(
+                points, dict(zip(points, color)) if per_point_colors else None
+            )
+
+    def __len__(self) -> int:
+        """Get the number of named points.
+
+        Returns:
+            int: The number of named points
+        """
+        return len(self.points_dict)
 
     def _render_point_cloud(self):
-        vertices = []
-        tris = []
-        colors = []
+        """Rewrite every slot from `points_dict`."""
+        self._geom.clear()
+        self.slots = {}
+        self._free_slots = []
+        self._hidden_anchor = None
+        self._pending_removals.clear()
+        self._pending_writes = dict(self.points_dict)
+        self._write_pending()
+
+    def _rebuild(self, parts: set[str]):
+        self._write_pending()
+
+    def _write_pending(self):
+        """Write the pending points and hide the slots of removed ones."""
+        freed = [self.slots.pop(name) for name in self._pending_removals]
+        self._pending_removals.clear()
+        self._free_slots.extend(freed)
+
+        if self._pending_writes:
+            writes = self._pending_writes
+            self._pending_writes = {}
+            slots = np.empty(len(writes), dtype=np.int64)
+            for i, name in enumerate(writes):
+                slot = self.slots.get(name)
+                if slot is None:
+                    slot = (
+                        self._free_slots.pop() if self._free_slots else len(self.slots)
+                    )
+                    self.slots[name] = slot
+                slots[i] = slot
 
-        for i, (name, pos) in enumerate(self.points_dict.items()):
-            base_idx = i * 8
-            x, y, z = pos
-            vertices.extend(get_cube_point_verts(x, y, z, self.point_size))
+            points = as_point_array(list(writes.values()))
+            # the cloud's color tints the whole entity, so points without a
+            # color of their own are white
+            colors = (
+                [self.point_colors.get(name, white) for name in writes]
+                if self.point_colors
+                else white
+            )
+            self._geom.write_slots(slots, points, as_color_array(colors, len(points)))
 
-            tris.extend(get_cube_triangles(base_idx))
+        if not self.slots:
+            self._geom.clear()
+            self._free_slots = []
+            self._hidden_anchor = None
+            return
 
-            point_color = self.color[i] if isinstance(self.color, list) else self.color
-            colors.extend([point_color] * 8)
+        if self._hidden_anchor is None or self._hidden_anchor in freed:
+            # the free slots point at the anchor's rows, which are now free
+            # themselves, so point all of them at a live slot
+            self._hidden_anchor = next(iter(self.slots.values()))
+            hidden = self._free_slots
+        else:
+            # freed slots that were not reused by a write are still drawn
+            free = set(self._free_slots)
+            hidden = [slot for slot in freed if slot in free]
+        if hidden:
+            self._geom.hide_slots(np.array(hidden), self._hidden_anchor)
 
-        mesh = Mesh(vertices=vertices, triangles=tris, colors=colors, mode="triangle")
-        self.model = mesh
+    def extend_point_cloud(
+        self,
+        added_points: dict[str, tuple[float, float, float]],
+        colors: dict[str, Color] | None = None,
+    ):
+        """Add new named points and move existing ones.
+
+        Args:
+            added_points: Point positions by name
+            colors: Colors of some of the points by name, tinted by the cloud's
+                color; points without one keep their color
+        """
+        if not added_points:
+            return
 
-    def extend_point_cloud(self, added_points: dict[str, tuple[float, float, float]]):
         self.points_dict.update(added_points)
-        self._render_point_cloud()
+        if colors:
+            self.point_colors.update(
+                (name, point_color)
+                for name, point_color in colors.items()
+                if name in added_points
+            )
+        self._pending_writes.update(added_points)
+        self._pending_removals.difference_update(added_points)
+        self.mark_dirty("points")
+
+    def set_point(
+        self,
+        name: str,
+        position: tuple[float, float, float],
+        point_color: Color | None = None,
+    ):
+        """Add or move a single named point.
+
+        Args:
+            name: The name of the point
+            position: The new position of the point
+            point_color: The new color of the point, or None to keep its color
+        """
+        self.extend_point_cloud(
+            {name: position}, {name: point_color} if point_color is not None else None
+        )
+
+    def remove_points(self, names: list[str]):
+        """Remove named points, freeing their slots for reuse.
+
+        Args:
+            names: The names of the points to remove; unknown names are ignored
+        """
+        removed = False
+        for name in names:
+            if self.points_dict.pop(name, None) is None:
+                continue
+            removed = True
+            self.point_colors.pop(name, None)
+            self._pending_writes.pop(name, None)
+            if name in self.slots:
+                self._pending_removals.add(name)
+        if removed:
+            self.mark_dirty("points")
+
+    def remove_point(self, name: str):
+        """Remove a single named point.
+
+        Args:
+            name: The name of the point to remove
+        """
+        self.remove_points([name])
+
+
+class StreamingPointCloud(BasePointCloud):
+    """Append-only point cloud whose cost per append depends only on the new points.
+
+    Points are stored in chunks of preallocated geometry. The last chunk
+    doubles its storage when it fills up, until it reaches `chunk_capacity`
+    points, after which a new chunk is started. Appending only writes the rows
+    of the new points, and full chunks are never modified again, so the data
+    Panda3D has to re-upload after an append is bounded by the chunk size.
+    """
+
+    def __init__(
+        self,
+        points: list[tuple[float, float, float]] | np.ndarray | None = None,
+        point_size: float = 0.01,
+        color=color.white,
+        initial_capacity: int = 1024,
+        chunk_capacity: int = 65536,
+        parent=None,
+        render_mode: PointRenderMode = PointRenderMode.CUBE,
+    ):
+        """Initialize the point cloud.
+
+        Args:
+            points: Optional initial (N, 3) point positions
+            point_size: The side length of every point
+            color: The color of the whole cloud, multiplied with per-point colors
+            initial_capacity: The number of points preallocated for a new chunk
+            chunk_capacity: The maximum number of points per chunk
+            parent: The parent entity
+            render_mode: How each point is drawn
+        """
+        super().__init__(point_size, color, parent, render_mode)
+        self.initial_capacity = min(initial_capacity, chunk_capacity)
+        self.chunk_capacity = chunk_capacity
+        self.chunks: list[PointCloudGeom] = []
+        self.num_points = 0
+
+        self.model = NodePath("streaming_point_cloud")
+
+        if points is not None:
+            self.extend_point_cloud(points)
+
+    def __len__(self) -> int:
+        """Get the number of points in the cloud.
+
+        Returns:
+            int: The number of points appended so far
+        """
+        return self.num_points
+
+    def _new_chunk(self) -> PointCloudGeom:
+        chunk = PointCloudGeom(
+            self.point_size,
+            self.initial_capacity,
+            self.render_mode,
+            max_capacity=self.chunk_capacity,
+        )
+        self.model.attach_new_node(chunk.node)
+        self.chunks.append(chunk)
+        return chunk
+
+    def extend_point_cloud(
+        self,
+        added_points: list[tuple[float, float, float]] | np.ndarray,
+        colors: np.ndarray | None = None,
+    ):
+        """Append points to the cloud.
+
+        Args:
+            added_points: An (K, 3) array-like of point positions
+            colors: Optional (K, 4) per-point colors; white when omitted
+        """
+        added_points = as_point_array(added_points)
+        added_colors = as_color_array(
+            color.white if colors is None else colors, len(added_points)
+        )
+
+        written = 0
+        while written < len(added_points):
+            chunk = self.chunks[-1] if self.chunks else None
+            if chunk is None or chunk.count >= self.chunk_capacity:
+                chunk = self._new_chunk()
+
+            take = min(self.chunk_capacity - chunk.count, len(added_points) - written)
+            chunk.write_points(
+                chunk.count,
+                added_points[written : written + take],
+                added_colors[written : written + take],
+            )
+            written += take
+
+        self.num_points += written
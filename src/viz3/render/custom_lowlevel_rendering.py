@@ -1,3 +1,58 @@
+from enum import Enum
+import numpy as np
+import panda3d.core as p3d
+
+
+class PointRenderMode(Enum):
+    """How each point of a point cloud is drawn."""
+
+    # 8 vertices and 12 triangles per point
+    CUBE = "cube"
+    # a single vertex per point, drawn as a camera-facing square whose side
+    # is given in world units
+    POINT = "point"
+
+
+# Corner offsets of a unit cube centered on the origin, in the same order as
+# the vertices returned by get_cube_point_verts.
+CUBE_CORNER_OFFSETS = np.array(
+    [
+        (-0.5, -0.5, -0.5),
+        (0.5, -0.5, -0.5),
+        (0.5, 0.5, -0.5),
+        (-0.5, 0.5, -0.5),
+        (-0.5, -0.5, 0.5),
+        (0.5, -0.5, 0.5),
+        (0.5, 0.5, 0.5),
+        (-0.5, 0.5, 0.5),
+    ],
+    dtype=np.float32,
+)
+
+CUBE_FACES = [
+    [0, 1, 2, 3],  # front
+    [1, 5, 6, 2],  # right
+    [5, 4, 7, 6],  # back
+    [4, 0, 3, 7],  # left
+    [3, 2, 6, 7],  # top
+    [4, 5, 1, 0],  # bottom
+]
+
+# Triangle indices of a single cube relative to its first vertex, in the same
+# order as the triangles returned by get_cube_triangles.
+CUBE_TRIANGLE_INDICES = np.array(
+    [
+        triangle
+        for face in CUBE_FACES
+        for triangle in ((face[0], face[1], face[2]), (face[0], face[2], face[3]))
+    ],
+    dtype=np.uint32,
+)
+
+VERTICES_PER_CUBE = len(CUBE_CORNER_OFFSETS)
+INDICES_PER_CUBE = CUBE_TRIANGLE_INDICES.size
+
+
 def get_cube_point_verts(x, y, z, side_size):
     half_size = side_size / 2
     return [
@@ -13,18 +68,425 @@ def get_cube_point_verts(x, y, z, side_size):
 
 
 def get_cube_triangles(base_idx):
-    faces = [
-        [0, 1, 2, 3],  # front
-        [1, 5, 6, 2],  # right
-        [5, 4, 7, 6],  # back
-        [4, 0, 3, 7],  # left
-        [3, 2, 6, 7],  # top
-        [4, 5, 1, 0],  # bottom
-    ]
-
     triangles = []
-    for face in faces:
+    for face in CUBE_FACES:
         triangles.append((base_idx + face[0], base_idx + face[1], base_idx + face[2]))
         triangles.append((base_idx + face[0], base_idx + face[2], base_idx + face[3]))
 
     return triangles
+
+
+def as_point_array(points) -> np.ndarray:
+    """Convert points to a contiguous (N, 3) float32 array.
+
+    Args:
+        points: An (N, 3) array-like of point positions
+
+    Returns:
+        np.ndarray: The points as a C-contiguous float32 array
+    """
+    points = np.ascontiguousarray(points, dtype=np.float32)
+    if points.size == 0:
+        return points.reshape(0, 3)
+    if points.ndim != 2 or points.shape[1] != 3:
+        raise ValueError(f"points must have shape (N, 3), got {points.shape}")
+    return points
+
+
+def as_color_array(colors, num_points: int) -> np.ndarray:
+    """Convert a single color or per-point colors to an (N, 4) float32 array.
+
+    Args:
+        colors: A single RGBA color, or an (N, 4) array-like of RGBA colors
+        num_points: The number of points N the colors belong to
+
+    Returns:
+        np.ndarray: The per-point colors as a C-contiguous float32 array
+    """
+    colors = np.asarray(colors, dtype=np.float32)
+    if colors.ndim == 1:
+        colors = np.broadcast_to(colors, (num_points, 4))
+    if colors.shape != (num_points, 4):
+        raise ValueError(
+            f"colors must have shape (4,) or ({num_points}, 4), got {colors.shape}"
+        )
+    return np.ascontiguousarray(colors)
+
+
+def build_cube_mesh_arrays(
+    points: np.ndarray,
+    side_size: float,
+    colors: np.ndarray | None = None,
+    base_index: int = 0,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray | None]:
+    """Build cube vertex, index and color buffers for many points at once.
+
+    This is the vectorized equivalent of calling get_cube_point_verts and
+    get_cube_triangles for every point. The returned buffers are flat, so they
+    can be handed to `Mesh` without creating any per-point Python objects.
+
+    Args:
+        points: An (N, 3) array of cube centers
+        side_size: The side length of every cube
+        colors: Optional (N, 4) array of per-point RGBA colors, or a single color
+        base_index: Vertex index of the first cube, used when appending to an
+            existing vertex buffer
+
+    Returns:
+        tuple: Flat float32 vertices (N * 8 * 3), flat uint32 triangle indices
+        (N * 36) and flat float32 vertex colors (N * 8 * 4) or None when no
+        colors were given
+    """
+    points = as_point_array(points)
+    num_points = len(points)
+
+    vertices = points[:, np.newaxis, :] + CUBE_CORNER_OFFSETS * np.float32(side_size)
+
+    first_vertices = (
+        np.arange(num_points, dtype=np.uint32) * VERTICES_PER_CUBE + base_index
+    )
+    triangles = first_vertices[:, np.newaxis] + CUBE_TRIANGLE_INDICES.reshape(1, -1)
+
+    vertex_colors = None
+    if colors is not None:
+        point_colors = as_color_array(colors, num_points)
+        vertex_colors = np.repeat(point_colors, VERTICES_PER_CUBE, axis=0).reshape(-1)
+
+    return vertices.reshape(-1), triangles.reshape(-1), vertex_colors
+
+
+def build_point_mesh_arrays(
+    points: np.ndarray,
+    colors: np.ndarray | None = None,
+    base_index: int = 0,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray | None]:
+    """Build single-vertex-per-point vertex, index and color buffers.
+
+    Args:
+        points: An (N, 3) array of point positions
+        colors: Optional (N, 4) array of per-point RGBA colors, or a single color
+        base_index: Vertex index of the first point
+
+    Returns:
+        tuple: Flat float32 vertices (N * 3), uint32 point indices (N) and flat
+        float32 vertex colors (N * 4) or None when no colors were given
+    """
+    points = as_point_array(points)
+    num_points = len(points)
+
+    indices = np.arange(base_index, base_index + num_points, dtype=np.uint32)
+
+    vertex_colors = None
+    if colors is not None:
+        vertex_colors = as_color_array(colors, num_points).reshape(-1)
+
+    return points.reshape(-1), indices, vertex_colors
+
+
+def build_point_cloud_arrays(
+    points: np.ndarray,
+    point_size: float,
+    colors: np.ndarray | None = None,
+    base_index: int = 0,
+    render_mode: PointRenderMode = PointRenderMode.CUBE,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray | None]:
+    """Build the vertex, index and color buffers for the given render mode.
+
+    Args:
+        points: An (N, 3) array of point positions
+        point_size: The side length of every point
+        colors: Optional (N, 4) array of per-point RGBA colors, or a single color
+        base_index: Vertex index of the first point
+        render_mode: How each point is drawn
+
+    Returns:
+        tuple: Flat vertices, indices and colors, see build_cube_mesh_arrays
+    """
+    if render_mode == PointRenderMode.POINT:
+        return build_point_mesh_arrays(points, colors, base_index)
+    return build_cube_mesh_arrays(points, point_size, colors, base_index)
+
+
+def vertices_per_point(render_mode: PointRenderMode) -> int:
+    """Get the number of vertices each point uses in the given render mode.
+
+    Returns:
+        int: The number of vertices per point
+    """
+    return 1 if render_mode == PointRenderMode.POINT else VERTICES_PER_CUBE
+
+
+def indices_per_point(render_mode: PointRenderMode) -> int:
+    """Get the number of primitive indices each point uses in the given render mode.
+
+    Returns:
+        int: The number of indices per point
+    """
+    return 1 if render_mode == PointRenderMode.POINT else INDICES_PER_CUBE
+
+
+def point_index_pattern(render_mode: PointRenderMode) -> np.ndarray:
+    """Get the primitive indices of one point, relative to its first vertex.
+
+    Returns:
+        np.ndarray: The uint32 index pattern of a single point
+    """
+    if render_mode == PointRenderMode.POINT:
+        return np.zeros(1, dtype=np.uint32)
+    return CUBE_TRIANGLE_INDICES.reshape(-1)
+
+
+def point_render_state(point_size: float) -> p3d.RenderState:
+    """Create the render state for single-vertex points.
+
+    Points are sized in world units, so they shrink with distance like cubes
+    do, and are unlit, since a point has no faces to light. Panda3D expands
+    perspective points into camera-facing quads on the CPU when the graphics
+    backend cannot, so this also works with the software and offscreen
+    renderers.
+
+    Args:
+        point_size: The side length of every point in world units
+
+    Returns:
+        RenderState: The render state to apply to the point geometry
+    """
+    return p3d.RenderState.make(
+        p3d.RenderModeAttrib.make(p3d.RenderModeAttrib.M_unchanged, point_size, True),
+        p3d.LightAttrib.make_all_off(),
+    )
+
+
+def _point_cloud_vertex_format() -> p3d.GeomVertexFormat:
+    """Create the vertex format used by PointCloudGeom.
+
+    Positions and colors live in separate arrays, so each one can be written
+    with a single contiguous copy.
+
+    Returns:
+        GeomVertexFormat: The registered vertex format
+    """
+    vertex_format = p3d.GeomVertexFormat()
+    vertex_format.add_array(p3d.GeomVertexFormat.get_v3().arrays[0])
+    vertex_format.add_array(
+        p3d.GeomVertexArrayFormat("color", 4, p3d.Geom.NT_float32, p3d.Geom.C_color)
+    )
+    return p3d.GeomVertexFormat.register_format(vertex_format)
+
+
+def _write_rows(array_data, start_row: int, values: np.ndarray) -> None:
+    """Copy a flat array into a Panda3D array, starting at the given row.
+
+    Args:
+        array_data: A modifiable GeomVertexArrayData
+        start_row: The first row to overwrite
+        values: The flat values to write, in the array's numeric type
+    """
+    row_size = array_data.get_array_format().get_stride()
+    start = start_row * row_size
+    target = memoryview(array_data).cast("B")
+    target[start : start + values.nbytes] = memoryview(values).cast("B")
+
+
+def _rows_view(array_data, dtype: type, width: int) -> np.ndarray:
+    """View a Panda3D array as a writable (rows, width) NumPy array.
+
+    Args:
+        array_data: A modifiable GeomVertexArrayData
+        dtype: The numeric type of the array's single column
+        width: The number of components per row
+
+    Returns:
+        np.ndarray: A view sharing memory with the Panda3D array
+    """
+    return np.frombuffer(memoryview(array_data).cast("B"), dtype=dtype).reshape(
+        -1, width
+    )
+
+
+class PointCloudGeom:
+    """Point cloud geometry with preallocated storage that grows by doubling.
+
+    Every point owns a fixed slot of vertices and primitive indices, 8 and 36
+    for cubes or 1 and 1 for single-vertex points. Slots can be written
+    individually, and only the rows of the written slots are touched, so the
+    cost of a write depends on the number of points written rather than on the
+    size of the cloud. When a write goes past the current
+    capacity, the storage doubles, up to `max_capacity`, and the existing
+    rows are kept.
+    """
+
+    def __init__(
+        self,
+        point_size: float,
+        capacity: int = 1024,
+        render_mode: PointRenderMode = PointRenderMode.CUBE,
+        max_capacity: int | None = None,
+    ) -> None:
+        """Initialize empty point cloud geometry.
+
+        Args:
+            point_size: The side length of every point
+            capacity: The number of points to preallocate storage for
+            render_mode: How each point is drawn
+            max_capacity: The most points the storage may grow to, or None
+                for no limit
+        """
+        self.point_size = point_size
+        self.render_mode = render_mode
+        self.max_capacity = max_capacity
+        self.capacity = 0
+        self.count = 0
+        self._vertices_per_point = vertices_per_point(render_mode)
+        self._indices_per_point = indices_per_point(render_mode)
+
+        vertex_data = p3d.GeomVertexData(
+            "point_cloud", _point_cloud_vertex_format(), p3d.Geom.UH_dynamic
+        )
+        if render_mode == PointRenderMode.POINT:
+            primitive = p3d.GeomPoints(p3d.Geom.UH_dynamic)
+        else:
+            primitive = p3d.GeomTriangles(p3d.Geom.UH_dynamic)
+        primitive.set_index_type(p3d.Geom.NT_uint32)
+        geom = p3d.Geom(vertex_data)
+        geom.add_primitive(primitive)
+
+        self.node = p3d.GeomNode("point_cloud_geom")
+        self.node.add_geom(geom)
+        if render_mode == PointRenderMode.POINT:
+            self.node.set_state(point_render_state(point_size))
+        self._reserve(max(capacity, 1))
+
+    def _reserve(self, capacity: int) -> None:
+        """Grow the vertex and index storage to hold at least `capacity` points.
+
+        Args:
+            capacity: The minimum number of points the storage must hold
+
+        Raises:
+            ValueError: If `capacity` is larger than `max_capacity`
+        """
+        if capacity <= self.capacity:
+            return
+        if self.max_capacity is not None and capacity > self.max_capacity:
+            raise ValueError(
+                f"{capacity} points do not fit in storage of at most"
+                f" {self.max_capacity} points"
+            )
+
+        new_capacity = max(capacity, self.capacity * 2)
+        if self.max_capacity is not None:
+            new_capacity = min(new_capacity, self.max_capacity)
+        geom = self.node.modify_geom(0)
+        geom.modify_vertex_data().set_num_rows(new_capacity * self._vertices_per_point)
+        geom.modify_primitive(0).modify_vertices().reserve_num_rows(
+            new_capacity * self._indices_per_point
+        )
+        self.capacity = new_capacity
+
+    def write_points(self, start: int, points: np.ndarray, colors: np.ndarray) -> None:
+        """Write points into consecutive slots, growing the storage if needed.
+
+        Slots past the current count become visible, and the slots in between
+        are drawn as well, so callers normally write at `count` or below.
+
+        Args:
+            start: The slot of the first point
+            points: An (K, 3) array of point positions
+            colors: An (K, 4) array of per-point colors
+        """
+        points = as_point_array(points)
+        end = start + len(points)
+        if end == start:
+            return
+
+        self._reserve(end)
+
+        first_vertex = start * self._vertices_per_point
+        vertices, indices, vertex_colors = build_point_cloud_arrays(
+            points, self.point_size, colors, first_vertex, self.render_mode
+        )
+
+        geom = self.node.modify_geom(0)
+        vertex_data = geom.modify_vertex_data()
+        _write_rows(vertex_data.modify_array(0), first_vertex, vertices)
+        _write_rows(vertex_data.modify_array(1), first_vertex, vertex_colors)
+
+        index_data = geom.modify_primitive(0).modify_vertices()
+        if end > self.count:
+            index_data.set_num_rows(end * self._indices_per_point)
+            self.count = end
+        _write_rows(index_data, start * self._indices_per_point, indices)
+
+    def write_slots(
+        self, slots: np.ndarray, points: np.ndarray, colors: np.ndarray
+    ) -> None:
+        """Write points into arbitrary slots, growing the storage if needed.
+
+        Only the vertex and index rows of the given slots are rewritten.
+
+        Args:
+            slots: A (K,) array of slot numbers
+            points: An (K, 3) array of point positions
+            colors: An (K, 4) array of per-point colors
+        """
+        slots = np.asarray(slots, dtype=np.int64).reshape(-1)
+        if len(slots) == 0:
+            return
+
+        end = int(slots.max()) + 1
+        self._reserve(end)
+
+        vertices, _, vertex_colors = build_point_cloud_arrays(
+            points, self.point_size, colors, render_mode=self.render_mode
+        )
+        first_vertices = slots * self._vertices_per_point
+        vertex_rows = (
+            first_vertices[:, np.newaxis] + np.arange(self._vertices_per_point)
+        ).reshape(-1)
+        indices = (
+            first_vertices[:, np.newaxis] + point_index_pattern(self.render_mode)
+        ).astype(np.uint32)
+
+        geom = self.node.modify_geom(0)
+        vertex_data = geom.modify_vertex_data()
+        _rows_view(vertex_data.modify_array(0), np.float32, 3)[vertex_rows] = (
+            vertices.reshape(-1, 3)
+        )
+        _rows_view(vertex_data.modify_array(1), np.float32, 4)[vertex_rows] = (
+            vertex_colors.reshape(-1, 4)
+        )
+
+        index_data = geom.modify_primitive(0).modify_vertices()
+        if end > self.count:
+            index_data.set_num_rows(end * self._indices_per_point)
+            self.count = end
+        _rows_view(index_data, np.uint32, self._indices_per_point)[slots] = indices
+
+    def hide_slots(self, slots: np.ndarray, visible_slot: int) -> None:
+        """Stop drawing the given slots without moving any other slot.
+
+        The index rows of each hidden slot are pointed at the first vertex of
+        `visible_slot`, so cubes collapse into degenerate triangles and single
+        points are drawn on top of an existing point. Writing to a hidden slot
+        makes it visible again. Hidden slots draw whatever `visible_slot`
+        holds, so hide them again on another slot when `visible_slot` itself
+        is hidden.
+
+        Args:
+            slots: A (K,) array of slot numbers to hide
+            visible_slot: A slot that is still drawn
+        """
+        slots = np.asarray(slots, dtype=np.int64).reshape(-1)
+        if len(slots) == 0:
+            return
+
+        index_data = self.node.modify_geom(0).modify_primitive(0).modify_vertices()
+        _rows_view(index_data, np.uint32, self._indices_per_point)[slots] = (
+            visible_slot * self._vertices_per_point
+        )
+
+    def clear(self) -> None:
+        """Stop drawing all slots, keeping the allocated storage."""
+        self.node.modify_geom(0).modify_primitive(0).modify_vertices().set_num_rows(0)
+        self.count = 0
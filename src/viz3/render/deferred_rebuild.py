@@ -0,0 +1,138 @@
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+from ursina import application
+
+# after Ursina's update task (0) and intervals (20), before rendering (50)
+_FLUSH_TASK_SORT = 40
+
+# dirty objects waiting for the end of the frame, by id
+_pending: dict[int, "DeferredRebuild"] = {}
+_flush_task = None
+# guards `_pending` and the dirty parts of every object, since pipelines
+# call setters from the event loop thread while the render thread flushes
+_lock = threading.Lock()
+
+
+def flush_deferred_rebuilds() -> int:
+    """Rebuild every object with pending changes now.
+
+    Runs once per frame before rendering on its own; call it to apply
+    changes without rendering a frame, such as in headless code.
+
+    Returns:
+        int: The number of rebuilt objects
+    """
+    global _pending
+    # objects marked from here on are rebuilt by the next flush
+    with _lock:
+        pending, _pending = _pending, {}
+    rebuilt = 0
+    for obj in pending.values():
+        try:
+            rebuilt += obj.flush()
+        except Exception as e:
+            print(f"Error rebuilding {type(obj).__name__}: {e}")
+    return rebuilt
+
+
+def _flush_every_frame(task):
+    flush_deferred_rebuilds()
+    return task.cont
+
+
+def _schedule(obj: "DeferredRebuild") -> bool:
+    """Queue an object for the end-of-frame rebuild; call with `_lock` held.
+
+    Returns:
+        bool: False if there is no Ursina app to run frames, so the caller
+            has to rebuild right away
+    """
+    global _flush_task
+    if _flush_task is None:
+        if application.base is None:
+            return False
+        _flush_task = application.base.taskMgr.add(
+            _flush_every_frame, "viz3_deferred_rebuilds", sort=_FLUSH_TASK_SORT
+        )
+    _pending[id(obj)] = obj
+    return True
+
+
+class DeferredRebuild:
+    """Mixin for entities whose setters would otherwise rebuild them every call.
+
+    Setters record which parts of the object changed with `mark_dirty` and
+    return. Every dirty object is rebuilt once through `_rebuild`, after the
+    frame's updates and before the frame is rendered, so a burst of changes
+    in one frame costs a single rebuild. Changes made inside
+    `with entity.batch():` are rebuilt when the block ends instead, and
+    `flush` rebuilds right away. Without an Ursina app every change is
+    rebuilt immediately.
+    """
+
+    def mark_dirty(self, *parts: str) -> None:
+        """Record that parts of the object have to be rebuilt.
+
+        Args:
+            *parts: Names of the changed parts, passed on to `_rebuild`
+        """
+        with _lock:
+            self.__dict__.setdefault("_dirty_parts", set()).update(parts)
+            if self.__dict__.get("_batch_depth", 0):
+                return
+            scheduled = _schedule(self)
+        if not scheduled:
+            self.flush()
+
+    @property
+    def dirty_parts(self) -> frozenset[str]:
+        """The parts changed since the last rebuild."""
+        return frozenset(self.__dict__.get("_dirty_parts", ()))
+
+    @contextmanager
+    def batch(self) -> Iterator["DeferredRebuild"]:
+        """Group changes into a single rebuild at the end of the block.
+
+        Blocks can be nested; the outermost one rebuilds.
+
+        Yields:
+            DeferredRebuild: The object itself
+        """
+        self._batch_depth = self.__dict__.get("_batch_depth", 0) + 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self.flush()
+
+    def flush(self) -> bool:
+        """Rebuild the object now if it has pending changes.
+
+        Returns:
+            bool: True if the object was rebuilt
+        """
+        with _lock:
+            parts = self.__dict__.get("_dirty_parts")
+            if not parts or self.__dict__.get("_batch_depth", 0):
+                return False
+            # parts marked from here on are rebuilt by the next flush
+            self._dirty_parts = set()
+            _pending.pop(id(self), None)
+        self._rebuild(parts)
+        return True
+
+    def _rebuild(self, parts: set[str]) -> None:
+        """Apply the pending changes.
+
+        Args:
+            parts: The names passed to `mark_dirty` since the last rebuild
+        """
+        raise NotImplementedError
+
+    def on_destroy(self):
+        # called by ursina's destroy; a destroyed entity must not be rebuilt
+        with _lock:
+            self.__dict__.pop("_dirty_parts", None)
+            _pending.pop(id(self), None)
@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Generic, Optional, Type, TypeVar
+from ursina import Entity, destroy
+
+E = TypeVar("E", bound=Entity)
+
+
+class EntityPool(Generic[E]):
+    """Recycles entities of one type instead of destroying and rebuilding them.
+
+    Released entities are disabled, which hides them and stops their
+    updates, and kept idle. `acquire` hands back the most recently released
+    one after resetting it with the arguments it would have been created
+    with, so objects that disappear and reappear, such as flickering
+    detections, do not rebuild their scene-graph nodes every time.
+
+    Entities are reset with `reset(entity, **kwargs)` if given, otherwise
+    with the entity's own `reset(**kwargs)` method. At most `max_idle`
+    entities are kept; `trim` destroys the ones idle for longer than
+    `idle_timeout_s`.
+    """
+
+    def __init__(
+        self,
+        entity_type: Type[E],
+        max_idle: int = 64,
+        idle_timeout_s: Optional[float] = 30.0,
+        create: Optional[Callable[..., E]] = None,
+        reset: Optional[Callable[..., None]] = None,
+    ) -> None:
+        """Initialize an empty pool.
+
+        Args:
+            entity_type: The type of the pooled entities
+            max_idle: How many released entities to keep; further releases
+                are destroyed
+            idle_timeout_s: Seconds after which `trim` destroys an idle entity,
+                or None to keep idle entities until the pool is cleared
+            create: Creates a new entity from the acquire arguments; defaults
+                to calling `entity_type`
+            reset: Resets a recycled entity from the acquire arguments;
+                defaults to the entity's `reset` method
+        """
+        if reset is None and not callable(getattr(entity_type, "reset", None)):
+            raise TypeError(
+                f"{entity_type.__name__} has no reset method; pass a reset function"
+            )
+        self.entity_type = entity_type
+        self.max_idle = max_idle
+        self.idle_timeout_s = idle_timeout_s
+        self._create = create or entity_type
+        self._reset = reset
+        # (release time, entity), oldest first
+        self._idle: deque[tuple[float, E]] = deque()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.destroyed = 0
+
+    def __len__(self) -> int:
+        """Get the number of idle entities.
+
+        Returns:
+            int: The number of entities waiting to be reused
+        """
+        return len(self._idle)
+
+    def acquire(self, **kwargs) -> E:
+        """Get an entity, reusing an idle one if there is any.
+
+        Args:
+            **kwargs: The arguments the entity would be created with
+
+        Returns:
+            Entity: An enabled entity in the state given by the arguments
+        """
+        with self._lock:
+            entity = self._idle.pop()[1] if self._idle else None
+
+        if entity is None:
+            self.created += 1
+            return self._create(**kwargs)
+
+        self.reused += 1
+        if self._reset is not None:
+            self._reset(entity, **kwargs)
+        else:
+            entity.reset(**kwargs)  # type: ignore
+        entity.enabled = True
+        return entity
+
+    def release(self, entity: E) -> bool:
+        """Hide an entity and keep it for reuse.
+
+        Args:
+            entity: An entity of the pool's type that is no longer used
+
+        Returns:
+            bool: True if the entity was kept, False if the pool was full and
+                it was destroyed
+        """
+        with self._lock:
+            keep = len(self._idle) < self.max_idle
+            if keep:
+                entity.enabled = False
+                self._idle.append((time.perf_counter(), entity))
+        if not keep:
+            self.destroyed += 1
+            destroy(entity)
+        return keep
+
+    def trim(self, now: Optional[float] = None) -> int:
+        """Destroy the entities that have been idle longer than `idle_timeout_s`.
+
+        Args:
+            now: The current time, from time.perf_counter()
+
+        Returns:
+            int: The number of destroyed entities
+        """
+        if self.idle_timeout_s is None or not self._idle:
+            return 0
+        if now is None:
+            now = time.perf_counter()
+
+        expired = []
+        with self._lock:
+            while self._idle and now - self._idle[0][0] > self.idle_timeout_s:
+                expired.append(self._idle.popleft()[1])
+        for entity in expired:
+            destroy(entity)
+        self.destroyed += len(expired)
+        return len(expired)
+
+    def clear(self) -> None:
+        """Destroy every idle entity."""
+        with self._lock:
+            idle = [entity for _, entity in self._idle]
+            self._idle.clear()
+        for entity in idle:
+            destroy(entity)
+        self.destroyed += len(idle)
@@ -1,8 +1,15 @@
 from ursina import Entity, Mesh, color
 from ursina.vec3 import Vec3
+from .deferred_rebuild import DeferredRebuild
 
 
-class GroundGrid(Entity):
+class GroundGrid(DeferredRebuild, Entity):
+    """Square grid of lines on the XZ plane.
+
+    The size, spacing and thickness setters defer rebuilding the line mesh
+    to the end of the frame, or of a `with grid.batch():` block.
+    """
+
     def __init__(
         self,
         *,
@@ -53,17 +60,20 @@ class GroundGrid(Entity):
         self.model = mesh
         self.color = self.line_color
 
+    def _rebuild(self, parts: set[str]):
+        self._build_mesh()
+
     def set_size(self, size: int):
         self.size = size
-        self._build_mesh()
+        self.mark_dirty("mesh")
 
     def set_spacing(self, spacing: float):
         self.spacing = spacing
-        self._build_mesh()
+        self.mark_dirty("mesh")
 
     def set_thickness(self, thickness: float):
         self.thickness = thickness
-        self._build_mesh()
+        self.mark_dirty("mesh")
 
     def set_line_color(self, line_color):
         self.line_color = line_color
@@ -0,0 +1,318 @@
+from enum import Enum
+import numpy as np
+import panda3d.core as p3d
+from ursina import Entity, NodePath, color
+from viz3.pose import compose_transforms
+from .custom_lowlevel_rendering import (
+    CUBE_CORNER_OFFSETS,
+    CUBE_FACES,
+    _point_cloud_vertex_format,
+    _rows_view,
+    as_color_array,
+)
+
+
+class PrimitiveShape(Enum):
+    """The shape every instance of an InstancedPrimitives layer is drawn with."""
+
+    # a unit cube centered on the origin; scale it into boxes, tags or markers
+    BOX = "box"
+    # red, green and blue unit-length arrows along X, Y and Z, like Axes
+    AXES = "axes"
+
+
+# brightness of each face in CUBE_FACES, so unlit boxes still read as 3D
+_FACE_SHADES = np.array([0.8, 0.7, 0.8, 0.7, 1.0, 0.55], dtype=np.float32)
+# half the thickness of an AXES arrow, relative to its length
+_AXIS_HALF_THICKNESS = 0.01
+
+
+def _box_geometry() -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Build a unit cube with 4 vertices per face, so faces can be shaded apart.
+
+    Returns:
+        tuple: (24, 3) vertices, (36,) triangle indices and (24, 4) colors
+    """
+    vertices = CUBE_CORNER_OFFSETS[np.array(CUBE_FACES).reshape(-1)]
+    first = np.arange(len(CUBE_FACES), dtype=np.uint32)[:, np.newaxis] * 4
+    triangles = (first + np.array([0, 1, 2, 0, 2, 3], dtype=np.uint32)).reshape(-1)
+    colors = np.ones((len(vertices), 4), dtype=np.float32)
+    colors[:, :3] = np.repeat(_FACE_SHADES, 4)[:, np.newaxis]
+    return vertices, triangles, colors
+
+
+def _axes_geometry() -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Build three thin boxes along the positive X, Y and Z axes.
+
+    Returns:
+        tuple: (72, 3) vertices, (108,) triangle indices and (72, 4) colors
+    """
+    box_vertices, box_triangles, box_colors = _box_geometry()
+    vertices, triangles, colors = [], [], []
+    for axis, axis_color in enumerate(((1, 0, 0), (0, 1, 0), (0, 0, 1))):
+        size = np.full(3, _AXIS_HALF_THICKNESS * 2, dtype=np.float32)
+        size[axis] = 1.0
+        center = np.zeros(3, dtype=np.float32)
+        center[axis] = 0.5
+        vertices.append(box_vertices * size + center)
+        triangles.append(box_triangles + axis * len(box_vertices))
+        shaded = box_colors.copy()
+        shaded[:, :3] *= np.array(axis_color, dtype=np.float32)
+        colors.append(shaded)
+    return np.concatenate(vertices), np.concatenate(triangles), np.concatenate(colors)
+
+
+_SHAPE_GEOMETRY = {
+    PrimitiveShape.BOX: _box_geometry,
+    PrimitiveShape.AXES: _axes_geometry,
+}
+
+
+# instance transforms are ordinary homogeneous transforms
+make_transforms = compose_transforms
+
+
+class InstancedPrimitives(Entity):
+    """Many copies of one primitive, drawn as a single flattened mesh.
+
+    Every instance is a row of `transforms` and `colors` and owns a fixed slot
+    of vertices in one GeomNode, so thousands of boxes, tags or markers cost
+    one draw call and no per-instance entities. Updating an instance only
+    rewrites its own vertex rows. Removed instances collapse into degenerate
+    triangles and their slots are reused by the next `add`. Storage doubles
+    when it runs out.
+    """
+
+    def __init__(
+        self,
+        shape: PrimitiveShape = PrimitiveShape.BOX,
+        capacity: int = 256,
+        parent=None,
+        **kwargs,
+    ):
+        """Initialize an empty layer.
+
+        Args:
+            shape: The primitive every instance is drawn with
+            capacity: The number of instances to preallocate storage for
+            parent: The parent entity
+        """
+        super().__init__(parent=parent, **kwargs)
+        self.shape = shape
+        self.capacity = 0
+        # slots in use, including removed ones below the highest used slot
+        self.count = 0
+        self.transforms = np.zeros((0, 4, 4), dtype=np.float32)
+        self.colors = np.zeros((0, 4), dtype=np.float32)
+        self.active = np.zeros(0, dtype=bool)
+        self._free_slots: list[int] = []
+
+        (
+            self._base_vertices,
+            self._base_triangles,
+            self._base_colors,
+        ) = _SHAPE_GEOMETRY[shape]()
+        self._vertices_per_instance = len(self._base_vertices)
+        self._indices_per_instance = len(self._base_triangles)
+
+        vertex_data = p3d.GeomVertexData(
+            "instanced_primitives", _point_cloud_vertex_format(), p3d.Geom.UH_dynamic
+        )
+        primitive = p3d.GeomTriangles(p3d.Geom.UH_dynamic)
+        primitive.set_index_type(p3d.Geom.NT_uint32)
+        geom = p3d.Geom(vertex_data)
+        geom.add_primitive(primitive)
+        self.geom_node = p3d.GeomNode("instanced_primitives")
+        self.geom_node.add_geom(geom)
+
+        self.model = NodePath("instanced_primitives")
+        self.model.attach_new_node(self.geom_node)
+        self._reserve(max(capacity, 1))
+
+    def __len__(self) -> int:
+        """Get the number of instances.
+
+        Returns:
+            int: The number of instances that were added and not removed
+        """
+        return self.count - len(self._free_slots)
+
+    def _reserve(self, capacity: int) -> None:
+        if capacity <= self.capacity:
+            return
+
+        new_capacity = max(capacity, self.capacity * 2)
+        geom = self.geom_node.modify_geom(0)
+        geom.modify_vertex_data().set_num_rows(
+            new_capacity * self._vertices_per_instance
+        )
+        geom.modify_primitive(0).modify_vertices().reserve_num_rows(
+            new_capacity * self._indices_per_instance
+        )
+
+        transforms = np.zeros((new_capacity, 4, 4), dtype=np.float32)
+        transforms[: self.capacity] = self.transforms
+        colors = np.zeros((new_capacity, 4), dtype=np.float32)
+        colors[: self.capacity] = self.colors
+        active = np.zeros(new_capacity, dtype=bool)
+        active[: self.capacity] = self.active
+        self.transforms, self.colors, self.active = transforms, colors, active
+        self.capacity = new_capacity
+
+    def _write(self, slots: np.ndarray) -> None:
+        """Rewrite the vertex and index rows of the given slots from the arrays."""
+        transforms = self.transforms[slots]
+        # (K, V, 3) vertices: rotate and scale the base shape, then translate
+        vertices = (
+            np.einsum("kij,vj->kvi", transforms[:, :3, :3], self._base_vertices)
+            + transforms[:, np.newaxis, :3, 3]
+        )
+        vertex_colors = self.colors[slots][:, np.newaxis, :] * self._base_colors
+
+        first_vertices = slots * self._vertices_per_instance
+        vertex_rows = (
+            first_vertices[:, np.newaxis] + np.arange(self._vertices_per_instance)
+        ).reshape(-1)
+
+        geom = self.geom_node.modify_geom(0)
+        vertex_data = geom.modify_vertex_data()
+        _rows_view(vertex_data.modify_array(0), np.float32, 3)[vertex_rows] = (
+            vertices.reshape(-1, 3)
+        )
+        _rows_view(vertex_data.modify_array(1), np.float32, 4)[vertex_rows] = (
+            vertex_colors.reshape(-1, 4)
+        )
+
+        end = int(slots.max()) + 1
+        index_data = geom.modify_primitive(0).modify_vertices()
+        if end > self.count:
+            # slots between the old end and the new one stay collapsed
+            index_data.set_num_rows(end * self._indices_per_instance)
+            indices = _rows_view(index_data, np.uint32, self._indices_per_instance)
+            gap = np.arange(self.count, end)
+            indices[gap] = (gap * self._vertices_per_instance)[:, np.newaxis]
+            self.count = end
+        else:
+            indices = _rows_view(index_data, np.uint32, self._indices_per_instance)
+        indices[slots] = (first_vertices[:, np.newaxis] + self._base_triangles).astype(
+            np.uint32
+        )
+
+    def add_many(self, transforms: np.ndarray, colors=color.white) -> np.ndarray:
+        """Add instances.
+
+        Args:
+            transforms: An (N, 4, 4) array of transforms, see `make_transforms`
+            colors: A single color, or (N, 4) per-instance colors, multiplied
+                with the shape's own colors
+
+        Returns:
+            np.ndarray: The (N,) instance ids, used to update or remove them
+        """
+        transforms = np.asarray(transforms, dtype=np.float32).reshape(-1, 4, 4)
+        num_instances = len(transforms)
+        if num_instances == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        reused = self._free_slots[-num_instances:][::-1]
+        del self._free_slots[len(self._free_slots) - len(reused) :]
+        new = np.arange(self.count, self.count + num_instances - len(reused))
+        slots = np.concatenate([np.array(reused, dtype=np.int64), new])
+
+        self._reserve(self.count + len(new))
+        self.transforms[slots] = transforms
+        self.colors[slots] = as_color_array(colors, num_instances)
+        self.active[slots] = True
+        self._write(slots)
+        return slots
+
+    def add(self, transform: np.ndarray, color=color.white) -> int:
+        """Add an instance.
+
+        Args:
+            transform: A (4, 4) transform, see `make_transforms`
+            color: The color of the instance
+
+        Returns:
+            int: The instance id
+        """
+        return int(self.add_many(transform, color)[0])
+
+    def update_instances(
+        self,
+        ids: np.ndarray,
+        transforms: np.ndarray | None = None,
+        colors=None,
+    ) -> None:
+        """Change the transforms and/or colors of instances.
+
+        Only the vertex rows of the given instances are rewritten.
+
+        Args:
+            ids: The (K,) ids of the instances to update
+            transforms: Optional (K, 4, 4) new transforms
+            colors: Optional single color or (K, 4) new colors
+        """
+        slots = np.asarray(ids, dtype=np.int64).reshape(-1)
+        if len(slots) == 0:
+            return
+        if not self.active[slots].all():
+            raise KeyError(f"unknown instance ids: {slots[~self.active[slots]]}")
+
+        if transforms is not None:
+            self.transforms[slots] = np.asarray(transforms, dtype=np.float32).reshape(
+                -1, 4, 4
+            )
+        if colors is not None:
+            self.colors[slots] = as_color_array(colors, len(slots))
+        self._write(slots)
+
+    def update_instance(
+        self, instance_id: int, transform: np.ndarray | None = None, color=None
+    ) -> None:
+        """Change the transform and/or color of an instance.
+
+        Not named `update`, which Ursina calls every frame without arguments.
+
+        Args:
+            instance_id: The id of the instance
+            transform: An optional (4, 4) new transform
+            color: An optional new color
+        """
+        self.update_instances([instance_id], transform, color)
+
+    def remove_many(self, ids: np.ndarray) -> None:
+        """Remove instances; their ids may be reused by later adds.
+
+        Args:
+            ids: The (K,) ids of the instances to remove
+        """
+        slots = np.unique(np.asarray(ids, dtype=np.int64).reshape(-1))
+        slots = slots[self.active[slots]]
+        if len(slots) == 0:
+            return
+
+        self.active[slots] = False
+        self._free_slots.extend(int(slot) for slot in slots)
+        index_data = self.geom_node.modify_geom(0).modify_primitive(0).modify_vertices()
+        # collapse every triangle of the slot onto its first vertex
+        _rows_view(index_data, np.uint32, self._indices_per_instance)[slots] = (
+            slots * self._vertices_per_instance
+        )[:, np.newaxis]
+
+    def remove(self, instance_id: int) -> None:
+        """Remove an instance.
+
+        Args:
+            instance_id: The id of the instance
+        """
+        self.remove_many([instance_id])
+
+    def clear(self) -> None:
+        """Remove every instance, keeping the allocated storage."""
+        self.geom_node.modify_geom(0).modify_primitive(
+            0
+        ).modify_vertices().set_num_rows(0)
+        self.active[:] = False
+        self._free_slots.clear()
+        self.count = 0
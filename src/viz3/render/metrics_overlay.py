@@ -0,0 +1,60 @@
+import time
+from ursina import Entity, Text, camera, color, window
+from viz3.metrics import MetricsRegistry
+
+
+class MetricsOverlay(Entity):
+    """Text overlay with a window's latency, queue and frame-time metrics.
+
+    Shows the table of `MetricsRegistry.format_text` in the top left corner,
+    refreshed every `refresh_interval_s`. The toggle key shows and hides it;
+    while hidden the metrics are still collected but not formatted.
+    """
+
+    def __init__(
+        self,
+        registry: MetricsRegistry,
+        toggle_key: str = "f3",
+        visible: bool = False,
+        refresh_interval_s: float = 0.5,
+        **kwargs,
+    ):
+        """Initialize the overlay.
+
+        Args:
+            registry: The metrics to show
+            toggle_key: The key that shows and hides the overlay
+            visible: Whether the overlay starts visible
+            refresh_interval_s: Seconds between text updates
+        """
+        super().__init__(parent=camera.ui, **kwargs)
+        self.registry = registry
+        self.toggle_key = toggle_key
+        self.refresh_interval_s = refresh_interval_s
+        self._next_refresh = 0.0
+
+        self.text = Text(
+            parent=self,
+            text="",
+            font="VeraMono.ttf",
+            position=window.top_left + (0.01, -0.01),
+            origin=(-0.5, 0.5),
+            scale=0.7,
+            color=color.white,
+            background=True,
+        )
+        self.text.enabled = visible
+
+    def input(self, key):
+        if key == self.toggle_key:
+            self.text.enabled = not self.text.enabled
+            self._next_refresh = 0.0
+
+    def update(self):
+        if not self.text.enabled:
+            return
+        now = time.perf_counter()
+        if now < self._next_refresh:
+            return
+        self._next_refresh = now + self.refresh_interval_s
+        self.text.text = self.registry.format_text()
@@ -104,3 +104,33 @@ class AprilTag(Entity):
         """Update the numeric ID displayed."""
         self.tag_id = tag_id
         self.label.text = str(tag_id)
+
+    def reset(
+        self,
+        tag_id: int,
+        *,
+        position: tuple[float, float, float] = (0, 0, 0),
+        direction: tuple[float, float, float] = (0, 0, 1),
+        size: float = 1,
+        thickness: float = 0.02,
+        tag_color=color.white,
+        text_color=color.black,
+        text_offset: float = 0.1,
+    ):
+        """
+        Put a recycled tag in the state the constructor would have built,
+        touching only what differs, so the label text is only regenerated
+        when the ID changes. Used by EntityPool.
+        """
+        if tag_id != self.tag_id:
+            self.set_tag_id(tag_id)
+        if size != self.size or thickness != self.thickness:
+            self.set_size(size, thickness)
+        if tag_color != self.tag_color:
+            self.set_tag_color(tag_color)
+        if text_color != self.text_color:
+            self.set_text_color(text_color)
+        if text_offset != self.text_offset:
+            self.set_text_offset(text_offset)
+        self.set_position(position)
+        self.set_direction(direction)
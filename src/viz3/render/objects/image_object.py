@@ -1,21 +1,136 @@
+from enum import Enum
 import numpy as np
+from panda3d.core import Texture as PandaTexture
 from ursina import Entity, Vec3, color, Texture
 from PIL import Image
 from ursina import *
+from ...shared_frames import RingFrame
+from ..deferred_rebuild import DeferredRebuild
 
 
-class ImageObject(Entity):
+class ColorOrder(Enum):
+    """Channel order of 3 and 4 channel image arrays."""
+
+    RGB = "rgb"
+    # the order OpenCV decodes images in
+    BGR = "bgr"
+
+
+# Panda3D texture format for each number of channels
+_PANDA_FORMATS = {
+    1: PandaTexture.F_luminance,
+    3: PandaTexture.F_rgb,
+    4: PandaTexture.F_rgba,
+}
+
+# how often a frame the data hub overwrites during its upload is replaced by
+# the newest frame and uploaded again
+_MAX_UPLOAD_ATTEMPTS = 3
+
+
+class StreamingTexture:
+    """A texture whose pixels are overwritten in place by every new frame.
+
+    The Panda3D texture is only reallocated when the resolution or number of
+    channels changes. Otherwise each frame is copied straight from the array
+    into the texture's RAM image, converting the row and channel order in the
+    same copy, and Panda3D re-uploads it before the next draw.
+    """
+
+    def __init__(self, color_order: ColorOrder = ColorOrder.RGB) -> None:
+        """Initialize the texture; it is allocated by the first upload.
+
+        Args:
+            color_order: The channel order of uploaded color images
+        """
+        self.color_order = color_order
+        self.texture: Texture | None = None
+        self.shape: tuple[int, ...] | None = None
+        # how many times the texture had to be allocated
+        self.allocations = 0
+
+    def _allocate(self, height: int, width: int, channels: int) -> None:
+        panda_texture = PandaTexture("streaming_texture")
+        panda_texture.setup_2d_texture(
+            width, height, PandaTexture.T_unsigned_byte, _PANDA_FORMATS[channels]
+        )
+        self.texture = Texture(panda_texture)
+        # ursina only sets this for textures made from PIL images, but reads it
+        # for every texture
+        self.texture._cached_image = None
+        self.texture.filtering = None
+        self.allocations += 1
+
+    def upload(self, image_array: np.ndarray) -> bool:
+        """Copy an image into the texture.
+
+        Args:
+            image_array: An (H, W) grayscale or (H, W, 3) / (H, W, 4) color
+                image of uint8
+
+        Returns:
+            bool: True if the texture was reallocated, so it has to be assigned
+                to the entities that show it again
+        """
+        if image_array.ndim == 2:
+            image_array = image_array[:, :, np.newaxis]
+        height, width, channels = image_array.shape
+        if channels not in _PANDA_FORMATS:
+            raise ValueError(f"images with {channels} channels are not supported")
+        if image_array.dtype != np.uint8:
+            image_array = image_array.astype(np.uint8)
+
+        reallocated = image_array.shape != self.shape
+        if reallocated:
+            self._allocate(height, width, channels)
+            self.shape = image_array.shape
+
+        ram_image = np.frombuffer(
+            memoryview(self.texture._texture.modify_ram_image()),  # type: ignore
+            dtype=np.uint8,
+        ).reshape(height, width, channels)
+
+        # Panda3D stores rows bottom to top, and color as BGR(A)
+        source = image_array[::-1]
+        if channels == 1 or self.color_order == ColorOrder.BGR:
+            np.copyto(ram_image, source)
+        else:
+            np.copyto(ram_image[:, :, :3], source[:, :, 2::-1])
+            if channels == 4:
+                np.copyto(ram_image[:, :, 3], source[:, :, 3])
+        return reallocated
+
+
+class ImageObject(DeferredRebuild, Entity):
     def __init__(
         self,
         image_array: np.ndarray,
         *,
         position: tuple[float, float, float] = (0, 0, 0),
         scale: float = 1,
+        streaming: bool = False,
+        color_order: ColorOrder = ColorOrder.RGB,
         **kwargs,
     ):
+        """Show an image on a quad.
+
+        Args:
+            image_array: The image; (H, W) grayscale or (H, W, C) color
+            position: The position of the image
+            scale: The height of the image; the width follows its aspect ratio
+            streaming: Upload new images into one texture in place instead of
+                creating a new texture for every `update_texture`. Use it for
+                video, where every frame has the same resolution
+            color_order: The channel order of color images in streaming mode
+
+        New images and scales are applied at the end of the frame, or of a
+        `with image_object.batch():` block, so only the last image set in a
+        frame is uploaded.
+        """
         super().__init__(position=position, **kwargs)
 
         self.image_array = image_array
+        self.streaming_texture = StreamingTexture(color_order) if streaming else None
 
         # Calculate aspect ratio based on image dimensions
         self.height, self.width = image_array.shape[:2]
@@ -23,6 +138,8 @@ class ImageObject(Entity):
 
         # Set scale using the single scale parameter
         self.scale_value = scale
+        # an explicit (width, height) from set_world_image_scale
+        self._plane_size: tuple[float, float] | None = None
 
         self._create_plane()
 
@@ -38,6 +155,10 @@ class ImageObject(Entity):
         )
 
     def _create_texture(self) -> Texture:
+        if self.streaming_texture is not None:
+            self.streaming_texture.upload(self.image_array)
+            return self.streaming_texture.texture  # type: ignore
+
         if len(self.image_array.shape) == 2:
             image = Image.fromarray(self.image_array).convert("RGBA")
         else:
@@ -51,19 +172,50 @@ class ImageObject(Entity):
 
     def set_scale(self, scale: float):
         self.scale_value = scale
-
-        # Update with current aspect ratio
-        height, width = self.image_array.shape[:2]
-        aspect_ratio = width / height
-
-        self.plane.scale = Vec3(scale * aspect_ratio, scale, 1)
+        self._plane_size = None
+        self.mark_dirty("scale")
 
     def set_world_image_scale(self, width: float, height: float):
-        self.plane.scale = Vec3(width, height, 1)
+        self._plane_size = (width, height)
+        self.mark_dirty("scale")
 
     def update_texture(self, new_image_array: np.ndarray):
         self.image_array = new_image_array
-        height, width = new_image_array.shape[:2]
-        aspect_ratio = width / height
-        self.plane.scale = Vec3(self.scale_value * aspect_ratio, self.scale_value, 1)
-        self.plane.texture = self._create_texture()
+        if self.streaming_texture is None:
+            # a new texture is sized from the image, like a new object
+            self._plane_size = None
+        self.mark_dirty("texture")
+
+    def _rebuild(self, parts: set[str]):
+        rescale = "scale" in parts
+        if "texture" in parts:
+            for _ in range(_MAX_UPLOAD_ATTEMPTS):
+                if self.streaming_texture is None:
+                    self.plane.texture = self._create_texture()
+                    rescale = True
+                elif self.streaming_texture.upload(self.image_array):
+                    # the resolution changed
+                    self.plane.texture = self.streaming_texture.texture
+                    self._plane_size = None
+                    rescale = True
+
+                image = self.image_array
+                if not isinstance(image, RingFrame) or image.is_current():
+                    break
+                # a view of a shared-memory frame that was overwritten while
+                # it was copied; upload the newest frame instead
+                latest = image.latest()
+                if latest is None:
+                    break
+                self.image_array = latest
+
+        if not rescale:
+            return
+        if self._plane_size is not None:
+            self.plane.scale = Vec3(*self._plane_size, 1)
+            return
+        self.height, self.width = self.image_array.shape[:2]
+        self.aspect_ratio = self.width / self.height
+        self.plane.scale = Vec3(
+            self.scale_value * self.aspect_ratio, self.scale_value, 1
+        )
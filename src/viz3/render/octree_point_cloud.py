@@ -0,0 +1,282 @@
+import heapq
+import math
+import numpy as np
+from ursina import NodePath, camera, color, window
+from ursina.color import white
+from .cube_point_cloud import BasePointCloud
+from .custom_lowlevel_rendering import (
+    PointCloudGeom,
+    PointRenderMode,
+    as_color_array,
+    as_point_array,
+)
+
+
+class OctreeNode:
+    """A node of an OctreePointCloud.
+
+    Every node holds a voxel-centroid downsample of all the points inside its
+    bounds, so a node can stand in for its whole subtree. Leaves hold their
+    points at full density.
+    """
+
+    def __init__(
+        self, center: np.ndarray, half_size: float, depth: int, voxel_size: float
+    ) -> None:
+        """Initialize an octree node.
+
+        Args:
+            center: The center of the node's cubic bounds
+            half_size: Half the side length of the node's bounds
+            depth: The depth of the node, 0 for the root
+            voxel_size: The side length of the voxels the node was sampled with
+        """
+        self.center = center
+        self.half_size = half_size
+        self.depth = depth
+        self.voxel_size = voxel_size
+        self.children: list["OctreeNode"] = []
+        self.num_points = 0
+        self.node_path: NodePath | None = None
+
+    def is_leaf(self) -> bool:
+        """Check if the node has no children.
+
+        Returns:
+            bool: True if the node is a leaf
+        """
+        return not self.children
+
+
+def voxel_centroids(
+    points: np.ndarray,
+    colors: np.ndarray,
+    origin: np.ndarray,
+    voxel_size: float,
+    resolution: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Downsample points to the centroid of every occupied voxel.
+
+    Args:
+        points: An (N, 3) array of point positions
+        colors: An (N, 4) array of per-point colors
+        origin: The minimum corner of the voxel grid
+        voxel_size: The side length of a voxel
+        resolution: The number of voxels along each axis
+
+    Returns:
+        tuple: The (M, 3) centroids and (M, 4) mean colors of the M occupied voxels
+    """
+    cells = np.clip(
+        ((points - origin) / voxel_size).astype(np.int64), 0, resolution - 1
+    )
+    keys = (cells[:, 0] * resolution + cells[:, 1]) * resolution + cells[:, 2]
+    _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    inverse = inverse.reshape(-1)
+
+    centroids = np.empty((len(counts), 3), dtype=np.float32)
+    for axis in range(3):
+        centroids[:, axis] = np.bincount(inverse, points[:, axis]) / counts
+    mean_colors = np.empty((len(counts), 4), dtype=np.float32)
+    for channel in range(4):
+        mean_colors[:, channel] = np.bincount(inverse, colors[:, channel]) / counts
+
+    return centroids, mean_colors
+
+
+class OctreePointCloud(BasePointCloud):
+    """Point cloud with octree level of detail and a global point budget.
+
+    The octree and the downsampled level of every node are built once. Every
+    frame, nodes are refined in order of how large their voxels appear on
+    screen, replacing a node by its children until the voxels are smaller than
+    `lod_pixel_size` pixels or the next refinement would exceed
+    `point_budget`. The number of points drawn, and the work done per frame,
+    therefore stays bounded regardless of the size of the cloud.
+    """
+
+    def __init__(
+        self,
+        points: list[tuple[float, float, float]] | np.ndarray,
+        point_size: float = 0.01,
+        color=color.white,
+        parent=None,
+        render_mode: PointRenderMode = PointRenderMode.POINT,
+        colors: np.ndarray | None = None,
+        point_budget: int = 1_000_000,
+        leaf_size: int = 8192,
+        node_resolution: int = 32,
+        max_depth: int = 16,
+        lod_pixel_size: float = 2.0,
+    ):
+        """Build the octree and its downsampled levels.
+
+        Args:
+            points: An (N, 3) array-like of point positions
+            point_size: The side length of every full-density point
+            color: The color of the whole cloud, multiplied with per-point colors
+            parent: The parent entity
+            render_mode: How each point is drawn
+            colors: Optional (N, 4) per-point colors; white when omitted
+            point_budget: The maximum number of points drawn per frame
+            leaf_size: Nodes with at most this many points are not split
+            node_resolution: Voxels along each axis used to downsample a node
+            max_depth: The maximum depth of the octree
+            lod_pixel_size: Nodes are refined while their voxels appear larger
+                than this many pixels on screen
+        """
+        super().__init__(point_size, color, parent, render_mode)
+        self.point_budget = point_budget
+        self.leaf_size = leaf_size
+        self.node_resolution = node_resolution
+        self.max_depth = max_depth
+        self.lod_pixel_size = lod_pixel_size
+        self.octree_nodes: list[OctreeNode] = []
+        self.visible_nodes: set[OctreeNode] = set()
+        self.num_visible_points = 0
+
+        self.model = NodePath("octree_point_cloud")
+
+        points = as_point_array(points)
+        colors = as_color_array(white if colors is None else colors, len(points))
+        self.num_points = len(points)
+
+        self.root: OctreeNode | None = None
+        if self.num_points:
+            minimum = points.min(axis=0)
+            maximum = points.max(axis=0)
+            half_size = max(float((maximum - minimum).max()) / 2, point_size)
+            self.root = self._build_node(
+                points, colors, (minimum + maximum) / 2, half_size, 0
+            )
+            self._show({self.root})
+
+    def _build_node(
+        self,
+        points: np.ndarray,
+        colors: np.ndarray,
+        center: np.ndarray,
+        half_size: float,
+        depth: int,
+    ) -> OctreeNode:
+        is_leaf = len(points) <= self.leaf_size or depth >= self.max_depth
+        voxel_size = 2 * half_size / self.node_resolution
+        node = OctreeNode(center, half_size, depth, 0.0 if is_leaf else voxel_size)
+
+        if is_leaf:
+            node_points, node_colors = points, colors
+        else:
+            node_points, node_colors = voxel_centroids(
+                points, colors, center - half_size, voxel_size, self.node_resolution
+            )
+
+            octants = (
+                (points[:, 0] > center[0]).astype(np.int8)
+                | ((points[:, 1] > center[1]).astype(np.int8) << 1)
+                | ((points[:, 2] > center[2]).astype(np.int8) << 2)
+            )
+            order = np.argsort(octants, kind="stable")
+            bounds = np.searchsorted(octants[order], np.arange(9))
+            for octant in range(8):
+                selection = order[bounds[octant] : bounds[octant + 1]]
+                if len(selection) == 0:
+                    continue
+                signs = np.array(
+                    [octant & 1, (octant >> 1) & 1, (octant >> 2) & 1], dtype=np.float32
+                )
+                child_center = center + (signs * 2 - 1) * (half_size / 2)
+                node.children.append(
+                    self._build_node(
+                        points[selection],
+                        colors[selection],
+                        child_center,
+                        half_size / 2,
+                        depth + 1,
+                    )
+                )
+
+        # coarse levels use bigger points so the downsampled cloud has no gaps
+        geom = PointCloudGeom(
+            max(self.point_size, node.voxel_size), len(node_points), self.render_mode
+        )
+        geom.write_points(0, node_points, node_colors)
+        node.num_points = len(node_points)
+        node.node_path = self.model.attach_new_node(geom.node)
+        node.node_path.hide()
+        self.octree_nodes.append(node)
+        return node
+
+    def _show(self, nodes: set[OctreeNode]) -> None:
+        for node in self.visible_nodes - nodes:
+            node.node_path.hide()
+        for node in nodes - self.visible_nodes:
+            node.node_path.show()
+        self.visible_nodes = nodes
+        self.num_visible_points = sum(node.num_points for node in nodes)
+
+    def _projected_voxel_size(
+        self, node: OctreeNode, camera_position: np.ndarray, pixels_per_radian: float
+    ) -> float:
+        distance = float(np.linalg.norm(camera_position - node.center))
+        # inside or near the node, treat it as maximally important
+        distance = max(distance - node.half_size * math.sqrt(3), 1e-6)
+        return node.voxel_size / distance * pixels_per_radian
+
+    def select_nodes(
+        self, camera_position: np.ndarray, pixels_per_radian: float
+    ) -> set[OctreeNode]:
+        """Choose the nodes to draw for a camera position.
+
+        Args:
+            camera_position: The camera position in the cloud's local space
+            pixels_per_radian: Screen pixels covered by one radian of view
+
+        Returns:
+            set[OctreeNode]: The nodes to draw
+        """
+        if self.root is None:
+            return set()
+
+        selected = {self.root}
+        used = self.root.num_points
+        # max-heap on projected voxel size, ties broken by insertion order
+        heap = [
+            (
+                -self._projected_voxel_size(
+                    self.root, camera_position, pixels_per_radian
+                ),
+                0,
+                self.root,
+            )
+        ]
+        pushed = 1
+        while heap:
+            negative_size, _, node = heapq.heappop(heap)
+            if node.is_leaf() or -negative_size < self.lod_pixel_size:
+                continue
+
+            added = sum(child.num_points for child in node.children) - node.num_points
+            if used + added > self.point_budget:
+                continue
+
+            selected.discard(node)
+            used += added
+            for child in node.children:
+                selected.add(child)
+                size = self._projected_voxel_size(
+                    child, camera_position, pixels_per_radian
+                )
+                heapq.heappush(heap, (-size, pushed, child))
+                pushed += 1
+
+        return selected
+
+    def update(self):
+        """Refresh the level of detail for the current camera."""
+        if self.root is None:
+            return
+
+        camera_position = np.array(camera.get_pos(self), dtype=np.float32)
+        fov = math.radians(camera.fov) if camera.fov else math.pi / 2
+        pixels_per_radian = window.size[0] / (2 * math.tan(fov / 2))
+        self._show(self.select_nodes(camera_position, pixels_per_radian))
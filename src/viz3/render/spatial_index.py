@@ -0,0 +1,270 @@
+import itertools
+import math
+import threading
+import numpy as np
+
+
+class SpatialGrid:
+    """Uniform hash grid over named points, for region and nearest queries.
+
+    Every point is stored in the cubic cell of side `cell_size` it falls in,
+    so a query only visits the cells that overlap its region instead of
+    every point. Each point also carries a bounding radius, used by
+    `visible_mask` to test whole objects against view frustum planes.
+    Safe to use from several threads.
+    """
+
+    def __init__(self, cell_size: float = 1.0) -> None:
+        """Initialize an empty grid.
+
+        Args:
+            cell_size: The side length of a cell; about the typical query
+                radius, or the typical distance between objects
+        """
+        if cell_size <= 0:
+            raise ValueError(f"cell_size must be positive, got {cell_size}")
+        self.cell_size = cell_size
+        self.positions: dict[str, tuple[float, float, float]] = {}
+        self.radii: dict[str, float] = {}
+        self._cells: dict[tuple[int, int, int], set[str]] = {}
+        self._cell_of: dict[str, tuple[int, int, int]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Get the number of points.
+
+        Returns:
+            int: The number of points in the grid
+        """
+        return len(self.positions)
+
+    def __contains__(self, name: str) -> bool:
+        """Check if a point is in the grid.
+
+        Args:
+            name: The name of the point
+
+        Returns:
+            bool: True if the point was inserted and not removed
+        """
+        return name in self.positions
+
+    def _cell(self, position) -> tuple[int, int, int]:
+        return (
+            math.floor(position[0] / self.cell_size),
+            math.floor(position[1] / self.cell_size),
+            math.floor(position[2] / self.cell_size),
+        )
+
+    def insert(self, name: str, position, radius: float = 0.0) -> None:
+        """Insert a point, or move it if it is already in the grid.
+
+        Args:
+            name: The name of the point
+            position: The (x, y, z) position
+            radius: The radius of a sphere around the position that contains
+                the whole object, or math.inf if it has no finite bounds
+        """
+        position = (float(position[0]), float(position[1]), float(position[2]))
+        cell = self._cell(position)
+        with self._lock:
+            old_cell = self._cell_of.get(name)
+            if old_cell != cell:
+                if old_cell is not None:
+                    self._discard_from_cell(name, old_cell)
+                self._cells.setdefault(cell, set()).add(name)
+                self._cell_of[name] = cell
+            self.positions[name] = position
+            self.radii[name] = radius
+
+    def _discard_from_cell(self, name: str, cell: tuple[int, int, int]) -> None:
+        names = self._cells[cell]
+        names.discard(name)
+        if not names:
+            del self._cells[cell]
+
+    def remove(self, name: str) -> None:
+        """Remove a point; unknown names are ignored.
+
+        Args:
+            name: The name of the point
+        """
+        with self._lock:
+            cell = self._cell_of.pop(name, None)
+            if cell is None:
+                return
+            self._discard_from_cell(name, cell)
+            del self.positions[name]
+            del self.radii[name]
+
+    def clear(self) -> None:
+        """Remove every point."""
+        with self._lock:
+            self.positions.clear()
+            self.radii.clear()
+            self._cells.clear()
+            self._cell_of.clear()
+
+    def _names_in_cell_range(
+        self, low: tuple[int, int, int], high: tuple[int, int, int]
+    ) -> list[str]:
+        """Get the points of every cell in an inclusive range of cells."""
+        num_cells = (
+            (high[0] - low[0] + 1) * (high[1] - low[1] + 1) * (high[2] - low[2] + 1)
+        )
+        if num_cells > len(self._cells):
+            # a large region: visiting the occupied cells is cheaper
+            return [
+                name
+                for cell, names in self._cells.items()
+                if all(low[i] <= cell[i] <= high[i] for i in range(3))
+                for name in names
+            ]
+        found = []
+        for cell in itertools.product(
+            range(low[0], high[0] + 1),
+            range(low[1], high[1] + 1),
+            range(low[2], high[2] + 1),
+        ):
+            names = self._cells.get(cell)
+            if names:
+                found.extend(names)
+        return found
+
+    def query_radius(self, center, radius: float) -> list[str]:
+        """Find the points within a distance of a point.
+
+        Args:
+            center: The (x, y, z) center of the query
+            radius: The maximum distance
+
+        Returns:
+            list[str]: The names of the points, in no particular order
+        """
+        cx, cy, cz = (float(c) for c in center)
+        radius_squared = radius * radius
+        with self._lock:
+            candidates = self._names_in_cell_range(
+                self._cell((cx - radius, cy - radius, cz - radius)),
+                self._cell((cx + radius, cy + radius, cz + radius)),
+            )
+            found = []
+            for name in candidates:
+                x, y, z = self.positions[name]
+                if (x - cx) ** 2 + (y - cy) ** 2 + (z - cz) ** 2 <= radius_squared:
+                    found.append(name)
+        return found
+
+    def query_box(self, min_corner, max_corner) -> list[str]:
+        """Find the points inside an axis-aligned box.
+
+        Args:
+            min_corner: The (x, y, z) corner with the smallest coordinates
+            max_corner: The (x, y, z) corner with the largest coordinates
+
+        Returns:
+            list[str]: The names of the points, in no particular order
+        """
+        low = tuple(float(c) for c in min_corner)
+        high = tuple(float(c) for c in max_corner)
+        with self._lock:
+            candidates = self._names_in_cell_range(self._cell(low), self._cell(high))
+            return [
+                name
+                for name in candidates
+                if all(low[i] <= self.positions[name][i] <= high[i] for i in range(3))
+            ]
+
+    def nearest(
+        self, point, k: int = 1, max_distance: float = math.inf
+    ) -> list[tuple[str, float]]:
+        """Find the points closest to a point.
+
+        Searches shells of cells outwards from the point's cell, and stops
+        once no unvisited cell can hold a closer point.
+
+        Args:
+            point: The (x, y, z) query point
+            k: How many points to find
+            max_distance: Ignore points further away than this
+
+        Returns:
+            list[tuple[str, float]]: Up to k (name, distance) pairs, closest first
+        """
+        px, py, pz = (float(c) for c in point)
+        with self._lock:
+            if not self.positions or k <= 0:
+                return []
+
+            center = self._cell((px, py, pz))
+            best: list[tuple[float, str]] = []
+            visited = 0
+            ring = 0
+            while True:
+                if (2 * ring + 1) ** 3 > 8 * len(self._cells):
+                    # the shells got larger than the occupied cells: scan
+                    # every point instead, including the ones seen so far
+                    candidates = list(self.positions)
+                    visited = len(self.positions)
+                    best = []
+                else:
+                    candidates = []
+                    for cell in self._shell(center, ring):
+                        names = self._cells.get(cell)
+                        if names:
+                            candidates.extend(names)
+                    visited += len(candidates)
+
+                for name in candidates:
+                    x, y, z = self.positions[name]
+                    distance = math.sqrt((x - px) ** 2 + (y - py) ** 2 + (z - pz) ** 2)
+                    if distance <= max_distance:
+                        best.append((distance, name))
+                best.sort()
+                del best[k:]
+
+                # every unvisited point is more than this far away
+                reach = ring * self.cell_size
+                if visited >= len(self.positions) or reach > max_distance:
+                    break
+                if len(best) == k and best[-1][0] <= reach:
+                    break
+                ring += 1
+
+        return [(name, distance) for distance, name in best]
+
+    @staticmethod
+    def _shell(center: tuple[int, int, int], ring: int):
+        """Yield the cells at Chebyshev distance `ring` from a cell."""
+        if ring == 0:
+            yield center
+            return
+        cx, cy, cz = center
+        for dx in range(-ring, ring + 1):
+            for dy in range(-ring, ring + 1):
+                if abs(dx) == ring or abs(dy) == ring:
+                    for dz in range(-ring, ring + 1):
+                        yield (cx + dx, cy + dy, cz + dz)
+                else:
+                    yield (cx + dx, cy + dy, cz - ring)
+                    yield (cx + dx, cy + dy, cz + ring)
+
+    def visible_mask(self, names: list[str], planes: np.ndarray) -> np.ndarray:
+        """Test points and their bounding spheres against a view frustum.
+
+        Args:
+            names: The names of the points to test
+            planes: A (P, 4) array of (a, b, c, d) planes with unit normals
+                pointing out of the frustum
+
+        Returns:
+            np.ndarray: A (len(names),) boolean array, True for points whose
+                bounding sphere is at least partly inside every plane
+        """
+        with self._lock:
+            positions = np.array([self.positions[name] for name in names]).reshape(
+                -1, 3
+            )
+            radii = np.array([self.radii[name] for name in names], dtype=np.float64)
+        distances = positions @ planes[:, :3].T + planes[:, 3]
+        return np.all(distances <= radii[:, np.newaxis], axis=1)
@@ -1,34 +1,79 @@
 from viz3.render.ground import GroundGrid
 from viz3.render.axes import Axes
+from viz3.render.entity_pool import EntityPool
+from viz3.render.spatial_index import SpatialGrid
 from ursina import *
-from typing import Dict, List, Optional
+from panda3d.core import BoundingSphere, Thread, UpdateSeq
+from collections import OrderedDict
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable, Dict, List, Optional, Type
+import heapq
+import itertools
+import math
+import threading
 import time
+import numpy as np
 
 
 class Object:
     """Wrapper for entities in the world with metadata."""
 
-    def __init__(self, name: str, entity: Entity, last_update: float) -> None:
+    def __init__(
+        self,
+        name: str,
+        entity: Entity,
+        last_update: float,
+        ttl: Optional[float] = None,
+    ) -> None:
         """Initialize an Object.
 
         Args:
             name: The name/identifier of the object
             entity: The Ursina entity
             last_update: Timestamp of last update
+            ttl: Seconds without a touch after which the object expires, or
+                None to keep it until it is removed
         """
         self._name = name
         self._entity = entity
         self._last_update = last_update
+        self._ttl = ttl
 
     def get_entity(self) -> Entity:
-        """Get the entity and update the timestamp.
+        """Get the entity.
+
+        Reading the entity does not count as an update; use `touch` to keep
+        an object with a TTL alive.
 
         Returns:
             Entity: The Ursina entity
         """
-        self._last_update = time.time()
         return self._entity
 
+    def touch(self) -> None:
+        """Mark the object as updated now."""
+        self._last_update = time.time()
+
+    def get_ttl(self) -> Optional[float]:
+        """Get the time to live.
+
+        Returns:
+            Optional[float]: Seconds without a touch after which the object
+            expires, or None if it never expires
+        """
+        return self._ttl
+
+    def get_deadline(self) -> float:
+        """Get the time at which the object expires if it is not touched.
+
+        Returns:
+            float: Expiry timestamp, infinite if the object has no TTL
+        """
+        if self._ttl is None:
+            return math.inf
+        return self._last_update + self._ttl
+
     def get_last_update(self) -> float:
         """Get the timestamp of last update.
 
@@ -46,6 +91,24 @@ class Object:
         return self._name
 
 
+class SceneCommandType(Enum):
+    ADD = "add"
+    UPDATE = "update"
+    REMOVE = "remove"
+
+
+@dataclass
+class SceneCommand:
+    """A queued change to the world, applied on the render thread."""
+
+    type: SceneCommandType
+    name: str
+    # ADD: creates the entity; UPDATE: receives the entity; REMOVE: unused
+    action: Optional[Callable] = None
+    # ADD only: the time to live of the new object
+    ttl: Optional[float] = None
+
+
 class World:
     """Main world class that manages the 3D scene and its components.
 
@@ -53,16 +116,63 @@ class World:
     including the ground grid, axes, and various objects in the scene.
     """
 
-    def __init__(self, add_base_objects: bool = True) -> None:
+    def __init__(
+        self,
+        add_base_objects: bool = True,
+        command_budget_ms: float = 4.0,
+        spatial_cell_size: float = 1.0,
+        cull_updates: bool = False,
+    ) -> None:
         """Initialize the world with default components.
 
         Args:
             add_base_objects: Whether to add default objects like ground and axes
+            command_budget_ms: Time per frame spent applying queued scene commands
+            spatial_cell_size: The cell size of the spatial index, about the
+                typical distance between objects
+            cull_updates: Whether `cull_offscreen_updates` skips the per-frame
+                `update` of objects outside the view frustum
         """
         self.objects: Dict[str, Object] = {}
         self.ground_grid: Optional[GroundGrid] = None
         self.axes: Optional[Axes] = None
 
+        # Scene commands queued by pipelines, keyed so that repeated updates
+        # to the same object within a frame replace each other
+        self.command_budget_ms = command_budget_ms
+        self._commands: "OrderedDict[tuple, SceneCommand]" = OrderedDict()
+        self._pending_update_keys: Dict[str, set] = {}
+        # the queued add of each name, which a later add of the name replaces
+        self._pending_adds: Dict[str, tuple] = {}
+        self._command_ids = itertools.count()
+        self._commands_lock = threading.Lock()
+
+        # Min-heap of (deadline, sequence, object) for objects with a TTL.
+        # Touching an object does not update the heap; an entry whose object
+        # has been touched since is pushed back with its new deadline when it
+        # comes up, and entries of removed objects are dropped.
+        self._expiry_heap: List[tuple] = []
+        self._expiry_ids = itertools.count()
+        self._expiry_lock = threading.Lock()
+
+        # Object positions for region queries and update culling. Kept up to
+        # date when objects are added, touched or updated through queued
+        # commands; entities moved any other way need `reindex_object`.
+        self.spatial_index = SpatialGrid(spatial_cell_size)
+        # (entity, children's bounds keys, world scale, radius) of every
+        # indexed object, so the radius is only recomputed when the object's
+        # geometry or scale changes
+        self._bounding_radii: Dict[str, tuple] = {}
+        self.cull_updates = cull_updates
+        # objects with a per-frame `update` method, and the ones among them
+        # whose updates are skipped because they are out of view
+        self._updatable: Dict[str, Entity] = {}
+        self._culled: set = set()
+
+        # Pools that removed entities of their type are released to instead
+        # of being destroyed
+        self._pools: Dict[type, EntityPool] = {}
+
         if add_base_objects:
             # Initialize default world components
             self._setup_world()
@@ -150,14 +260,309 @@ class World:
         """
         return name in self.objects
 
-    def add_object(self, name: str, entity: Entity) -> None:
+    def add_object(
+        self, name: str, entity: Entity, ttl: Optional[float] = None
+    ) -> None:
         """Add an object to the world.
 
+        An object that already has the name is replaced, and its entity is
+        destroyed or returned to its pool.
+
         Args:
             name: The name/identifier for the object
             entity: The Ursina entity to add
+            ttl: Seconds without a `touch_object` after which the object is
+                removed, or None to keep it until it is removed explicitly
+        """
+        replaced = self.objects.get(name)
+        if replaced is not None and replaced.get_entity() is not entity:
+            # the name now refers to the new entity; the old one would
+            # otherwise stay in the scene with nothing left to remove it
+            if not self._dispose_entity(name, replaced.get_entity()):
+                destroy(replaced.get_entity())
+        obj = Object(name, entity, time.time(), ttl)
+        self.objects[name] = obj
+        self._culled.discard(name)
+        if callable(getattr(entity, "update", None)):
+            self._updatable[name] = entity
+        else:
+            self._updatable.pop(name, None)
+        self._index_object(name, entity)
+        if ttl is not None:
+            with self._expiry_lock:
+                heapq.heappush(
+                    self._expiry_heap,
+                    (obj.get_deadline(), next(self._expiry_ids), obj),
+                )
+
+    def set_pool(self, pool: EntityPool) -> None:
+        """Recycle removed entities of the pool's type through the pool.
+
+        Args:
+            pool: The pool; replaces the pool of the same type, if any
+        """
+        self._pools[pool.entity_type] = pool
+
+    def get_pool(self, entity_type: Type[Entity]) -> EntityPool:
+        """Get the pool of an entity type, creating one with defaults if needed.
+
+        Args:
+            entity_type: The type of the pooled entities
+
+        Returns:
+            EntityPool: The pool
+        """
+        pool = self._pools.get(entity_type)
+        if pool is None:
+            pool = self._pools.setdefault(entity_type, EntityPool(entity_type))
+        return pool
+
+    def add_pooled_object(
+        self,
+        name: str,
+        entity_type: Type[Entity],
+        ttl: Optional[float] = None,
+        **kwargs,
+    ) -> Entity:
+        """Add an object whose entity is taken from its type's pool.
+
+        When the object is removed or expires, its entity goes back to the
+        pool, hidden, instead of being destroyed.
+
+        Args:
+            name: The name/identifier for the object
+            entity_type: The type of entity to acquire
+            ttl: The time to live of the object, see `add_object`
+            **kwargs: The arguments the entity would be created with
+
+        Returns:
+            Entity: The new or recycled entity
+        """
+        entity = self.get_pool(entity_type).acquire(**kwargs)
+        self.add_object(name, entity, ttl)
+        return entity
+
+    def trim_pools(self) -> int:
+        """Destroy pooled entities that have been idle too long.
+
+        Returns:
+            int: The number of destroyed entities
+        """
+        return sum(pool.trim() for pool in list(self._pools.values()))
+
+    def _dispose_entity(self, name: str, entity: Entity) -> bool:
+        """Release an entity to its pool, if its type has one.
+
+        Returns:
+            bool: True if the pool kept or destroyed the entity
+        """
+        if name in self._culled:
+            entity.ignore = False
+        pool = self._pools.get(type(entity))
+        if pool is None:
+            return False
+        pool.release(entity)
+        return True
+
+    def touch_object(self, name: str) -> None:
+        """Mark an object as updated, postponing its expiry.
+
+        Args:
+            name: The name of the object; unknown names are ignored
+        """
+        obj = self.objects.get(name)
+        if obj is not None:
+            obj.touch()
+            self._index_object(name, obj.get_entity())
+
+    def _index_object(self, name: str, entity: Entity) -> None:
+        # the bounds of the entity's children are in the entity's own space,
+        # so moving the entity does not change them; their sequence numbers
+        # change when they are recomputed, e.g. after a new mesh
+        thread = Thread.get_current_thread()
+        children_bounds = []
+        geometry_key = []
+        for child in entity.get_children():
+            bounds_seq = UpdateSeq()
+            children_bounds.append(child.node().get_bounds(bounds_seq, thread))
+            geometry_key.append((child.get_key(), bounds_seq.seq))
+        scale = entity.get_scale(scene)
+
+        cached = self._bounding_radii.get(name)
+        if (
+            cached is not None
+            and cached[0] is entity
+            and cached[1] == geometry_key
+            and cached[2] == scale
+        ):
+            radius = cached[3]
+        else:
+            radius = self._bounding_radius(children_bounds, scale)
+            self._bounding_radii[name] = (entity, geometry_key, scale, radius)
+        self.spatial_index.insert(name, entity.world_position, radius)
+
+    @staticmethod
+    def _bounding_radius(children_bounds: list, scale) -> float:
+        """Get the radius of a sphere around an entity that contains it.
+
+        Args:
+            children_bounds: The bounds of the entity's children, in the
+                entity's own space
+            scale: The scale of the entity relative to the scene
+
+        Returns:
+            float: The radius around the entity's position, or math.inf
+        """
+        radius = 0.0
+        for bounds in children_bounds:
+            if bounds.is_empty():
+                continue
+            if bounds.is_infinite() or not isinstance(bounds, BoundingSphere):
+                return math.inf
+            radius = max(radius, bounds.get_center().length() + bounds.get_radius())
+        return radius * max(abs(scale[0]), abs(scale[1]), abs(scale[2]))
+
+    def reindex_object(self, name: str) -> None:
+        """Update the spatial index after moving an object's entity directly.
+
+        Objects updated through `queue_update_object` or `touch_object` are
+        reindexed automatically.
+
+        Args:
+            name: The name of the object; unknown names are ignored
         """
-        self.objects[name] = Object(name, entity, time.time())
+        obj = self.objects.get(name)
+        if obj is not None:
+            self._index_object(name, obj.get_entity())
+
+    def refresh_spatial_index(self) -> None:
+        """Reindex every object, e.g. after moving many entities directly."""
+        for name, obj in list(self.objects.items()):
+            self._index_object(name, obj.get_entity())
+
+    def objects_in_radius(self, center, radius: float) -> List[Object]:
+        """Find the objects whose position is within a distance of a point.
+
+        Args:
+            center: The (x, y, z) center of the query
+            radius: The maximum distance
+
+        Returns:
+            List[Object]: The objects, in no particular order
+        """
+        return self._objects_named(self.spatial_index.query_radius(center, radius))
+
+    def objects_in_box(self, min_corner, max_corner) -> List[Object]:
+        """Find the objects whose position is inside an axis-aligned box.
+
+        Args:
+            min_corner: The (x, y, z) corner with the smallest coordinates
+            max_corner: The (x, y, z) corner with the largest coordinates
+
+        Returns:
+            List[Object]: The objects, in no particular order
+        """
+        return self._objects_named(self.spatial_index.query_box(min_corner, max_corner))
+
+    def nearest_objects(
+        self, point, k: int = 1, max_distance: float = math.inf
+    ) -> List[tuple]:
+        """Find the objects closest to a point.
+
+        Args:
+            point: The (x, y, z) query point
+            k: How many objects to find
+            max_distance: Ignore objects further away than this
+
+        Returns:
+            List[tuple]: Up to k (object, distance) pairs, closest first
+        """
+        found = []
+        for name, distance in self.spatial_index.nearest(point, k, max_distance):
+            obj = self.objects.get(name)
+            if obj is not None:
+                found.append((obj, distance))
+        return found
+
+    def _objects_named(self, names: List[str]) -> List[Object]:
+        return [self.objects[name] for name in names if name in self.objects]
+
+    def cull_offscreen_updates(self) -> int:
+        """Skip the per-frame `update` of objects outside the view frustum.
+
+        Ursina skips the `update` of entities marked `ignore`, so objects
+        whose bounding sphere is entirely out of view are marked, and
+        unmarked once they come back into view. Ignored entities also do not
+        receive input events. Must be called once per frame on the render
+        thread; does nothing unless the world was created with `cull_updates`.
+
+        Returns:
+            int: The number of objects whose updates are skipped
+        """
+        if not self.cull_updates or not self._updatable:
+            return len(self._culled)
+
+        cam = application.base.cam
+        frustum = cam.node().get_lens().make_bounds()
+        frustum.xform(cam.get_mat(scene))
+        planes = np.array(
+            [tuple(frustum.get_plane(i)) for i in range(frustum.get_num_planes())],
+            dtype=np.float64,
+        )
+
+        updatable = [
+            (name, entity)
+            for name, entity in list(self._updatable.items())
+            if name in self.spatial_index
+        ]
+        visible = self.spatial_index.visible_mask(
+            [name for name, _ in updatable], planes
+        )
+        for (name, entity), is_visible in zip(updatable, visible):
+            if is_visible and name in self._culled:
+                self._culled.discard(name)
+                entity.ignore = False
+            elif not is_visible and name not in self._culled:
+                self._culled.add(name)
+                entity.ignore = True
+        return len(self._culled)
+
+    def expire_objects(self, now: Optional[float] = None) -> List[str]:
+        """Remove the objects whose TTL has run out.
+
+        Only heap entries that are due are visited, so a pass costs
+        O(expired * log n) rather than a scan of every object. Must be called
+        on the render thread, since it destroys entities.
+
+        Args:
+            now: The current timestamp; defaults to time.time()
+
+        Returns:
+            List[str]: The names of the removed objects
+        """
+        if now is None:
+            now = time.time()
+
+        expired = []
+        with self._expiry_lock:
+            while self._expiry_heap and self._expiry_heap[0][0] <= now:
+                _, _, obj = heapq.heappop(self._expiry_heap)
+                name = obj.get_name()
+                if self.objects.get(name) is not obj:
+                    continue
+
+                deadline = obj.get_deadline()
+                if deadline > now:
+                    heapq.heappush(
+                        self._expiry_heap, (deadline, next(self._expiry_ids), obj)
+                    )
+                    continue
+
+                expired.append(name)
+
+        for name in expired:
+            self.remove_object(name)
+        return expired
 
     def get_object(self, name: str) -> Object:
         """Get an object by name.
@@ -185,20 +590,154 @@ class World:
             name: The name of the object to remove
         """
         if name in self.objects:
-            destroy(self.objects[name].get_entity())
+            entity = self.objects[name].get_entity()
+            if not self._dispose_entity(name, entity):
+                destroy(entity)
             del self.objects[name]
+            self.spatial_index.remove(name)
+            self._bounding_radii.pop(name, None)
+            self._updatable.pop(name, None)
+            self._culled.discard(name)
 
     def clear_objects(self) -> None:
         """Clear all objects from the world."""
-        for obj in self.objects.values():
-            if hasattr(obj.get_entity(), "destroy"):
-                obj.get_entity().destroy()
+        for name, obj in self.objects.items():
+            entity = obj.get_entity()
+            if not self._dispose_entity(name, entity):
+                destroy(entity)
         self.objects.clear()
+        self.spatial_index.clear()
+        self._bounding_radii.clear()
+        self._updatable.clear()
+        self._culled.clear()
 
     def update(self) -> None:
-        """Update the world state."""
-        # Update any dynamic objects
-        for obj in self.objects.values():
-            entity = obj.get_entity()
-            if hasattr(entity, "update"):
+        """Call the `update` of every object that has one and is not culled."""
+        for name, entity in list(self._updatable.items()):
+            if name not in self._culled:
                 entity.update()
+
+    def queue_add_object(
+        self,
+        name: str,
+        create: Callable[[], Entity],
+        ttl: Optional[float] = None,
+    ) -> None:
+        """Queue adding an object, created on the render thread.
+
+        Entities must not be created off the render thread, so the command
+        carries a factory instead of an entity. A pending add of the same name
+        is replaced, so only one entity is created for it.
+
+        Args:
+            name: The name/identifier for the object
+            create: Called on the render thread to create the entity
+            ttl: The time to live of the object, see `add_object`
+        """
+        with self._commands_lock:
+            command_key = self._pending_adds.get(name)
+            if command_key is None:
+                command_key = ("add", next(self._command_ids))
+                self._pending_adds[name] = command_key
+            # replacing a pending add keeps its place in the queue
+            self._commands[command_key] = SceneCommand(
+                SceneCommandType.ADD, name, create, ttl
+            )
+
+    def queue_update_object(
+        self, name: str, update: Callable[[Entity], None], key: str = ""
+    ) -> None:
+        """Queue an update of an object, applied on the render thread.
+
+        A newer update with the same name and key replaces a pending one, so
+        only the latest state is applied. Updates to objects that do not exist
+        when the command runs are skipped; applying an update touches the
+        object.
+
+        Args:
+            name: The name of the object to update
+            update: Called on the render thread with the object's entity
+            key: Separates independent updates to the same object, for
+                example "position" and "color"
+        """
+        command_key = ("update", name, key)
+        with self._commands_lock:
+            self._commands[command_key] = SceneCommand(
+                SceneCommandType.UPDATE, name, update
+            )
+            # apply the latest state after everything queued before it
+            self._commands.move_to_end(command_key)
+            self._pending_update_keys.setdefault(name, set()).add(command_key)
+
+    def queue_remove_object(self, name: str) -> None:
+        """Queue removing an object, dropping its pending updates.
+
+        Args:
+            name: The name of the object to remove
+        """
+        with self._commands_lock:
+            for command_key in self._pending_update_keys.pop(name, ()):
+                self._commands.pop(command_key, None)
+            # an add queued after the removal is a new object
+            self._pending_adds.pop(name, None)
+            self._commands[("remove", next(self._command_ids))] = SceneCommand(
+                SceneCommandType.REMOVE, name
+            )
+
+    def pending_command_count(self) -> int:
+        """Get the number of queued scene commands.
+
+        Returns:
+            int: The number of commands waiting to be applied
+        """
+        return len(self._commands)
+
+    def process_commands(self) -> int:
+        """Apply queued scene commands until the frame budget is used up.
+
+        Must be called once per frame on the render thread. Commands are
+        applied in the order they were queued; whatever does not fit in
+        `command_budget_ms` is left for the next frame.
+
+        Returns:
+            int: The number of commands applied
+        """
+        deadline = time.perf_counter() + self.command_budget_ms / 1000
+        applied = 0
+        while True:
+            with self._commands_lock:
+                if not self._commands:
+                    break
+                command_key, command = self._commands.popitem(last=False)
+                if command.type == SceneCommandType.UPDATE:
+                    update_keys = self._pending_update_keys.get(command.name)
+                    if update_keys is not None:
+                        update_keys.discard(command_key)
+                        if not update_keys:
+                            del self._pending_update_keys[command.name]
+                elif command.type == SceneCommandType.ADD:
+                    if self._pending_adds.get(command.name) == command_key:
+                        del self._pending_adds[command.name]
+
+            try:
+                self._apply_command(command)
+            except Exception as e:
+                print(f"Error applying {command.type.value} of {command.name}: {e}")
+
+            applied += 1
+            if time.perf_counter() >= deadline:
+                break
+
+        return applied
+
+    def _apply_command(self, command: SceneCommand) -> None:
+        if command.type == SceneCommandType.ADD:
+            self.add_object(command.name, command.action(), command.ttl)
+        elif command.type == SceneCommandType.UPDATE:
+            obj = self.objects.get(command.name)
+            if obj is not None:
+                command.action(obj.get_entity())
+                obj.touch()
+                self._index_object(command.name, obj.get_entity())
+        else:
+            self.remove_object(command.name)
@@ -0,0 +1,342 @@
+"""Shared-memory ring buffer of fixed-size frames.
+
+A producer writes each frame once and any number of processes read it as a
+numpy view of the shared memory, without copying. The writer never waits for
+readers: every slot carries a sequence number, and a reader that falls more
+than `num_slots` frames behind notices that its slot was overwritten and
+skips ahead instead.
+
+Views are RingFrames, which remember the frame they show, so whoever uses a
+view last can check that it was not overwritten in the meantime.
+"""
+
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any
+
+import numpy as np
+
+# magic, num_slots, ndim, next sequence
+_HEADER_FIELDS = 4
+_MAX_DIMS = 4
+_DTYPE_BYTES = 16
+_HEADER_BYTES = (_HEADER_FIELDS + _MAX_DIMS) * 8 + _DTYPE_BYTES
+_MAGIC = 0x7669_7A33_7269_6E67  # "viz3ring"
+
+
+def _is_intact(stamps: np.ndarray, sequence: int) -> bool:
+    if sequence < 0:
+        return False
+    return int(stamps[sequence % len(stamps)]) == 2 * sequence + 2
+
+
+class RingFrame(np.ndarray):
+    """A read-only view of one frame of a FrameRing.
+
+    Arrays derived from a RingFrame, such as slices or the results of
+    arithmetic, are not tracked: `is_current` is always True for them.
+    """
+
+    def __array_finalize__(self, obj: Any) -> None:
+        self.sequence = -1
+        self._ring: "FrameRing | None" = None
+        self._stamps: np.ndarray | None = None
+
+    def is_current(self) -> bool:
+        """Check if the frame is still intact.
+
+        Call this after using the frame, e.g. after copying it into a
+        texture, to find out whether the writer overwrote its slot meanwhile.
+
+        Returns:
+            bool: True if the frame was not overwritten
+        """
+        if self._stamps is None:
+            return True
+        # the stamps are kept alive by this view, even if the ring was closed
+        return _is_intact(self._stamps, self.sequence)
+
+    def latest(self) -> "RingFrame | None":
+        """Get a view of the newest complete frame of the same ring.
+
+        Returns:
+            RingFrame | None: The view, or None if the frame is not tracked,
+                its ring was closed, or the newest frame is being overwritten
+        """
+        ring = self._ring
+        if ring is None or ring.closed:
+            return None
+        return ring.read(ring.latest_sequence())
+
+
+def is_intact(payload: Any) -> bool:
+    """Check that a payload is not a RingFrame that was overwritten.
+
+    Args:
+        payload: Any message payload
+
+    Returns:
+        bool: False only for a RingFrame whose slot was reused
+    """
+    return not isinstance(payload, RingFrame) or payload.is_current()
+
+
+class FrameRing:
+    """Ring of `num_slots` frames of one shape and dtype in shared memory.
+
+    Slot states are encoded in a per-slot stamp: a slot holding frame `seq`
+    is stamped `2 * seq + 2`, and `2 * seq + 1` while the frame is written.
+    A view of frame `seq` is valid as long as its slot still has the stamp it
+    was read with, which `is_current` checks.
+    """
+
+    def __init__(self, segment: SharedMemory, owner: bool) -> None:
+        """Map an existing ring; use `create` or `attach` instead.
+
+        Args:
+            segment: The shared memory holding the ring
+            owner: Whether this process created the ring and unlinks it on close
+        """
+        self.segment = segment
+        self.owner = owner
+        self.closed = False
+
+        header = np.ndarray(
+            (_HEADER_FIELDS + _MAX_DIMS,), dtype=np.int64, buffer=segment.buf
+        )
+        if header[0] != _MAGIC:
+            raise ValueError(f"{segment.name} is not a frame ring")
+        self._header = header
+        self.num_slots = int(header[1])
+        self.shape = tuple(int(size) for size in header[4 : 4 + int(header[2])])
+        dtype = bytes(segment.buf[_HEADER_BYTES - _DTYPE_BYTES : _HEADER_BYTES]).rstrip(
+            b"\0"
+        )
+        self.dtype = np.dtype(dtype.decode())
+
+        self._stamps = np.ndarray(
+            (self.num_slots,), dtype=np.int64, buffer=segment.buf, offset=_HEADER_BYTES
+        )
+        self.slots = np.ndarray(
+            (self.num_slots, *self.shape),
+            dtype=self.dtype,
+            buffer=segment.buf,
+            offset=_HEADER_BYTES + self.num_slots * 8,
+        )
+
+    @property
+    def name(self) -> str:
+        """The name other processes attach to the ring with."""
+        return self.segment.name
+
+    @classmethod
+    def create(
+        cls,
+        shape: tuple[int, ...],
+        dtype: np.dtype | str = np.uint8,
+        num_slots: int = 8,
+        name: str | None = None,
+    ) -> "FrameRing":
+        """Create a ring in a new shared memory segment.
+
+        Args:
+            shape: The shape of every frame
+            dtype: The dtype of every frame
+            num_slots: How many frames the ring holds before wrapping around
+            name: The segment name; a unique one is chosen when None
+
+        Returns:
+            FrameRing: The ring, owned by this process
+        """
+        if len(shape) > _MAX_DIMS:
+            raise ValueError(f"frames can have at most {_MAX_DIMS} dimensions")
+        dtype = np.dtype(dtype)
+        frame_bytes = int(np.prod(shape)) * dtype.itemsize
+        segment = SharedMemory(
+            name=name,
+            create=True,
+            size=_HEADER_BYTES + num_slots * 8 + num_slots * frame_bytes,
+        )
+
+        header = np.ndarray(
+            (_HEADER_FIELDS + _MAX_DIMS,), dtype=np.int64, buffer=segment.buf
+        )
+        header[:] = 0
+        header[1] = num_slots
+        header[2] = len(shape)
+        header[3] = 0
+        header[4 : 4 + len(shape)] = shape
+        dtype_name = dtype.str.encode().ljust(_DTYPE_BYTES, b"\0")
+        segment.buf[_HEADER_BYTES - _DTYPE_BYTES : _HEADER_BYTES] = dtype_name
+        np.ndarray(
+            (num_slots,), dtype=np.int64, buffer=segment.buf, offset=_HEADER_BYTES
+        )[:] = 0
+        # written last, so a half-initialized ring is never attached to
+        header[0] = _MAGIC
+        del header
+
+        return cls(segment, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "FrameRing":
+        """Map a ring created by another process.
+
+        Args:
+            name: The name of the ring
+
+        Returns:
+            FrameRing: The ring
+        """
+        segment = SharedMemory(name=name)
+        # the creating process owns the segment; without this the resource
+        # tracker of this process would unlink it when this process exits
+        resource_tracker.unregister(segment._name, "shared_memory")  # type: ignore
+        return cls(segment, owner=False)
+
+    def fits(self, frame: np.ndarray) -> bool:
+        """Check if a frame has the shape and dtype of the ring's slots.
+
+        Args:
+            frame: The frame to check
+
+        Returns:
+            bool: True if the frame can be written to the ring
+        """
+        return frame.shape == self.shape and frame.dtype == self.dtype
+
+    def write(self, frame: np.ndarray) -> int:
+        """Copy a frame into the next slot, overwriting the oldest frame.
+
+        Args:
+            frame: A frame with the ring's shape and dtype
+
+        Returns:
+            int: The sequence number of the frame
+        """
+        if not self.fits(frame):
+            raise ValueError(
+                f"frame of shape {frame.shape} and dtype {frame.dtype} does not fit"
+                f" a ring of shape {self.shape} and dtype {self.dtype}"
+            )
+        sequence = int(self._header[3])
+        slot = sequence % self.num_slots
+        self._stamps[slot] = 2 * sequence + 1
+        self.slots[slot] = frame
+        self._stamps[slot] = 2 * sequence + 2
+        self._header[3] = sequence + 1
+        return sequence
+
+    def latest_sequence(self) -> int:
+        """Get the sequence number of the newest complete frame.
+
+        Returns:
+            int: The sequence number, or -1 if nothing was written yet
+        """
+        return int(self._header[3]) - 1
+
+    def is_current(self, sequence: int) -> bool:
+        """Check if a frame is still in the ring and completely written.
+
+        Call this after using a view returned by `read` to find out whether
+        the writer overwrote it in the meantime.
+
+        Args:
+            sequence: The sequence number of the frame
+
+        Returns:
+            bool: True if the frame is intact
+        """
+        return _is_intact(self._stamps, sequence)
+
+    def read(self, sequence: int) -> RingFrame | None:
+        """Get a view of a frame, without copying.
+
+        The view stays valid until the writer wraps around to its slot, which
+        happens `num_slots` frames later.
+
+        Args:
+            sequence: The sequence number of the frame
+
+        Returns:
+            RingFrame | None: A read-only view, or None if the frame was not
+                written yet or was already overwritten
+        """
+        if not self.is_current(sequence):
+            return None
+        view = self.slots[sequence % self.num_slots].view(RingFrame)
+        view.flags.writeable = False
+        view.sequence = sequence
+        view._ring = self
+        view._stamps = self._stamps
+        return view
+
+    def close(self) -> None:
+        """Unmap the ring, and remove it if this process created it."""
+        self.closed = True
+        del self.slots, self._stamps, self._header
+        try:
+            self.segment.close()
+        except BufferError:
+            # frames read from the ring are still in use; the mapping is
+            # released once the last view is garbage collected
+            pass
+        if self.owner:
+            try:
+                self.segment.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class FrameRingReader:
+    """Follows a FrameRing from one process, detecting when it falls behind."""
+
+    def __init__(self, ring: FrameRing) -> None:
+        """Initialize the reader at the ring's newest frame.
+
+        Args:
+            ring: The ring to read
+        """
+        self.ring = ring
+        self.next_sequence = max(ring.latest_sequence(), 0)
+        # frames the writer overwrote before this reader got to them
+        self.skipped = 0
+
+    def read_next(self) -> tuple[int, RingFrame] | None:
+        """Get the next unread frame.
+
+        If the writer lapped the reader, the frames that were overwritten are
+        counted in `skipped` and reading continues at the oldest frame still
+        in the ring.
+
+        Returns:
+            tuple | None: The sequence number and a view of the frame, or None
+                if there is no new frame
+        """
+        latest = self.ring.latest_sequence()
+        oldest = latest - self.ring.num_slots + 1
+        if self.next_sequence < oldest:
+            self.skipped += oldest - self.next_sequence
+            self.next_sequence = oldest
+
+        while self.next_sequence <= latest:
+            sequence = self.next_sequence
+            self.next_sequence += 1
+            frame = self.ring.read(sequence)
+            if frame is not None:
+                return sequence, frame
+            # overwritten between the check above and the read
+            self.skipped += 1
+        return None
+
+    def read_latest(self) -> tuple[int, RingFrame] | None:
+        """Get the newest frame, skipping any unread frames before it.
+
+        Returns:
+            tuple | None: The sequence number and a view of the frame, or None
+                if there is no new frame
+        """
+        latest = self.ring.latest_sequence()
+        if latest >= self.next_sequence:
+            self.skipped += latest - self.next_sequence
+            self.next_sequence = latest
+        return self.read_next()
@@ -0,0 +1,416 @@
+"""Supervision of the window processes started by `viz3`.
+
+`WindowSupervisor` blocks until a window process exits or sends telemetry,
+instead of polling. Windows that crash are restarted after a delay that
+doubles with every crash in a row, up to a limit; windows closed by the
+user, which exit with code 0, are not.
+
+Every window reports its frame rate and the pipeline that spends the most
+time processing messages to the supervisor over a pipe, once per second.
+The supervisor adds the CPU usage and resident memory of every window
+process, read from /proc on Linux, and prints a table of all windows, or
+appends the samples as JSON lines to a log file.
+"""
+
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from multiprocessing.connection import wait
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable
+
+if TYPE_CHECKING:
+    from viz3.metrics import MetricsRegistry
+
+# how long to wait between exit checks of processes without an exit sentinel
+_POLL_INTERVAL_S = 0.5
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def read_process_usage(pid: int) -> tuple[float, int] | None:
+    """Read the CPU time and resident memory of a process from /proc.
+
+    Args:
+        pid: The process ID
+
+    Returns:
+        tuple | None: The user plus system CPU seconds and the resident bytes,
+            or None if /proc is not available or the process has exited
+    """
+    try:
+        stat = Path(f"/proc/{pid}/stat").read_text()
+        statm = Path(f"/proc/{pid}/statm").read_text()
+    except OSError:
+        return None
+    # the command name in parentheses may contain spaces
+    fields = stat[stat.rindex(")") + 2 :].split()
+    if fields[0] == "Z":
+        # exited, waiting to be reaped
+        return None
+    cpu_seconds = (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS
+    return cpu_seconds, int(statm.split()[1]) * _PAGE_SIZE
+
+
+class TelemetryWriter:
+    """Sends a window's frame rate and busiest pipeline to the supervisor.
+
+    Runs on the render thread; `maybe_write` is called every frame and
+    writes a JSON line at most every `interval_s`. The pipe is
+    non-blocking, so a supervisor that stops reading never stalls the
+    window; samples that do not fit are dropped.
+    """
+
+    def __init__(
+        self, fd: int, metrics: "MetricsRegistry", interval_s: float = 1.0
+    ) -> None:
+        """Initialize the writer.
+
+        Args:
+            fd: The write end of the telemetry pipe
+            metrics: The window's metrics
+            interval_s: Seconds between samples
+        """
+        self.fd = fd
+        self.metrics = metrics
+        self.interval_s = interval_s
+        # the first sample once there are frame times
+        self._next_write = time.perf_counter() + interval_s
+        os.set_blocking(fd, False)
+
+    def maybe_write(self) -> None:
+        """Write a sample if the interval has passed."""
+        now = time.perf_counter()
+        if self.fd < 0 or now < self._next_write:
+            return
+        self._next_write = now + self.interval_s
+
+        snapshot = self.metrics.snapshot()
+        # milliseconds spent processing per second of wall time
+        busy = {
+            name: pipeline["process_ms"]["mean"] * pipeline["processed_per_s"]
+            for name, pipeline in snapshot["pipelines"].items()
+        }
+        busiest = max(busy, key=busy.get, default=None)  # type: ignore
+        sample = {
+            "fps": snapshot["frame"]["fps"],
+            "busiest_pipeline": busiest,
+            "busiest_ms_per_s": busy.get(busiest, 0.0),  # type: ignore
+        }
+        try:
+            os.write(self.fd, (json.dumps(sample) + "\n").encode())
+        except BlockingIOError:
+            pass
+        except OSError:
+            # the supervisor is gone
+            os.close(self.fd)
+            self.fd = -1
+
+
+@dataclass
+class WindowSample:
+    """Resource usage of one window process."""
+
+    window: int
+    pid: int | None
+    state: str
+    restarts: int
+    cpu_percent: float | None = None
+    rss_mb: float | None = None
+    fps: float | None = None
+    busiest_pipeline: str | None = None
+    busiest_ms_per_s: float | None = None
+
+
+class SupervisedWindow:
+    """The process and restart state of one window."""
+
+    def __init__(self, index: int) -> None:
+        """Initialize a window that has not been started yet.
+
+        Args:
+            index: The window's index
+        """
+        self.index = index
+        self.process = None
+        self.started_at = 0.0
+        self.restarts = 0
+        # crashes since the window last ran for `healthy_after_s`
+        self.failures = 0
+        self.restart_at: float | None = None
+        self.state = "starting"
+        self.exit_sentinel: Any = None
+        self.telemetry_fd: int | None = None
+        self._telemetry_buffer = b""
+        self.telemetry: dict[str, Any] = {}
+        self._last_usage: tuple[float, float] | None = None
+
+    def read_telemetry(self) -> None:
+        """Read the samples the window sent since the last read."""
+        try:
+            data = os.read(self.telemetry_fd, 65536)  # type: ignore
+        except (BlockingIOError, InterruptedError):
+            return
+        if not data:
+            # the window closed its end
+            self.close_telemetry()
+            return
+        lines = (self._telemetry_buffer + data).split(b"\n")
+        self._telemetry_buffer = lines.pop()
+        for line in lines:
+            try:
+                self.telemetry = json.loads(line)
+            except ValueError:
+                pass
+
+    def close_telemetry(self) -> None:
+        """Close the supervisor's end of the telemetry pipe."""
+        if self.telemetry_fd is not None:
+            os.close(self.telemetry_fd)
+            self.telemetry_fd = None
+        self._telemetry_buffer = b""
+
+    def close_exit_sentinel(self) -> None:
+        """Close the pidfd opened for the process, if any."""
+        if isinstance(self.exit_sentinel, int):
+            os.close(self.exit_sentinel)
+        self.exit_sentinel = None
+
+    def sample(self) -> WindowSample:
+        """Sample the window's resource usage.
+
+        Returns:
+            WindowSample: The usage; CPU is averaged since the last sample
+        """
+        pid = self.process.pid if self.process is not None else None
+        sample = WindowSample(self.index, pid, self.state, self.restarts)
+        if self.state != "running" or pid is None:
+            return sample
+
+        usage = read_process_usage(pid)
+        if usage is not None:
+            cpu_seconds, rss_bytes = usage
+            now = time.monotonic()
+            if self._last_usage is not None and now > self._last_usage[1]:
+                sample.cpu_percent = (
+                    100
+                    * (cpu_seconds - self._last_usage[0])
+                    / (now - self._last_usage[1])
+                )
+            self._last_usage = (cpu_seconds, now)
+            sample.rss_mb = rss_bytes / 2**20
+        sample.fps = self.telemetry.get("fps")
+        sample.busiest_pipeline = self.telemetry.get("busiest_pipeline")
+        sample.busiest_ms_per_s = self.telemetry.get("busiest_ms_per_s")
+        return sample
+
+
+def format_samples(samples: list[WindowSample]) -> str:
+    """Format window samples as a table.
+
+    Args:
+        samples: One sample per window
+
+    Returns:
+        str: The table, with a header line
+    """
+
+    def number(value: float | None, digits: int = 1) -> str:
+        return "-" if value is None else f"{value:.{digits}f}"
+
+    lines = [
+        f"{'window':<8}{'pid':>8}  {'state':<10}{'restarts':>9}{'cpu %':>8}"
+        f"{'rss MB':>9}{'fps':>7}  busiest pipeline"
+    ]
+    for sample in samples:
+        busiest = "-"
+        if sample.busiest_pipeline is not None:
+            busiest = (
+                f"{sample.busiest_pipeline}"
+                f" ({number(sample.busiest_ms_per_s, 0)} ms/s)"
+            )
+        lines.append(
+            f"{sample.window:<8}{sample.pid or '-':>8}  {sample.state:<10}"
+            f"{sample.restarts:>9}{number(sample.cpu_percent):>8}"
+            f"{number(sample.rss_mb):>9}{number(sample.fps):>7}  {busiest}"
+        )
+    return "\n".join(lines)
+
+
+class WindowSupervisor:
+    """Starts the window processes, restarts crashed ones and samples them.
+
+    Runs in the process that started the windows, without threads, so that
+    process can keep forking windows.
+    """
+
+    def __init__(
+        self,
+        start_window: Callable[[int, int | None], Any],
+        num_windows: int,
+        max_restarts: int = 5,
+        backoff_s: float = 1.0,
+        max_backoff_s: float = 60.0,
+        healthy_after_s: float = 30.0,
+        telemetry_interval_s: float = 10.0,
+        telemetry_log: str | Path | None = None,
+    ) -> None:
+        """Initialize the supervisor.
+
+        Args:
+            start_window: Starts the window with the given index and returns
+                its process, which has `pid`, `poll`, `terminate` and `wait`
+                like subprocess.Popen. The second argument is the write end
+                of the window's telemetry pipe, or None
+            num_windows: How many windows to start
+            max_restarts: How many crashes in a row a window is restarted
+                after before it is given up on
+            backoff_s: The delay before the first restart; it doubles with
+                every crash in a row
+            max_backoff_s: The longest delay before a restart
+            healthy_after_s: A window that ran this long before it crashed
+                counts as a first crash again
+            telemetry_interval_s: Seconds between resource samples, or 0 to
+                not sample
+            telemetry_log: A file to append the samples to as JSON lines
+                instead of printing them as a table
+        """
+        self.start_window = start_window
+        self.windows = [SupervisedWindow(index) for index in range(num_windows)]
+        self.max_restarts = max_restarts
+        self.backoff_s = backoff_s
+        self.max_backoff_s = max_backoff_s
+        self.healthy_after_s = healthy_after_s
+        self.telemetry_interval_s = telemetry_interval_s
+        self.telemetry_log = Path(telemetry_log) if telemetry_log else None
+        self._can_pipe = os.name == "posix"
+
+    def _start(self, window: SupervisedWindow) -> None:
+        write_fd = None
+        if self._can_pipe and self.telemetry_interval_s > 0:
+            window.telemetry_fd, write_fd = os.pipe()
+            os.set_blocking(window.telemetry_fd, False)
+        try:
+            window.process = self.start_window(window.index, write_fd)
+        finally:
+            if write_fd is not None:
+                os.close(write_fd)
+        window.started_at = time.monotonic()
+        window.restart_at = None
+        window.state = "running"
+        window.telemetry = {}
+        # a new process starts without CPU time
+        window._last_usage = (0.0, window.started_at)
+        window.exit_sentinel = getattr(window.process, "sentinel", None)
+        if window.exit_sentinel is None and hasattr(os, "pidfd_open"):
+            try:
+                window.exit_sentinel = os.pidfd_open(window.process.pid)
+            except OSError:
+                pass
+        print(
+            f"Started window process {window.index + 1} with PID: {window.process.pid}"
+        )
+
+    def _handle_exit(self, window: SupervisedWindow, exit_code: int) -> None:
+        window.close_exit_sentinel()
+        window.close_telemetry()
+        if exit_code == 0:
+            window.state = "closed"
+            print(f"Window {window.index + 1} closed")
+            return
+
+        now = time.monotonic()
+        if now - window.started_at >= self.healthy_after_s:
+            window.failures = 0
+        window.failures += 1
+        if window.failures > self.max_restarts:
+            window.state = "failed"
+            print(
+                f"Window {window.index + 1} exited with code {exit_code}; giving up"
+                f" after {self.max_restarts} restarts in a row"
+            )
+            return
+
+        delay = min(self.backoff_s * 2 ** (window.failures - 1), self.max_backoff_s)
+        window.state = "backoff"
+        window.restart_at = now + delay
+        print(
+            f"Window {window.index + 1} exited with code {exit_code};"
+            f" restarting in {delay:.1f} s"
+        )
+
+    def _check_exits(self) -> None:
+        for window in self.windows:
+            if window.state != "running":
+                continue
+            exit_code = window.process.poll()
+            if exit_code is not None:
+                self._handle_exit(window, exit_code)
+
+    def _report(self) -> None:
+        samples = [window.sample() for window in self.windows]
+        if self.telemetry_log is None:
+            print(format_samples(samples))
+            return
+        record = {"timestamp": time.time(), "windows": [asdict(s) for s in samples]}
+        try:
+            with self.telemetry_log.open("a") as log:
+                log.write(json.dumps(record) + "\n")
+        except OSError as e:
+            print(f"Error writing telemetry to {self.telemetry_log}: {e}")
+
+    def run(self) -> None:
+        """Start the windows and supervise them until none is left running."""
+        for window in self.windows:
+            self._start(window)
+
+        next_report = time.monotonic() + self.telemetry_interval_s
+        while any(w.state in ("running", "backoff") for w in self.windows):
+            now = time.monotonic()
+            deadlines = [w.restart_at for w in self.windows if w.restart_at is not None]
+            if self.telemetry_interval_s > 0:
+                deadlines.append(next_report)
+            running = [w for w in self.windows if w.state == "running"]
+            if any(w.exit_sentinel is None for w in running):
+                deadlines.append(now + _POLL_INTERVAL_S)
+            timeout = max(min(deadlines) - now, 0.0) if deadlines else None
+
+            waitables: dict[Any, SupervisedWindow] = {}
+            for window in running:
+                if window.exit_sentinel is not None:
+                    waitables[window.exit_sentinel] = window
+                if window.telemetry_fd is not None:
+                    waitables[window.telemetry_fd] = window
+            ready = wait(list(waitables), timeout) if waitables else []
+            if not waitables and timeout:
+                time.sleep(timeout)
+
+            for item in ready:
+                window = waitables[item]
+                if item == window.telemetry_fd:
+                    window.read_telemetry()
+            self._check_exits()
+
+            now = time.monotonic()
+            for window in self.windows:
+                if window.restart_at is not None and now >= window.restart_at:
+                    window.restarts += 1
+                    self._start(window)
+            if self.telemetry_interval_s > 0 and now >= next_report:
+                self._report()
+                next_report = now + self.telemetry_interval_s
+
+    def terminate_all(self) -> None:
+        """Terminate every running window and wait for them to exit."""
+        for window in self.windows:
+            window.restart_at = None
+            if window.state == "running":
+                window.process.terminate()
+        for window in self.windows:
+            if window.state == "running":
+                window.process.wait()
+                window.state = "closed"
+            window.close_exit_sentinel()
+            window.close_telemetry()
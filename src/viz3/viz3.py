@@ -1,78 +1,160 @@
-from typing import List
-from ursina import *
-from ursina.prefabs.first_person_controller import FirstPersonController
+import asyncio
+import multiprocessing
+import threading
+import time
+from functools import partial
+from typing import TYPE_CHECKING, Awaitable, Callable, List
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from viz3.config_parser import parse_args
+from viz3.metrics import StartupTimer
+
+# started before the imports, most of which happen in setup()
+startup = StartupTimer()
+
 from viz3.object_pipeline.pipeline import (
     Pipeline,
     PipelineGlobalConfig,
     PipelineOptions,
     PointOfView,
 )
-from viz3.object_pipeline.plugin_manager import PluginManager, Directory
-import asyncio
-import threading
-from viz3.render.world import World
-from autobahn_client.client import Autobahn
-from autobahn_client.util import Address
-from viz3.config_parser import parse_args
-from pathlib import Path
-
-from viz3.util import print_cool_ascii_art, subscribe_to_multiple_topics
+from viz3.object_pipeline.plugin_manager import PluginManager, plugin_manager_from_args
+from viz3.object_pipeline.plugin_manifest import shows_in_window
+from viz3.object_pipeline.delivery import DecodeExecutor, PipelineDelivery
+from viz3.object_pipeline.scheduler import TickScheduler
+from viz3.metrics import MetricsRegistry
+
+if TYPE_CHECKING:
+    from ursina import Ursina
+    from viz3.metrics import MetricsExporter
+    from viz3.render.world import World
+    from viz3.supervisor import TelemetryWriter
+
+# set up by setup(). Ursina, Panda3D and the world are imported by setup(),
+# so importing this module does not import them; modules only needed by
+# some windows, such as the hub client, recording, the Autobahn client and
+# the metrics exporter, are imported where they are used
+args = None
+window_number: int | None = None
+plugin_manager: PluginManager | None = None
+app: "Ursina | None" = None
+world: "World | None" = None
+tick_scheduler: TickScheduler | None = None
+metrics: MetricsRegistry | None = None
+metrics_exporter: "MetricsExporter | None" = None
+telemetry: "TelemetryWriter | None" = None
+_first_frame = True
+# run when the window closes; not atexit, which forked windows skip
+_closers: List[Callable[[], None]] = []
+
+
+def setup(preloaded_plugins: PluginManager | None = None) -> None:
+    """Parse the arguments, load the plugins and open the window.
+
+    Args:
+        preloaded_plugins: Plugins already loaded by the process this window
+            was forked from, or None to load them
+    """
+    global args, window_number, plugin_manager, app, world, tick_scheduler
+    global metrics, metrics_exporter, telemetry
 
-args = parse_args(additional_args=["--window-number"])
+    from ursina import Entity, Ursina
+    from viz3.render.metrics_overlay import MetricsOverlay
+    from viz3.render.world import World
 
-window_number = args.window_number
+    startup.mark("imports")
+    args = parse_args(additional_args=["--window-number"])
+    window_number = int(args.window_number) if args.window_number else None
 
-plugin_dirs = []
-if args.plugin_directories:
-    plugin_dirs = [
-        Directory(
-            path=Path(plugin_directory),
-            exclude_files=args.plugin_exclude_files or ["__init__.py"],
+    if preloaded_plugins is not None:
+        plugin_manager = preloaded_plugins
+    else:
+        plugin_manager = plugin_manager_from_args(args, window_number)
+        plugin_manager.load_plugins()
+    startup.mark("plugins")
+
+    available_topics = plugin_manager.list_topics()
+    print(f"Available pipeline topics: {available_topics}")
+
+    app = Ursina(
+        window_size=(args.window_width, args.window_height),
+        window_title="viz3",
+        window_position=(
+            args.window_index * args.window_x_offset,
+            args.window_index * args.window_y_offset,
+        ),
+        borderless=args.window_borderless,
+        resizable=args.window_resizable,
+    )
+    world = World(cull_updates=args.cull_offscreen_updates)
+    tick_scheduler = TickScheduler(world)
+
+    metrics_window = window_number or 0
+    metrics = MetricsRegistry(world, window=metrics_window)
+    metrics.startup = startup
+    MetricsOverlay(metrics, visible=args.metrics_hud)
+    if args.metrics_file is not None or args.metrics_port is not None:
+        from viz3.metrics import MetricsExporter, window_metrics_path
+
+        metrics_exporter = MetricsExporter(
+            metrics,
+            (
+                window_metrics_path(args.metrics_file, metrics_window)
+                if args.metrics_file is not None
+                else None
+            ),
+            (
+                args.metrics_port + metrics_window
+                if args.metrics_port is not None
+                else None
+            ),
+            args.metrics_interval_s,
         )
-        for plugin_directory in args.plugin_directories
-    ]
-
-plugin_manager = PluginManager(plugin_dirs)
-plugin_manager.load_plugins()
-
-available_topics = plugin_manager.list_topics()
-print(f"Available pipeline topics: {available_topics}")
-
-app = Ursina(
-    window_size=(args.window_width, args.window_height),
-    window_title="viz3",
-    window_position=(
-        args.window_index * args.window_x_offset,
-        args.window_index * args.window_y_offset,
-    ),
-    borderless=args.window_borderless,
-    resizable=args.window_resizable,
-)
-world = World()
+        metrics_exporter.start()
+        _closers.append(metrics_exporter.close)
+
+    if args.telemetry_fd is not None:
+        from viz3.supervisor import TelemetryWriter
 
+        telemetry = TelemetryWriter(args.telemetry_fd, metrics)
 
-def should_show_pipeline(pipeline_options: PipelineOptions, window_number: int) -> bool:
-    if pipeline_options.window_number_to_show_in is None:
-        return True
+    Entity(name="frame_driver", update=update_frame)
+    startup.mark("window")
 
-    if (
-        isinstance(pipeline_options.window_number_to_show_in, int)
-        and window_number == pipeline_options.window_number_to_show_in
-    ):
-        return True
 
-    if (
-        isinstance(pipeline_options.window_number_to_show_in, list)
-        and window_number in pipeline_options.window_number_to_show_in
-    ):
-        return True
+def update_frame() -> None:
+    """Run the per-frame work that has to happen on the render thread."""
+    global _first_frame
+    if _first_frame:
+        _first_frame = False
+        startup.mark("first_frame")
+        print(startup.format())
 
-    return False
+    metrics.frame_started()
+    # Apply the scene commands queued by pipelines
+    commands_start = time.perf_counter()
+    world.process_commands()
+    metrics.commands_applied(commands_start, world.pending_command_count())
+    world.expire_objects()
+    world.trim_pools()
+    world.cull_offscreen_updates()
+    tick_scheduler.notify_frame()
+    if telemetry is not None:
+        telemetry.maybe_write()
 
 
-def set_point_of_view(config: PipelineGlobalConfig, world: World):
+def should_show_pipeline(
+    pipeline_options: PipelineOptions, window_number: int | None
+) -> bool:
+    return shows_in_window(pipeline_options.window_number_to_show_in, window_number)
+
+
+def set_point_of_view(config: PipelineGlobalConfig, world: "World"):
+    from ursina import EditorCamera, Vec3
+
     point_of_view_options = config.point_of_view_options
     if point_of_view_options == PointOfView.FIRST_PERSON:
+        from ursina.prefabs.first_person_controller import FirstPersonController
+
         fps_controller = FirstPersonController(speed=1, gravity=0, y=0)
         fps_controller.cursor.enabled = False
         world.set_camera(fps_controller)
@@ -81,45 +163,131 @@ def set_point_of_view(config: PipelineGlobalConfig, world: World):
         world.set_camera_rotation(Vec3(90, 0, 0))
 
 
-def set_world_options(config: PipelineGlobalConfig, world: World):
+def set_world_options(config: PipelineGlobalConfig, world: "World"):
+    from ursina import Vec3
+
     axes_options = config.axes_options
     plane_options = config.plane_options
 
     world_axes = world.get_axes()
-    world_axes.set_enabled(axes_options.show)
-    world_axes.set_thickness(axes_options.thickness)
-    world_axes.set_scale(
-        Vec3(
-            axes_options.length,
-            axes_options.length,
-            axes_options.length,
+    with world_axes.batch():
+        world_axes.set_enabled(axes_options.show)
+        world_axes.set_thickness(axes_options.thickness)
+        world_axes.set_scale(
+            Vec3(
+                axes_options.length,
+                axes_options.length,
+                axes_options.length,
+            )
         )
-    )
 
+    # rebuild the grid mesh once for all of its options
     world_grid = world.get_ground_grid()
-    world_grid.set_enabled(plane_options.show)
-    world_grid.set_size(plane_options.size)
-    world_grid.set_spacing(plane_options.spacing)
-    world_grid.set_thickness(plane_options.thickness)
-    world_grid.set_line_color(plane_options.line_color)
+    with world_grid.batch():
+        world_grid.set_enabled(plane_options.show)
+        world_grid.set_size(plane_options.size)
+        world_grid.set_spacing(plane_options.spacing)
+        world_grid.set_thickness(plane_options.thickness)
+        if plane_options.line_color is not None:
+            world_grid.set_line_color(plane_options.line_color)
 
     set_point_of_view(config, world)
 
 
+decode_thread_pool: ThreadPoolExecutor | None = None
+decode_process_pool: ProcessPoolExecutor | None = None
+
+
+def get_decode_executor(pipeline_options: PipelineOptions) -> Executor:
+    """Get the pool that runs a pipeline's decode stage, creating it on first use.
+
+    Args:
+        pipeline_options: The options the pipeline was registered with
+
+    Returns:
+        Executor: The thread or process pool
+    """
+    global decode_thread_pool, decode_process_pool
+
+    if pipeline_options.decode_executor == DecodeExecutor.PROCESS:
+        if decode_process_pool is None:
+            # workers load the plugins themselves, so decode functions defined
+            # in plugin files can be found by name. They are spawned, since by
+            # now this process has a graphics context and threads that a
+            # forked child would inherit in an undefined state, and they leave
+            # the plugin manifest to this process
+            decode_process_pool = ProcessPoolExecutor(
+                max_workers=args.decode_processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=partial(plugin_manager.load_plugins, save_manifest=False),
+            )
+        return decode_process_pool
+
+    if decode_thread_pool is None:
+        decode_thread_pool = ThreadPoolExecutor(
+            max_workers=args.decode_threads, thread_name_prefix="viz3-decode"
+        )
+    return decode_thread_pool
+
+
+def topic_callback(
+    topic_name: str, topic_deliveries: List[PipelineDelivery]
+) -> Callable[[bytes], Awaitable[None]]:
+    """Create the subscription callback of a topic.
+
+    Args:
+        topic_name: The topic
+        topic_deliveries: The deliveries of every pipeline subscribed to it
+
+    Returns:
+        Callable: An async callback that submits a message to every delivery
+    """
+
+    async def callback(message: bytes) -> None:
+        for delivery in topic_deliveries:
+            delivery.submit(topic_name, message)
+
+    return callback
+
+
 async def main() -> None:
-    global world
     """Main async function that sets up pipelines and runs the application.
 
     This function initializes the Autobahn server, creates pipelines for each
     registered topic, and subscribes to those topics with appropriate callbacks.
+    In hub mode the window receives its messages from the data hub instead.
     """
-    autobahn_server = Autobahn(Address(args.host, args.port))
-    await autobahn_server.begin()
+    from viz3.util import print_cool_ascii_art
+
+    if args.hub_address is not None:
+        from viz3.hub import HubClient, pipeline_key
+
+    autobahn_server = None
+    replayer = None
+    # with several windows each window records the topics it subscribes to
+    recording_window = window_number if args.number_of_windows_to_open > 1 else None
+    if args.hub_address is None and args.replay is not None:
+        from viz3.recording import Recording, Replayer, find_window_recording
+
+        replayer = Replayer(
+            Recording(find_window_recording(args.replay, recording_window)),
+            args.replay_speed or None,
+        )
+        autobahn_server = replayer
+    elif args.hub_address is None:
+        from autobahn_client.client import Autobahn
+        from autobahn_client.util import Address
+
+        autobahn_server = Autobahn(Address(args.host, args.port))
+        await autobahn_server.begin()
 
     global_config = PipelineGlobalConfig.get_registry()
     set_world_options(global_config, world)
 
     pipelines = []
+    deliveries: List[PipelineDelivery] = []
+    deliveries_by_key: dict[str, PipelineDelivery] = {}
+    deliveries_by_topic: dict[str, List[PipelineDelivery]] = {}
     registry = Pipeline.get_registry()
     print()
     print("-" * 50)
@@ -139,16 +307,65 @@ async def main() -> None:
             f"Loaded pipeline for topic: {topic.get_topics()} in window {window_number}"
         )
 
-        async def create_callback(pipeline_instance):
-            async def callback(message: bytes):
-                global world
-                await pipeline_instance.process(world, message)
-
-            return callback
+        delivery = PipelineDelivery(
+            pipeline,
+            world,
+            pipeline_options.delivery_policy,
+            pipeline_options.queue_size,
+            (
+                get_decode_executor(pipeline_options)
+                if pipeline.has_decode_stage()
+                else None
+            ),
+        )
+        delivery.start()
+        deliveries.append(delivery)
+        if args.hub_address is not None:
+            deliveries_by_key[pipeline_key(pipeline_options.pipeline_type)] = delivery
+        scheduled_tick = tick_scheduler.add(pipeline, pipeline_options.tick_rate)
+        delivery.metrics = metrics.add_pipeline(
+            pipeline.__class__.__name__,
+            topic.get_topics(),
+            delivery.stats,
+            scheduled_tick.stats,
+        )
 
-        await subscribe_to_multiple_topics(
-            autobahn_server, topic.get_topics(), await create_callback(pipeline)
+        for topic_name in topic.get_topics():
+            deliveries_by_topic.setdefault(topic_name, []).append(delivery)
+
+    if autobahn_server is not None:
+        recorder = None
+        if args.record is not None:
+            from viz3.recording import Recorder, window_recording_directory
+
+            record_directory = window_recording_directory(args.record, recording_window)
+            try:
+                recorder = Recorder(record_directory)
+            except FileExistsError as e:
+                # e.g. a restarted window; showing the topics matters more
+                print(f"Error: Not recording: {e}")
+            else:
+                _closers.append(recorder.close)
+                print(f"Recording topic traffic to {record_directory}")
+
+        # one subscription per topic; the client keeps a single callback per
+        # topic, so pipelines sharing a topic share the subscription
+        for topic_name, topic_deliveries in deliveries_by_topic.items():
+            callback = topic_callback(topic_name, topic_deliveries)
+            if recorder is not None:
+                callback = recorder.callback(topic_name, callback)
+            await autobahn_server.subscribe(topic_name, callback)
+
+    if args.hub_address is not None:
+        hub_client = HubClient(args.hub_address)
+        hub_client.connect(list(deliveries_by_key))
+        hub_client.start(
+            asyncio.get_running_loop(),
+            lambda key, topic_name, payload, decoded: deliveries_by_key[key].submit(
+                topic_name, payload, decoded
+            ),
         )
+        print(f"Receiving messages from data hub at {args.hub_address}")
 
     print("-" * 50)
     for pipeline in pipelines:
@@ -157,10 +374,11 @@ async def main() -> None:
     print("-" * 50)
     print()
 
-    while True:
-        for pipeline in pipelines:
-            pipeline.tick(world)
-        await asyncio.sleep(0.05)
+    if replayer is not None:
+        print(f"Replaying {args.replay} at speed {args.replay_speed or 'max'}")
+        asyncio.get_running_loop().create_task(replayer.run())
+
+    await tick_scheduler.run()
 
 
 def run_main() -> None:
@@ -168,19 +386,32 @@ def run_main() -> None:
     asyncio.run(main())
 
 
-def start() -> None:
-    """Start the application with threading support."""
+def close() -> None:
+    """Release what the window opened, such as recordings and metrics exports."""
+    while _closers:
+        closer = _closers.pop()
+        try:
+            closer()
+        except Exception as e:
+            print(f"Error closing {closer}: {e}")
+
+
+def start(preloaded_plugins: PluginManager | None = None) -> None:
+    """Start the application with threading support.
+
+    Args:
+        preloaded_plugins: Plugins already loaded by the process this window
+            was forked from, or None to load them
+    """
+    setup(preloaded_plugins)
     thread = threading.Thread(target=run_main)
     thread.daemon = True
     thread.start()
-    app.run()
+    try:
+        app.run()
+    finally:
+        close()
 
 
 if __name__ == "__main__":
     start()
-else:
-    # When run as entry point, execute the full application
-    thread = threading.Thread(target=run_main)
-    thread.daemon = True
-    thread.start()
-    app.run()
@@ -0,0 +1,31 @@
+"""Shared fixtures for the viz3 tests."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Iterator
+
+import pytest
+from panda3d.core import loadPrcFileData
+
+if TYPE_CHECKING:
+    from _pytest.capture import CaptureFixture
+    from _pytest.fixtures import FixtureRequest
+    from _pytest.logging import LogCaptureFixture
+    from _pytest.monkeypatch import MonkeyPatch
+    from pytest_mock.plugin import MockerFixture
+
+
+@pytest.fixture(scope="session")
+def app() -> Iterator[object]:
+    """Start one offscreen Ursina app for the whole test session.
+
+    Ursina is a singleton, so every test that needs entities or frames
+    shares it.
+
+    Yields:
+        Ursina: The running app; call `step()` on it to render a frame
+    """
+    loadPrcFileData("", "window-type offscreen\naudio-library-name null")
+    from ursina import Ursina
+
+    yield Ursina(window_type="offscreen")
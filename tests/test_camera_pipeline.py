@@ -0,0 +1,146 @@
+"""Tests for viz3.object_pipeline.camera_pipeline."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING, Iterator
+
+import numpy as np
+import pytest
+
+from viz3.object_pipeline.camera_pipeline import CameraStreamPipeline, DecodedFrame
+from viz3.object_pipeline.delivery import DeliveryPolicy
+from viz3.object_pipeline.pipeline import Pipeline, PipelineTopicOptions
+from viz3.render.objects.image_object import ImageObject
+from viz3.render.world import World
+
+if TYPE_CHECKING:
+    from _pytest.capture import CaptureFixture
+    from _pytest.fixtures import FixtureRequest
+    from _pytest.logging import LogCaptureFixture
+    from _pytest.monkeypatch import MonkeyPatch
+    from pytest_mock.plugin import MockerFixture
+
+
+class _TestCamera(CameraStreamPipeline):
+    """A camera stream that does not print reports."""
+
+    object_name = "test_camera"
+    report_interval_s = None
+
+
+@pytest.fixture
+def registry(monkeypatch: MonkeyPatch) -> Iterator[dict]:
+    """Give the test an empty pipeline registry.
+
+    Yields:
+        dict: The registry
+    """
+    registry: dict = {}
+    monkeypatch.setattr(Pipeline, "_registry", registry)
+    yield registry
+
+
+def _frame(value: int) -> DecodedFrame:
+    """Create a decoded 4x4 BGR frame filled with a value.
+
+    Args:
+        value: The value of every pixel
+
+    Returns:
+        DecodedFrame: The frame
+    """
+    return DecodedFrame(np.full((4, 4, 3), value, dtype=np.uint8), 0.0)
+
+
+def test_camera_pipelines_default_to_latest(registry: dict) -> None:
+    """Camera streams are registered with LATEST unless told otherwise."""
+    Pipeline.register("camera/a")(_TestCamera)
+    Pipeline.register("camera/b", delivery_policy=DeliveryPolicy.ALL)(_TestCamera)
+
+    assert (
+        registry[PipelineTopicOptions("camera/a")].delivery_policy
+        == DeliveryPolicy.LATEST
+    )
+    assert (
+        registry[PipelineTopicOptions("camera/b")].delivery_policy == DeliveryPolicy.ALL
+    )
+
+
+def test_other_pipelines_default_to_all(registry: dict) -> None:
+    """Pipelines that do not set a default still deliver every message."""
+    Pipeline.register("pose")(Pipeline)
+    assert registry[PipelineTopicOptions("pose")].delivery_policy == DeliveryPolicy.ALL
+
+
+def test_only_the_newest_frame_is_uploaded(app: object) -> None:
+    """Frames replaced before the render thread gets to them are not uploaded."""
+    world = World(add_base_objects=False)
+    pipeline = _TestCamera()
+    try:
+        asyncio.run(pipeline.apply(world, _frame(0)))
+        world.process_commands()
+        image = world.get_object("test_camera").get_entity()
+
+        for value in (1, 2, 3):
+            asyncio.run(pipeline.apply(world, _frame(value)))
+        world.process_commands()
+
+        assert pipeline.stats.shown == 2
+        assert pipeline.stats.replaced == 2
+        assert pipeline._pending_frame is None
+        assert (image.image_array == 3).all()
+    finally:
+        world.clear_objects()
+
+
+def test_removed_image_is_added_again(app: object) -> None:
+    """The next frame after the stream's image was removed shows a new image."""
+    world = World(add_base_objects=False)
+    pipeline = _TestCamera()
+    try:
+        asyncio.run(pipeline.apply(world, _frame(0)))
+        world.process_commands()
+        first = world.get_object("test_camera").get_entity()
+
+        world.queue_remove_object("test_camera")
+        world.process_commands()
+        assert not world.contains_object("test_camera")
+
+        asyncio.run(pipeline.apply(world, _frame(1)))
+        world.process_commands()
+        image = world.get_object("test_camera").get_entity()
+        assert image is not first
+        assert (image.image_array == 1).all()
+
+        # later frames update the new image
+        asyncio.run(pipeline.apply(world, _frame(2)))
+        world.process_commands()
+        assert (image.image_array == 2).all()
+        assert pipeline.stats.shown == 3
+    finally:
+        world.clear_objects()
+
+
+def test_frames_before_the_add_is_applied_do_not_add_twice(app: object) -> None:
+    """Frames that arrive while the image is being added only update it."""
+    world = World(add_base_objects=False)
+    pipeline = _TestCamera()
+    created: list[object] = []
+    create_image = pipeline._create_image
+
+    def record_create() -> ImageObject:
+        image = create_image()
+        created.append(image)
+        return image
+
+    pipeline._create_image = record_create  # type: ignore
+    try:
+        for value in (0, 1, 2):
+            asyncio.run(pipeline.apply(world, _frame(value)))
+        world.process_commands()
+
+        assert len(created) == 1
+        assert (world.get_object("test_camera").get_entity().image_array == 2).all()
+    finally:
+        world.clear_objects()
@@ -0,0 +1,161 @@
+"""Tests for viz3.render.cube_point_cloud."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pytest
+from ursina import color, destroy
+
+from viz3.render.cube_point_cloud import NamedCubePointCloud, StreamingPointCloud
+from viz3.render.custom_lowlevel_rendering import PointRenderMode, _rows_view
+
+if TYPE_CHECKING:
+    from _pytest.capture import CaptureFixture
+    from _pytest.fixtures import FixtureRequest
+    from _pytest.logging import LogCaptureFixture
+    from _pytest.monkeypatch import MonkeyPatch
+    from pytest_mock.plugin import MockerFixture
+
+
+def _indices(cloud: NamedCubePointCloud) -> np.ndarray:
+    """Get the vertex indices a cloud draws.
+
+    Args:
+        cloud: A point cloud
+
+    Returns:
+        np.ndarray: The index rows of its geometry
+    """
+    index_data = cloud._geom.node.get_geom(0).get_primitive(0).get_vertices()
+    return np.asarray(index_data).view(np.uint32).reshape(-1)
+
+
+def _drawn_points(cloud: NamedCubePointCloud) -> set[tuple[float, float, float]]:
+    """Get the positions of the vertices a cloud draws.
+
+    Args:
+        cloud: A point cloud in POINT mode, with one vertex per point
+
+    Returns:
+        set: The drawn positions
+    """
+    vertex_data = cloud._geom.node.get_geom(0).get_vertex_data()
+    vertices = _rows_view(vertex_data.get_array(0), np.float32, 3)
+    return {tuple(float(v) for v in vertices[index]) for index in _indices(cloud)}
+
+
+@pytest.mark.parametrize("render_mode", list(PointRenderMode))
+def test_removed_points_are_not_drawn_after_their_anchor_is_freed(
+    app: object, render_mode: PointRenderMode
+) -> None:
+    """Free slots must not keep drawing a removed point they were hidden on."""
+    cloud = NamedCubePointCloud(
+        {"a": (0, 0, 0), "b": (1, 0, 0), "c": (2, 0, 0)},
+        render_mode=render_mode,
+    )
+    try:
+        cloud.remove_point("a")
+        cloud.flush()
+        cloud.remove_point("b")
+        cloud.flush()
+
+        assert cloud.slots == {"c": 2}
+        vertices_per_point = cloud._geom._vertices_per_point
+        # every index row points into the slot of the only live point
+        live_rows = range(2 * vertices_per_point, 3 * vertices_per_point)
+        assert set(_indices(cloud).tolist()) <= set(live_rows)
+        if render_mode == PointRenderMode.POINT:
+            assert _drawn_points(cloud) == {(2.0, 0.0, 0.0)}
+    finally:
+        destroy(cloud)
+
+
+def test_reused_slots_are_drawn_again(app: object) -> None:
+    """A new point written into a free slot is drawn at its own position."""
+    cloud = NamedCubePointCloud(
+        {"a": (0, 0, 0), "b": (1, 0, 0)}, render_mode=PointRenderMode.POINT
+    )
+    try:
+        cloud.remove_points(["a"])
+        cloud.flush()
+        cloud.set_point("d", (3, 0, 0))
+        cloud.flush()
+        assert _drawn_points(cloud) == {(1.0, 0.0, 0.0), (3.0, 0.0, 0.0)}
+    finally:
+        destroy(cloud)
+
+
+@pytest.mark.parametrize("initial_capacity", [1, 3, 9, 16])
+@pytest.mark.parametrize("batch_size", [1, 5, 40])
+def test_streaming_chunks_stay_within_chunk_capacity(
+    app: object, initial_capacity: int, batch_size: int
+) -> None:
+    """Chunks never hold or allocate more than `chunk_capacity` points."""
+    cloud = StreamingPointCloud(initial_capacity=initial_capacity, chunk_capacity=16)
+    try:
+        rng = np.random.default_rng(0)
+        for _ in range(10):
+            cloud.extend_point_cloud(rng.uniform(-1, 1, size=(batch_size, 3)))
+
+        assert len(cloud) == 10 * batch_size
+        assert sum(chunk.count for chunk in cloud.chunks) == len(cloud)
+        for chunk in cloud.chunks:
+            assert chunk.count <= 16
+            assert chunk.capacity <= 16
+            vertex_data = chunk.node.get_geom(0).get_vertex_data()
+            assert vertex_data.get_num_rows() <= 16 * chunk._vertices_per_point
+        # every chunk but the last is full
+        assert all(chunk.count == 16 for chunk in cloud.chunks[:-1])
+    finally:
+        destroy(cloud)
+
+
+def _slot_colors(cloud: NamedCubePointCloud) -> dict[str, tuple[float, ...]]:
+    """Get the vertex color of every named point of a cloud.
+
+    Args:
+        cloud: A point cloud in POINT mode, with one vertex per point
+
+    Returns:
+        dict: The RGBA color of each point by name
+    """
+    vertex_data = cloud._geom.node.get_geom(0).get_vertex_data()
+    colors = _rows_view(vertex_data.get_array(1), np.float32, 4)
+    return {
+        name: tuple(float(c) for c in colors[slot])
+        for name, slot in cloud.slots.items()
+    }
+
+
+def test_points_keep_their_own_colors(app: object) -> None:
+    """Per-point colors are written to the vertices and survive moves."""
+    cloud = NamedCubePointCloud(
+        {"a": (0, 0, 0), "b": (1, 0, 0)},
+        color=[color.red, color.blue],
+        render_mode=PointRenderMode.POINT,
+    )
+    try:
+        cloud.flush()
+        assert _slot_colors(cloud) == {"a": (1, 0, 0, 1), "b": (0, 0, 1, 1)}
+        assert tuple(cloud.color) == (1, 1, 1, 1)
+
+        with cloud.batch():
+            cloud.set_point("a", (2, 0, 0))
+            cloud.set_point("b", (3, 0, 0), color.green)
+            cloud.set_point("c", (4, 0, 0))
+        assert _slot_colors(cloud) == {
+            "a": (1, 0, 0, 1),
+            "b": (0, 1, 0, 1),
+            "c": (1, 1, 1, 1),
+        }
+
+        # a reused slot does not inherit the color of the point removed from it
+        with cloud.batch():
+            cloud.remove_point("a")
+            cloud.set_point("d", (5, 0, 0))
+        assert _slot_colors(cloud)["d"] == (1, 1, 1, 1)
+        assert "a" not in cloud.point_colors
+    finally:
+        destroy(cloud)
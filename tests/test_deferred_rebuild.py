@@ -0,0 +1,137 @@
+"""Tests for viz3.render.deferred_rebuild."""
+
+from __future__ import annotations
+
+import sys
+import threading
+from typing import TYPE_CHECKING, Iterator
+
+import pytest
+
+from viz3.render import deferred_rebuild
+from viz3.render.deferred_rebuild import DeferredRebuild, flush_deferred_rebuilds
+
+if TYPE_CHECKING:
+    from _pytest.capture import CaptureFixture
+    from _pytest.fixtures import FixtureRequest
+    from _pytest.logging import LogCaptureFixture
+    from _pytest.monkeypatch import MonkeyPatch
+    from pytest_mock.plugin import MockerFixture
+
+
+class _Counter(DeferredRebuild):
+    """A rebuildable object that records the value its last rebuild saw."""
+
+    def __init__(self) -> None:
+        """Initialize the counter."""
+        self.value = 0
+        self.applied = 0
+        self.rebuilds = 0
+        self.on_rebuild = None
+
+    def set_value(self, value: int) -> None:
+        """Change the value, rebuilding at the end of the frame.
+
+        Args:
+            value: The new value
+        """
+        self.value = value
+        self.mark_dirty("value")
+
+    def _rebuild(self, parts: set[str]) -> None:
+        self.rebuilds += 1
+        self.applied = self.value
+        if self.on_rebuild is not None:
+            self.on_rebuild()
+
+
+@pytest.fixture
+def fast_switching() -> Iterator[None]:
+    """Switch between threads as often as possible, to provoke races."""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def test_changes_are_rebuilt_once_per_flush(app: object) -> None:
+    """Several changes before a flush cost a single rebuild."""
+    counter = _Counter()
+    for value in range(5):
+        counter.set_value(value)
+    assert counter.rebuilds == 0
+
+    flush_deferred_rebuilds()
+    assert (counter.rebuilds, counter.applied) == (1, 4)
+    assert not counter.dirty_parts
+
+
+def test_mark_during_rebuild_is_kept_for_the_next_flush(app: object) -> None:
+    """An object marked from another thread while a flush runs is not lost."""
+    first, second = _Counter(), _Counter()
+
+    def mark_second_from_thread() -> None:
+        thread = threading.Thread(target=second.set_value, args=(7,))
+        thread.start()
+        thread.join()
+
+    first.on_rebuild = mark_second_from_thread
+    first.set_value(1)
+    second.set_value(1)
+    flush_deferred_rebuilds()
+    # second may have been rebuilt already if the flush reached it later
+    flush_deferred_rebuilds()
+
+    assert second.applied == 7
+    assert not second.dirty_parts
+    assert id(second) not in deferred_rebuild._pending
+
+
+def test_mark_while_flush_takes_the_pending_objects(
+    app: object, monkeypatch: MonkeyPatch
+) -> None:
+    """An object marked while the flush collects the pending ones is kept."""
+    first, second = _Counter(), _Counter()
+
+    class _MarkOnRead(dict):
+        """Pending objects that mark `second` from a thread when read."""
+
+        def values(self):  # type: ignore[override]
+            thread = threading.Thread(target=second.set_value, args=(3,))
+            thread.start()
+            thread.join()
+            return super().values()
+
+    monkeypatch.setattr(deferred_rebuild, "_pending", _MarkOnRead())
+    first.set_value(1)
+    flush_deferred_rebuilds()
+    assert id(second) in deferred_rebuild._pending
+
+    flush_deferred_rebuilds()
+    assert second.applied == 3
+
+
+def test_marks_from_another_thread_are_never_lost(
+    app: object, fast_switching: None
+) -> None:
+    """The last change made from a second thread is always rebuilt."""
+    counters = [_Counter() for _ in range(8)]
+    done = threading.Event()
+
+    def mark() -> None:
+        for value in range(1, 3001):
+            for counter in counters:
+                counter.set_value(value)
+        done.set()
+
+    thread = threading.Thread(target=mark)
+    thread.start()
+    while not done.is_set():
+        flush_deferred_rebuilds()
+        for counter in counters:
+            counter.flush()
+    thread.join()
+    flush_deferred_rebuilds()
+
+    assert [counter.applied for counter in counters] == [3000] * len(counters)
+    assert not any(counter.dirty_parts for counter in counters)
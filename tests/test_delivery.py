@@ -0,0 +1,204 @@
+"""Tests for viz3.object_pipeline.delivery."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, cast
+
+import pytest
+
+from viz3.object_pipeline.delivery import DeliveryPolicy, PipelineDelivery
+from viz3.object_pipeline.pipeline import Pipeline
+
+if TYPE_CHECKING:
+    from _pytest.capture import CaptureFixture
+    from _pytest.fixtures import FixtureRequest
+    from _pytest.logging import LogCaptureFixture
+    from _pytest.monkeypatch import MonkeyPatch
+    from pytest_mock.plugin import MockerFixture
+
+    from viz3.render.world import World
+
+
+class _Recorder(Pipeline):
+    """A pipeline that records the messages it processes."""
+
+    def __init__(self) -> None:
+        """Initialize the pipeline with no processed messages."""
+        self.processed: list[Any] = []
+
+    async def process(self, world: World, topic_pub_data: bytes) -> None:
+        """Record a message.
+
+        Args:
+            world: Unused
+            topic_pub_data: The message
+        """
+        self.processed.append(topic_pub_data)
+
+
+class _Decoder(Pipeline):
+    """A pipeline whose decodes finish in reverse order of their start."""
+
+    # decodes in flight, and the most that were in flight at once
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+
+    def __init__(self) -> None:
+        """Initialize the pipeline with no applied messages."""
+        self.applied: list[int] = []
+
+    @staticmethod
+    def decode(topic_pub_data: bytes) -> int:
+        """Decode a message after a delay that shrinks with its value.
+
+        Args:
+            topic_pub_data: The message, a number as bytes
+
+        Returns:
+            int: The number
+        """
+        value = int(topic_pub_data)
+        with _Decoder.lock:
+            _Decoder.running += 1
+            _Decoder.max_running = max(_Decoder.max_running, _Decoder.running)
+        # later messages decode faster, so they would overtake earlier ones
+        time.sleep(0.02 / (1 + value % 3))
+        with _Decoder.lock:
+            _Decoder.running -= 1
+        return value
+
+    async def apply(self, world: World, decoded: int) -> None:
+        """Record a decoded message.
+
+        Args:
+            world: Unused
+            decoded: The number
+        """
+        self.applied.append(decoded)
+
+
+def _deliver(delivery: PipelineDelivery, messages: list[bytes]) -> None:
+    """Submit messages before the worker runs, then run it until they are done.
+
+    Args:
+        delivery: The delivery to run
+        messages: The messages, all submitted on topic "topic" except the
+            ones starting with b"other", which go to topic "other"
+    """
+
+    async def run() -> None:
+        for message in messages:
+            topic = "other" if message.startswith(b"other") else "topic"
+            delivery.submit(topic, message)
+        delivery.start()
+        while delivery.stats.pending():
+            await asyncio.sleep(0.001)
+        delivery.stop()
+
+    asyncio.run(run())
+
+
+def _delivery(pipeline: Pipeline, **kwargs: Any) -> PipelineDelivery:
+    """Create a delivery to a pipeline without a world.
+
+    Args:
+        pipeline: The pipeline
+        **kwargs: Passed to PipelineDelivery
+
+    Returns:
+        PipelineDelivery: The delivery
+    """
+    return PipelineDelivery(pipeline, cast("World", None), **kwargs)
+
+
+def test_all_processes_every_message_in_order() -> None:
+    """DeliveryPolicy.ALL delivers every message, however many are waiting."""
+    pipeline = _Recorder()
+    delivery = _delivery(pipeline, policy=DeliveryPolicy.ALL, queue_size=2)
+    messages = [str(i).encode() for i in range(10)]
+    _deliver(delivery, messages)
+
+    assert pipeline.processed == messages
+    assert delivery.stats.received == 10
+    assert delivery.stats.processed == 10
+    assert delivery.stats.dropped == 0
+    assert delivery.stats.coalesced == 0
+
+
+def test_latest_keeps_the_newest_message_of_each_topic() -> None:
+    """DeliveryPolicy.LATEST coalesces waiting messages per topic."""
+    pipeline = _Recorder()
+    delivery = _delivery(pipeline, policy=DeliveryPolicy.LATEST)
+    _deliver(delivery, [b"1", b"other1", b"2", b"3", b"other2"])
+
+    # in order of each topic's first message
+    assert pipeline.processed == [b"3", b"other2"]
+    assert delivery.stats.received == 5
+    assert delivery.stats.coalesced == 3
+    assert delivery.stats.processed == 2
+    assert delivery.stats.pending() == 0
+
+
+def test_drop_oldest_keeps_the_newest_queue_size_messages() -> None:
+    """DeliveryPolicy.DROP_OLDEST drops the oldest message on overflow."""
+    pipeline = _Recorder()
+    delivery = _delivery(pipeline, policy=DeliveryPolicy.DROP_OLDEST, queue_size=3)
+    messages = [str(i).encode() for i in range(8)]
+    _deliver(delivery, messages)
+
+    assert pipeline.processed == messages[-3:]
+    assert delivery.stats.dropped == 5
+    assert delivery.stats.processed == 3
+    assert delivery.stats.pending() == 0
+
+
+def test_pending_counts_waiting_messages() -> None:
+    """Messages submitted before the worker runs are pending."""
+    delivery = _delivery(_Recorder(), policy=DeliveryPolicy.DROP_OLDEST, queue_size=2)
+
+    async def submit() -> None:
+        for message in (b"1", b"2", b"3"):
+            delivery.submit("topic", message)
+
+    asyncio.run(submit())
+    assert delivery.stats.pending() == 2
+
+
+def test_decoded_messages_are_applied_in_order() -> None:
+    """Decodes run concurrently, at most max_decodes_in_flight at once."""
+    _Decoder.running = _Decoder.max_running = 0
+    pipeline = _Decoder()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        delivery = _delivery(
+            pipeline, decode_executor=executor, max_decodes_in_flight=2
+        )
+        _deliver(delivery, [str(i).encode() for i in range(12)])
+
+    assert pipeline.applied == list(range(12))
+    assert _Decoder.max_running == 2
+    assert delivery.stats.processed == 12
+
+
+def test_failed_decode_is_reported_and_skipped(capsys: CaptureFixture) -> None:
+    """A message that fails to decode does not stop the ones after it."""
+    pipeline = _Decoder()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        delivery = _delivery(pipeline, decode_executor=executor)
+        _deliver(delivery, [b"1", b"not a number", b"2"])
+
+    assert pipeline.applied == [1, 2]
+    assert delivery.stats.processed == 3
+    assert "Error in _Decoder.decode" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("policy", list(DeliveryPolicy))
+def test_stats_are_shared_with_the_pipeline(policy: DeliveryPolicy) -> None:
+    """The pipeline sees the counters of the queue feeding it."""
+    pipeline = _Recorder()
+    delivery = _delivery(pipeline, policy=policy)
+    assert pipeline.delivery_stats is delivery.stats
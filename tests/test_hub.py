@@ -0,0 +1,186 @@
+"""Tests for viz3.hub."""
+
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import resource_tracker
+from typing import TYPE_CHECKING, Any, Iterator
+
+import numpy as np
+import pytest
+from ursina import destroy
+
+from viz3.hub import FrameRef, HubClient
+from viz3.object_pipeline.delivery import PipelineDelivery
+from viz3.object_pipeline.pipeline import Pipeline
+from viz3.render.objects.image_object import ImageObject, StreamingTexture
+from viz3.render.world import World
+from viz3.shared_frames import FrameRing, RingFrame, is_intact
+
+if TYPE_CHECKING:
+    from _pytest.capture import CaptureFixture
+    from _pytest.fixtures import FixtureRequest
+    from _pytest.logging import LogCaptureFixture
+    from _pytest.monkeypatch import MonkeyPatch
+    from pytest_mock.plugin import MockerFixture
+
+
+@pytest.fixture
+def ring() -> Iterator[FrameRing]:
+    """Create a small frame ring, as the hub does for a camera topic.
+
+    Yields:
+        FrameRing: A ring of two 4x4 uint8 frames
+    """
+    ring = FrameRing.create((4, 4), np.uint8, num_slots=2)
+    yield ring
+    ring.close()
+
+
+@pytest.fixture
+def client() -> Iterator[HubClient]:
+    """Create a hub client that is not connected to a hub.
+
+    Yields:
+        HubClient: The client
+    """
+    client = HubClient("unused")
+    yield client
+    for ring in client._frame_rings.values():
+        # attaching unregistered the segment from the resource tracker, which
+        # in these tests is also the tracker of the process that created it
+        resource_tracker.register(ring.segment._name, "shared_memory")
+        ring.close()
+
+
+class _Collector(Pipeline):
+    """A pipeline that records the frames it applies."""
+
+    def __init__(self) -> None:
+        """Initialize the pipeline with no applied frames."""
+        self.applied: list[int] = []
+
+    @staticmethod
+    def decode(topic_pub_data: bytes) -> Any:
+        """Never called; the hub delivers decoded frames.
+
+        Args:
+            topic_pub_data: The raw message
+
+        Returns:
+            Any: Nothing
+        """
+        raise NotImplementedError
+
+    async def apply(self, world: World, decoded: Any) -> None:
+        """Record the value of a frame.
+
+        Args:
+            world: Unused
+            decoded: The frame
+        """
+        self.applied.append(int(decoded[0, 0]))
+
+
+def _fill(ring: FrameRing, *values: int) -> int:
+    """Write frames filled with each value to a ring.
+
+    Args:
+        ring: The ring
+        *values: The value of every pixel of each frame
+
+    Returns:
+        int: The sequence number of the last frame
+    """
+    sequence = -1
+    for value in values:
+        sequence = ring.write(np.full(ring.shape, value, dtype=ring.dtype))
+    return sequence
+
+
+def test_frame_is_a_view_of_the_ring(ring: FrameRing, client: HubClient) -> None:
+    """A received frame is not copied, and knows when its slot is reused."""
+    sequence = _fill(ring, 1)
+    frame = client._read_frame("key", "topic", FrameRef(ring.name, sequence))
+
+    assert isinstance(frame, RingFrame)
+    assert np.shares_memory(frame, client._frame_rings["key", "topic"].slots)
+    assert not frame.flags.writeable
+    assert frame.is_current()
+
+    # the hub wraps around before the window applies the frame
+    _fill(ring, *range(2, 2 + ring.num_slots))
+    assert not frame.is_current()
+    assert not is_intact(frame)
+    # arrays made from the frame are the window's own
+    assert is_intact(frame.copy())
+
+
+@pytest.mark.parametrize("threaded", [False, True])
+def test_frame_overwritten_in_the_queue_is_dropped(
+    ring: FrameRing, client: HubClient, threaded: bool
+) -> None:
+    """A frame the hub overwrote before it was applied is not applied."""
+    stale = client._read_frame("key", "topic", FrameRef(ring.name, _fill(ring, 1)))
+    sequence = _fill(ring, 2, 3)
+    fresh = client._read_frame("key", "topic", FrameRef(ring.name, sequence))
+
+    pipeline = _Collector()
+    decode_executor = ThreadPoolExecutor(1) if threaded else None
+    delivery = PipelineDelivery(
+        pipeline, World.__new__(World), decode_executor=decode_executor
+    )
+
+    async def deliver() -> None:
+        delivery.start()
+        delivery.submit("topic", stale, decoded=True)
+        delivery.submit("topic", fresh, decoded=True)
+        while delivery.stats.pending():
+            await asyncio.sleep(0.001)
+        delivery.stop()
+
+    asyncio.run(deliver())
+    if decode_executor is not None:
+        decode_executor.shutdown()
+    assert pipeline.applied == [3]
+    assert delivery.stats.dropped == 1
+    assert delivery.stats.processed == 1
+
+
+def test_frame_overwritten_while_uploaded_is_replaced_by_the_newest(
+    app: object, ring: FrameRing, client: HubClient, monkeypatch: MonkeyPatch
+) -> None:
+    """A texture upload the hub overwrote is redone from the newest frame."""
+    image = ImageObject(np.zeros(ring.shape, np.uint8), streaming=True)
+    frame = client._read_frame("key", "topic", FrameRef(ring.name, _fill(ring, 1)))
+    uploaded: list[int] = []
+    original_upload = StreamingTexture.upload
+
+    def upload_while_the_hub_wraps(
+        self: StreamingTexture, image_array: np.ndarray
+    ) -> bool:
+        reallocated = original_upload(self, image_array)
+        uploaded.append(int(image_array[0, 0]))
+        if len(uploaded) == 1:
+            _fill(ring, *range(2, 2 + ring.num_slots))
+        return reallocated
+
+    monkeypatch.setattr(StreamingTexture, "upload", upload_while_the_hub_wraps)
+    try:
+        image.update_texture(frame)
+        image.flush()
+        assert uploaded == [1, 1 + ring.num_slots]
+        assert image.image_array.is_current()
+    finally:
+        destroy(image)
+
+
+def test_frame_already_overwritten_is_dropped(
+    ring: FrameRing, client: HubClient
+) -> None:
+    """A frame the hub overwrote before the window got to it is not delivered."""
+    sequence = ring.write(np.full((4, 4), 1, dtype=np.uint8))
+    for value in range(2, 2 + ring.num_slots):
+        ring.write(np.full((4, 4), value, dtype=np.uint8))
+    assert client._read_frame("key", "topic", FrameRef(ring.name, sequence)) is None
@@ -0,0 +1,46 @@
+"""Tests for viz3.render.instanced_primitives."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+from ursina import destroy
+
+from viz3.render.instanced_primitives import (
+    InstancedPrimitives,
+    PrimitiveShape,
+    make_transforms,
+)
+
+if TYPE_CHECKING:
+    from _pytest.capture import CaptureFixture
+    from _pytest.fixtures import FixtureRequest
+    from _pytest.logging import LogCaptureFixture
+    from _pytest.monkeypatch import MonkeyPatch
+    from pytest_mock.plugin import MockerFixture
+
+
+def test_frame_steps_with_an_instance(app: object) -> None:
+    """Rendering a frame must not call the instance update as Ursina's update."""
+    boxes = InstancedPrimitives(PrimitiveShape.BOX)
+    try:
+        instance_id = boxes.add(make_transforms([(0, 0, 0)])[0])
+        app.step()
+        boxes.update_instance(instance_id, make_transforms([(1, 2, 3)])[0])
+        app.step()
+        np.testing.assert_allclose(boxes.transforms[instance_id, :3, 3], (1, 2, 3))
+    finally:
+        destroy(boxes)
+
+
+def test_update_instances_rewrites_only_given_instances(app: object) -> None:
+    """Updating some instances leaves the others unchanged."""
+    boxes = InstancedPrimitives(PrimitiveShape.AXES)
+    try:
+        ids = boxes.add_many(make_transforms([(0, 0, 0), (1, 0, 0)]))
+        boxes.update_instances(ids[1:], make_transforms([(5, 0, 0)]))
+        np.testing.assert_allclose(boxes.transforms[ids[0], :3, 3], (0, 0, 0))
+        np.testing.assert_allclose(boxes.transforms[ids[1], :3, 3], (5, 0, 0))
+    finally:
+        destroy(boxes)
@@ -0,0 +1,191 @@
+"""Tests for viz3.render.octree_point_cloud."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Iterator
+
+import numpy as np
+import pytest
+from ursina import destroy
+
+from viz3.render.octree_point_cloud import OctreeNode, OctreePointCloud
+
+if TYPE_CHECKING:
+    from _pytest.capture import CaptureFixture
+    from _pytest.fixtures import FixtureRequest
+    from _pytest.logging import LogCaptureFixture
+    from _pytest.monkeypatch import MonkeyPatch
+    from pytest_mock.plugin import MockerFixture
+
+# screen pixels per radian of view, about a 1000 pixel wide window at 53°
+_PIXELS_PER_RADIAN = 1000.0
+
+
+@pytest.fixture(scope="module")
+def cloud(app: object) -> Iterator[OctreePointCloud]:
+    """Build an octree over random points in the unit cube.
+
+    Args:
+        app: The running Ursina app
+
+    Yields:
+        OctreePointCloud: A cloud of 50000 points, three levels deep
+    """
+    rng = np.random.default_rng(0)
+    cloud = OctreePointCloud(
+        rng.uniform(0, 1, (50000, 3)), leaf_size=500, node_resolution=8
+    )
+    yield cloud
+    destroy(cloud)
+
+
+def _leaves(node: OctreeNode) -> Iterator[OctreeNode]:
+    """Iterate over the leaves below a node.
+
+    Args:
+        node: The node
+
+    Yields:
+        OctreeNode: Every leaf of the node's subtree, or the node itself
+    """
+    if node.is_leaf():
+        yield node
+    for child in node.children:
+        yield from _leaves(child)
+
+
+def _parents(cloud: OctreePointCloud) -> dict[OctreeNode, OctreeNode]:
+    """Map every node of a cloud's octree to its parent.
+
+    Args:
+        cloud: The cloud
+
+    Returns:
+        dict: The parent of every node except the root
+    """
+    return {child: node for node in cloud.octree_nodes for child in node.children}
+
+
+def _covers(
+    coarse: set[OctreeNode], node: OctreeNode, parents: dict[OctreeNode, OctreeNode]
+) -> bool:
+    """Check whether a node or one of its ancestors is in a set.
+
+    Args:
+        coarse: The set of nodes
+        node: The node
+        parents: The parent of every node, see `_parents`
+
+    Returns:
+        bool: True if the node refines a node of the set
+    """
+    while node not in coarse:
+        if node not in parents:
+            return False
+        node = parents[node]
+    return True
+
+
+def _select(
+    cloud: OctreePointCloud, camera_position: tuple, point_budget: int
+) -> set[OctreeNode]:
+    """Choose the nodes a cloud draws with a budget.
+
+    Args:
+        cloud: The cloud
+        camera_position: The camera position
+        point_budget: The point budget
+
+    Returns:
+        set[OctreeNode]: The selected nodes
+    """
+    cloud.point_budget = point_budget
+    return cloud.select_nodes(np.array(camera_position), _PIXELS_PER_RADIAN)
+
+
+def test_levels_halve_their_voxels_down_to_full_density(
+    cloud: OctreePointCloud,
+) -> None:
+    """Every level is finer than its parent, and the leaves hold every point."""
+    assert max(node.depth for node in cloud.octree_nodes) == 3
+    for node in cloud.octree_nodes:
+        for child in node.children:
+            assert child.half_size == pytest.approx(node.half_size / 2)
+            if not child.is_leaf():
+                assert child.voxel_size == pytest.approx(node.voxel_size / 2)
+        if not node.is_leaf():
+            assert node.num_points <= sum(c.num_points for c in node.children)
+
+    leaves = list(_leaves(cloud.root))
+    assert all(leaf.voxel_size == 0 for leaf in leaves)
+    assert sum(leaf.num_points for leaf in leaves) == cloud.num_points
+
+
+@pytest.mark.parametrize("point_budget", [512, 2000, 10000, 30000])
+@pytest.mark.parametrize("camera_position", [(0.1, 0.1, -0.5), (3, 3, 3)])
+def test_point_budget_is_respected(
+    cloud: OctreePointCloud, point_budget: int, camera_position: tuple
+) -> None:
+    """The selection draws the whole cloud once, within the budget."""
+    parents = _parents(cloud)
+    selected = _select(cloud, camera_position, point_budget)
+    used = sum(node.num_points for node in selected)
+    assert used <= point_budget
+
+    # every point is drawn at exactly one level
+    for leaf in _leaves(cloud.root):
+        covering = [node for node in selected if _covers({node}, leaf, parents)]
+        assert len(covering) == 1
+
+    # a coarse node left in the selection did not fit in what was left
+    for node in selected:
+        if not node.is_leaf():
+            added = sum(c.num_points for c in node.children) - node.num_points
+            assert used + added > point_budget
+
+
+def test_unlimited_budget_refines_until_voxels_are_small(
+    cloud: OctreePointCloud,
+) -> None:
+    """Without a binding budget, refinement stops at the pixel threshold."""
+    camera_position = np.array((0.5, 0.5, 20.0))
+    selected = _select(cloud, tuple(camera_position), cloud.num_points)
+
+    def size(node: OctreeNode) -> float:
+        return cloud._projected_voxel_size(node, camera_position, _PIXELS_PER_RADIAN)
+
+    parents = _parents(cloud)
+    for node in selected:
+        assert node.is_leaf() or size(node) < cloud.lod_pixel_size
+        parent = parents.get(node)
+        while parent is not None:
+            assert size(parent) >= cloud.lod_pixel_size
+            parent = parents.get(parent)
+
+
+def test_closer_camera_refines_monotonically(cloud: OctreePointCloud) -> None:
+    """Moving the camera closer only ever replaces nodes by finer ones."""
+    parents = _parents(cloud)
+    selections = [
+        _select(cloud, (0.5, 0.5, distance), cloud.num_points)
+        for distance in (50.0, 20.0, 3.0)
+    ]
+
+    assert [{node.depth for node in nodes} for nodes in selections] == [
+        {1},
+        {2},
+        {3},
+    ]
+    for coarse, fine in zip(selections, selections[1:]):
+        assert all(_covers(coarse, node, parents) for node in fine)
+        assert sum(n.num_points for n in fine) > sum(n.num_points for n in coarse)
+
+
+def test_shown_nodes_are_the_selected_ones(cloud: OctreePointCloud) -> None:
+    """The drawn nodes are the selected ones, and the count matches them."""
+    selected = _select(cloud, (0.5, 0.5, 50.0), cloud.num_points)
+    cloud._show(selected)
+
+    shown = {node for node in cloud.octree_nodes if not node.node_path.is_hidden()}
+    assert shown == selected
+    assert cloud.num_visible_points == sum(node.num_points for node in selected)
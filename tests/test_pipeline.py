@@ -0,0 +1,28 @@
+"""Tests for viz3.object_pipeline.pipeline."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from viz3.object_pipeline.pipeline import (
+    AxesOptions,
+    PipelineGlobalConfig,
+    PlaneOptions,
+)
+
+if TYPE_CHECKING:
+    from _pytest.capture import CaptureFixture
+    from _pytest.fixtures import FixtureRequest
+    from _pytest.logging import LogCaptureFixture
+    from _pytest.monkeypatch import MonkeyPatch
+    from pytest_mock.plugin import MockerFixture
+
+
+def test_global_config_defaults() -> None:
+    """The option dataclasses are hashable, so they work as config defaults."""
+    config = PipelineGlobalConfig()
+
+    assert config.axes_options == AxesOptions()
+    assert config.plane_options == PlaneOptions()
+    assert hash(AxesOptions()) == hash(config.axes_options)
+    assert AxesOptions(length=2) != AxesOptions()
@@ -0,0 +1,96 @@
+"""Tests for viz3.object_pipeline.plugin_manager and the decode workers."""
+
+from __future__ import annotations
+
+import argparse
+import os
+import textwrap
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pytest
+
+import viz3.viz3 as window
+from viz3.object_pipeline.pipeline import Pipeline, PipelineOptions
+from viz3.object_pipeline.plugin_manager import Directory, PluginManager
+from viz3.object_pipeline.plugin_manifest import PluginManifest
+
+if TYPE_CHECKING:
+    from _pytest.capture import CaptureFixture
+    from _pytest.fixtures import FixtureRequest
+    from _pytest.logging import LogCaptureFixture
+    from _pytest.monkeypatch import MonkeyPatch
+    from pytest_mock.plugin import MockerFixture
+
+PLUGIN = textwrap.dedent("""
+    import os
+
+    from viz3.object_pipeline.delivery import DecodeExecutor
+    from viz3.object_pipeline.pipeline import Pipeline
+
+
+    @Pipeline.register("test/worker", decode_executor=DecodeExecutor.PROCESS)
+    class WorkerPipeline(Pipeline):
+        @staticmethod
+        def decode(topic_pub_data: bytes) -> tuple[int, bytes]:
+            return os.getpid(), topic_pub_data.upper()
+    """)
+
+
+@pytest.fixture
+def plugin_manager(tmp_path: Path, monkeypatch: MonkeyPatch) -> PluginManager:
+    """Create a plugin manager for a directory with one process-decoded plugin.
+
+    Returns:
+        PluginManager: The manager, with plugins not loaded yet
+    """
+    monkeypatch.setattr(Pipeline, "_registry", {})
+    plugin_directory = tmp_path / "plugins"
+    plugin_directory.mkdir()
+    (plugin_directory / "worker_plugin.py").write_text(PLUGIN)
+    return PluginManager(
+        [Directory(plugin_directory)],
+        manifest=PluginManifest(tmp_path / "manifest.json"),
+    )
+
+
+def test_load_plugins_saves_the_manifest(plugin_manager: PluginManager) -> None:
+    """Loading plugins records them in the manifest by default."""
+    plugin_manager.load_plugins()
+    assert plugin_manager.manifest is not None
+    assert plugin_manager.manifest.path.exists()
+
+
+def test_load_plugins_can_leave_the_manifest_alone(
+    plugin_manager: PluginManager,
+) -> None:
+    """Worker processes load plugins without writing the manifest."""
+    plugin_manager.load_plugins(save_manifest=False)
+    assert plugin_manager.loaded_files
+    assert plugin_manager.manifest is not None
+    assert not plugin_manager.manifest.path.exists()
+
+
+def test_decode_workers_are_spawned_and_load_plugins(
+    plugin_manager: PluginManager, monkeypatch: MonkeyPatch
+) -> None:
+    """Decode workers are spawned, find plugin decoders and skip the manifest."""
+    plugin_manager.load_plugins(save_manifest=False)
+    options: PipelineOptions = next(iter(Pipeline.get_registry().values()))
+    monkeypatch.setattr(window, "args", argparse.Namespace(decode_processes=1))
+    monkeypatch.setattr(window, "plugin_manager", plugin_manager)
+    monkeypatch.setattr(window, "decode_process_pool", None)
+
+    pool = window.get_decode_executor(options)
+    try:
+        assert pool._mp_context.get_start_method() == "spawn"  # type: ignore
+        worker_pid, decoded = pool.submit(
+            options.pipeline_type.decode, b"frame"
+        ).result(timeout=120)
+    finally:
+        pool.shutdown()
+
+    assert worker_pid != os.getpid()
+    assert decoded == b"FRAME"
+    assert plugin_manager.manifest is not None
+    assert not plugin_manager.manifest.path.exists()
@@ -0,0 +1,171 @@
+"""Tests that the batched conversions in viz3.pose match the entity classes."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Iterator
+
+import numpy as np
+import pytest
+from ursina import destroy
+
+from viz3.pose import (
+    compose_transforms,
+    euler_to_quaternions,
+    euler_to_rotation_matrices,
+    quaternions_to_rotation_matrices,
+    rotation_matrices_to_euler,
+    rotation_matrices_to_quaternions,
+)
+from viz3.render.axes import Axes
+from viz3.render.objects.apriltag import AprilTag
+
+if TYPE_CHECKING:
+    from _pytest.capture import CaptureFixture
+    from _pytest.fixtures import FixtureRequest
+    from _pytest.logging import LogCaptureFixture
+    from _pytest.monkeypatch import MonkeyPatch
+    from pytest_mock.plugin import MockerFixture
+
+# (pitch, yaw, roll) in degrees: identity, pitch and yaw at ±90, where two of
+# the angles share an axis, and random poses
+SPECIAL_ANGLES = np.array(
+    [
+        (0, 0, 0),
+        (90, 0, 0),
+        (-90, 0, 0),
+        (90, 30, -45),
+        (-90, -60, 120),
+        (0, 90, 0),
+        (0, -90, 0),
+        (30, 90, 45),
+        (-45, -90, -30),
+    ],
+    dtype=np.float64,
+)
+RANDOM_ANGLES = np.random.default_rng(1234).uniform(-180, 180, size=(200, 3))
+ANGLES = np.concatenate([SPECIAL_ANGLES, RANDOM_ANGLES])
+
+
+@pytest.fixture(scope="module")
+def axes(app: object) -> Iterator[Axes]:
+    """Create an Axes entity shared by the tests of this module.
+
+    Yields:
+        Axes: The entity
+    """
+    entity = Axes()
+    yield entity
+    destroy(entity)
+
+
+@pytest.fixture(scope="module")
+def tag(app: object) -> Iterator[AprilTag]:
+    """Create an AprilTag entity shared by the tests of this module.
+
+    Yields:
+        AprilTag: The entity
+    """
+    entity = AprilTag(tag_id=0)
+    yield entity
+    destroy(entity)
+
+
+def _rotations() -> np.ndarray:
+    """Get the rotation matrices of every tested pose.
+
+    Returns:
+        np.ndarray: An (N, 3, 3) array of rotation matrices
+    """
+    return euler_to_rotation_matrices(ANGLES)
+
+
+def test_quaternions_match_axes(axes: Axes) -> None:
+    """Batched quaternions equal the ones `Axes.set_rotation_matrix` assigns."""
+    rotations = _rotations()
+    quaternions = rotation_matrices_to_quaternions(rotations)
+    for rotation, quaternion in zip(rotations, quaternions):
+        axes.set_rotation_matrix(rotation)
+        np.testing.assert_allclose(
+            np.array(axes.quaternion), quaternion, atol=1e-5, err_msg=str(rotation)
+        )
+
+
+def test_euler_angles_match_apriltag(tag: AprilTag) -> None:
+    """Batched Euler angles equal the ones `AprilTag.set_rotation_matrix` assigns."""
+    rotations = _rotations()
+    angles = rotation_matrices_to_euler(rotations)
+    for rotation, expected in zip(rotations, angles):
+        tag.set_rotation_matrix(rotation)
+        np.testing.assert_allclose(
+            np.array(tag.rotation), expected, atol=1e-4, err_msg=str(rotation)
+        )
+
+
+def test_identity() -> None:
+    """The identity rotation converts to the identity quaternion and zero angles."""
+    identity = np.eye(3)[np.newaxis]
+    np.testing.assert_allclose(
+        rotation_matrices_to_quaternions(identity), [[0, 0, 0, 1]]
+    )
+    np.testing.assert_allclose(rotation_matrices_to_euler(identity), [[0, 0, 0]])
+    np.testing.assert_allclose(euler_to_rotation_matrices([0, 0, 0]), identity)
+    np.testing.assert_allclose(
+        compose_transforms([[0, 0, 0]], identity)[0], np.eye(4), atol=1e-7
+    )
+
+
+def test_quaternions_round_trip() -> None:
+    """Quaternions convert back to the rotation matrices they came from."""
+    rotations = _rotations()
+    np.testing.assert_allclose(
+        quaternions_to_rotation_matrices(euler_to_quaternions(ANGLES)),
+        rotations,
+        atol=1e-9,
+    )
+
+
+def test_pitch_and_yaw_round_trip() -> None:
+    """Pitch and yaw are recovered from the matrices built from them."""
+    # yaw is recovered in [-90, 90]; at ±90 pitch and roll turn about the
+    # same axis and only their sum is defined
+    angles = ANGLES[np.abs(ANGLES[:, 1]) < 90 - 1e-3]
+    recovered = rotation_matrices_to_euler(euler_to_rotation_matrices(angles))
+    np.testing.assert_allclose(recovered[:, :2], angles[:, :2], atol=1e-9)
+
+
+def test_compose_transforms_matches_scalar_composition(axes: Axes) -> None:
+    """Batched transforms equal translate @ rotate @ scale built one at a time.
+
+    The rotation of every scalar transform comes from the quaternion `Axes`
+    assigns, so the batched and per-entity orientations agree as well.
+    """
+    rng = np.random.default_rng(5678)
+    rotations = _rotations()
+    positions = rng.uniform(-10, 10, size=(len(rotations), 3))
+    scales = rng.uniform(0.1, 3, size=(len(rotations), 3))
+
+    transforms = compose_transforms(positions, rotations, scales)
+    for transform, rotation, position, scale in zip(
+        transforms, rotations, positions, scales
+    ):
+        axes.set_rotation_matrix(rotation)
+        entity_rotation = quaternions_to_rotation_matrices(np.array(axes.quaternion))[0]
+        translate = np.eye(4)
+        translate[:3, 3] = position
+        rotate = np.eye(4)
+        rotate[:3, :3] = entity_rotation
+        expected = translate @ rotate @ np.diag([*scale, 1])
+        np.testing.assert_allclose(transform, expected, atol=1e-4)
+
+
+def test_compose_transforms_scale_forms() -> None:
+    """Uniform, shared and per-transform scales give the same transforms."""
+    rotations = _rotations()[:4]
+    positions = np.arange(12, dtype=np.float64).reshape(4, 3)
+    uniform = compose_transforms(positions, rotations, 2.0)
+    np.testing.assert_allclose(
+        uniform, compose_transforms(positions, rotations, (2.0, 2.0, 2.0))
+    )
+    np.testing.assert_allclose(
+        uniform, compose_transforms(positions, rotations, np.full((4, 3), 2.0))
+    )
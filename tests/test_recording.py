@@ -0,0 +1,126 @@
+"""Tests for viz3.recording."""
+
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pytest
+
+from viz3.recording import (
+    Recorder,
+    Recording,
+    Replayer,
+    find_window_recording,
+    window_recording_directory,
+)
+
+if TYPE_CHECKING:
+    from _pytest.capture import CaptureFixture
+    from _pytest.fixtures import FixtureRequest
+    from _pytest.logging import LogCaptureFixture
+    from _pytest.monkeypatch import MonkeyPatch
+    from pytest_mock.plugin import MockerFixture
+
+RECORDS = [
+    (100.0, "camera/front", b"frame 1"),
+    (100.5, "apriltag/tag", b"tags"),
+    (101.0, "camera/front", b"frame 2" * 1000),
+    (102.0, "camera/front", b""),
+]
+
+
+def _record(directory: Path, segment_size: int = 64) -> None:
+    """Write RECORDS to a recording.
+
+    Args:
+        directory: The recording directory
+        segment_size: The segment size; small, so records span segments
+    """
+    recorder = Recorder(directory, segment_size=segment_size)
+    for timestamp, topic, payload in RECORDS:
+        recorder.record(topic, payload, timestamp)
+    recorder.close()
+
+
+def test_recording_reads_back_every_record(tmp_path: Path) -> None:
+    """Records come back in order with their timestamps, topics and payloads."""
+    _record(tmp_path)
+    recording = Recording(tmp_path)
+    try:
+        assert len(recording) == len(RECORDS)
+        assert [
+            (timestamp, topic, bytes(payload))
+            for timestamp, topic, payload in recording.records()
+        ] == RECORDS
+        assert recording.duration() == pytest.approx(2.0)
+        assert recording.seek(0.75) == 2
+        assert recording.seek(5.0) == len(RECORDS)
+    finally:
+        recording.close()
+
+
+def test_replayer_delivers_the_subscribed_topics(tmp_path: Path) -> None:
+    """Replaying calls every subscriber with its topic's payloads in order."""
+    _record(tmp_path)
+    recording = Recording(tmp_path)
+    frames: list[bytes] = []
+    tags: list[bytes] = []
+
+    async def replay() -> Replayer:
+        replayer = Replayer(recording, speed=None)
+
+        async def on_frame(message: bytes) -> None:
+            frames.append(bytes(message))
+
+        async def on_tags(message: bytes) -> None:
+            tags.append(bytes(message))
+
+        await replayer.subscribe("camera/front", on_frame)
+        await replayer.subscribe("apriltag/tag", on_tags)
+        await replayer.run()
+        return replayer
+
+    try:
+        replayer = asyncio.run(replay())
+    finally:
+        recording.close()
+    assert frames == [
+        payload for _, topic, payload in RECORDS if topic == "camera/front"
+    ]
+    assert tags == [b"tags"]
+    assert replayer.replayed == len(RECORDS)
+
+
+def test_recorder_refuses_an_existing_recording(tmp_path: Path) -> None:
+    """A second recorder on the same directory does not overwrite it."""
+    _record(tmp_path)
+    with pytest.raises(FileExistsError):
+        Recorder(tmp_path)
+
+
+def test_windows_record_to_their_own_directories(tmp_path: Path) -> None:
+    """Several windows recording to one directory do not collide."""
+    recorders = [
+        Recorder(window_recording_directory(tmp_path, window_number))
+        for window_number in range(2)
+    ]
+    for window_number, recorder in enumerate(recorders):
+        recorder.record(f"topic/{window_number}", b"payload", 1.0)
+        recorder.close()
+
+    for window_number in range(2):
+        directory = find_window_recording(tmp_path, window_number)
+        assert directory == tmp_path / f"window-{window_number}"
+        recording = Recording(directory)
+        assert recording.read(0)[1] == f"topic/{window_number}"
+        recording.close()
+
+
+def test_single_recording_is_replayed_by_every_window(tmp_path: Path) -> None:
+    """A recording without per-window directories is shared by all windows."""
+    _record(tmp_path)
+    assert window_recording_directory(tmp_path, None) == tmp_path
+    assert find_window_recording(tmp_path, None) == tmp_path
+    assert find_window_recording(tmp_path, 3) == tmp_path
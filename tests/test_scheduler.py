@@ -0,0 +1,267 @@
+"""Tests for viz3.object_pipeline.scheduler."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, cast
+
+import pytest
+
+from viz3.object_pipeline import scheduler as scheduler_module
+from viz3.object_pipeline.pipeline import Pipeline
+from viz3.object_pipeline.scheduler import TickRate, TickScheduler
+
+if TYPE_CHECKING:
+    from _pytest.capture import CaptureFixture
+    from _pytest.fixtures import FixtureRequest
+    from _pytest.logging import LogCaptureFixture
+    from _pytest.monkeypatch import MonkeyPatch
+    from pytest_mock.plugin import MockerFixture
+
+    from viz3.render.world import World
+
+
+class _Clock:
+    """A perf_counter that only moves when a test advances it."""
+
+    def __init__(self) -> None:
+        """Start the clock at zero."""
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        """Get the current time.
+
+        Returns:
+            float: The time in seconds
+        """
+        return self.now
+
+
+class _Ticker(Pipeline):
+    """A pipeline that records when it was ticked."""
+
+    def __init__(self, name: str, ticks: list[tuple[str, float]], clock: _Clock):
+        """Initialize the pipeline.
+
+        Args:
+            name: The name recorded for each tick
+            ticks: The list every pipeline appends its ticks to
+            clock: The clock the ticks are timed with
+        """
+        self.name = name
+        self.ticks = ticks
+        self.clock = clock
+
+    def tick(self, world: World) -> None:
+        """Record the tick.
+
+        Args:
+            world: Unused
+        """
+        self.ticks.append((self.name, self.clock()))
+
+
+class _Sleeper(Pipeline):
+    """A pipeline whose tick blocks, counting how many run at once."""
+
+    def __init__(self, duration_s: float) -> None:
+        """Initialize the pipeline.
+
+        Args:
+            duration_s: How long every tick blocks
+        """
+        self.duration_s = duration_s
+        self.running = 0
+        self.max_running = 0
+        self.threads: set[str] = set()
+        self._lock = threading.Lock()
+
+    def tick(self, world: World) -> None:
+        """Block for the tick's duration.
+
+        Args:
+            world: Unused
+        """
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            self.threads.add(threading.current_thread().name)
+        time.sleep(self.duration_s)
+        with self._lock:
+            self.running -= 1
+
+
+class _Counter(Pipeline):
+    """A pipeline that records the time of each tick."""
+
+    def __init__(self) -> None:
+        """Initialize the pipeline with no ticks."""
+        self.times: list[float] = []
+
+    def tick(self, world: World) -> None:
+        """Record the tick.
+
+        Args:
+            world: Unused
+        """
+        self.times.append(time.perf_counter())
+
+
+@pytest.fixture
+def clock(monkeypatch: MonkeyPatch) -> _Clock:
+    """Make the scheduler use a clock the test controls.
+
+    Args:
+        monkeypatch: Used to replace the scheduler's time module
+
+    Returns:
+        _Clock: The clock, at zero
+    """
+    clock = _Clock()
+    monkeypatch.setattr(scheduler_module, "time", SimpleNamespace(perf_counter=clock))
+    return clock
+
+
+def _scheduler() -> TickScheduler:
+    """Create a scheduler that does not report.
+
+    Returns:
+        TickScheduler: The scheduler
+    """
+    return TickScheduler(cast("World", None), report_interval_s=None)
+
+
+def _run_for(scheduler: TickScheduler, seconds: float) -> None:
+    """Run a scheduler on a new event loop for a while.
+
+    Args:
+        scheduler: The scheduler
+        seconds: How long to run it
+    """
+
+    async def run() -> None:
+        try:
+            await asyncio.wait_for(scheduler.run(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    asyncio.run(run())
+
+
+def test_ticks_run_at_their_own_rate_in_deadline_order(clock: _Clock) -> None:
+    """Each pipeline is ticked at its rate, earliest deadline first."""
+    ticks: list[tuple[str, float]] = []
+    scheduler = _scheduler()
+    scheduler.add(_Ticker("fast", ticks, clock), 8)
+    scheduler.add(_Ticker("slow", ticks, clock), 2)
+
+    for step in range(15):
+        clock.now = step / 16
+        scheduler._run_due_ticks()
+
+    assert ticks == [
+        ("fast", 0.0),
+        ("slow", 0.0),
+        ("fast", 0.125),
+        ("fast", 0.25),
+        ("fast", 0.375),
+        # due at the same time; the slow tick was scheduled first
+        ("slow", 0.5),
+        ("fast", 0.5),
+        ("fast", 0.625),
+        ("fast", 0.75),
+        ("fast", 0.875),
+    ]
+    assert all(scheduled.stats.missed == 0 for scheduled in scheduler.scheduled)
+
+
+def test_ticks_that_fell_behind_are_skipped(clock: _Clock) -> None:
+    """A late tick runs once, and the deadlines it missed are skipped."""
+    ticks: list[tuple[str, float]] = []
+    scheduler = _scheduler()
+    scheduled = scheduler.add(_Ticker("ticker", ticks, clock), 10)
+    scheduler._run_due_ticks()
+
+    # the loop was blocked from 0 to 0.35 s, past the deadlines 0.1 to 0.3
+    clock.now = 0.35
+    scheduler._run_due_ticks()
+
+    assert [now for _, now in ticks] == [0.0, 0.35]
+    assert scheduled.stats.ticks == 2
+    assert scheduled.stats.missed == 2
+    assert scheduler._heap[0][0] == pytest.approx(0.4)
+
+
+def test_jitter_is_how_late_a_tick_started(clock: _Clock) -> None:
+    """The jitter of a tick is the time between its deadline and its start."""
+    ticks: list[tuple[str, float]] = []
+    scheduler = _scheduler()
+    scheduled = scheduler.add(_Ticker("ticker", ticks, clock), 10)
+    scheduler._run_due_ticks()
+
+    clock.now = 0.13
+    scheduler._run_due_ticks()
+
+    assert scheduled.stats.max_jitter_ms == pytest.approx(30)
+    assert scheduled.stats.mean_jitter_ms == pytest.approx(15)
+    assert scheduled.stats.overruns == 0
+
+
+def test_tick_rate_must_be_positive() -> None:
+    """A tick rate of zero is rejected when the pipeline is added."""
+    with pytest.raises(ValueError):
+        _scheduler().add(_Counter(), 0)
+
+
+def test_overrunning_tick_does_not_delay_other_ticks() -> None:
+    """A tick that takes longer than its period moves to a worker thread."""
+    slow = _Sleeper(0.1)
+    fast = _Counter()
+    scheduler = _scheduler()
+    slow_tick = scheduler.add(slow, 100)
+    scheduler.add(fast, 100)
+
+    _run_for(scheduler, 0.5)
+
+    assert slow_tick.off_loop
+    assert slow.max_running == 1
+    assert slow_tick.stats.missed > 0
+    # run serially, every fast tick would wait for a 100 ms slow tick
+    assert len(fast.times) > 20
+
+
+def test_slow_tick_runs_off_the_loop_from_the_start() -> None:
+    """Pipelines that set `slow_tick` never tick on the event loop."""
+    slow = _Sleeper(0.0)
+    slow.slow_tick = True
+    scheduler = _scheduler()
+    scheduled = scheduler.add(slow, 100)
+
+    _run_for(scheduler, 0.1)
+
+    assert scheduled.stats.ticks > 0
+    assert threading.main_thread().name not in slow.threads
+
+
+def test_frame_tick_is_skipped_while_the_previous_one_runs() -> None:
+    """A frame comes while the previous every-frame tick is still running."""
+    slow = _Sleeper(0.2)
+    slow.slow_tick = True
+    scheduler = _scheduler()
+    scheduled = scheduler.add(slow, TickRate.EVERY_FRAME)
+
+    async def run() -> None:
+        task = asyncio.create_task(scheduler.run())
+        await asyncio.sleep(0)
+        for _ in range(3):
+            scheduler.notify_frame()
+            await asyncio.sleep(0.02)
+        await asyncio.sleep(0.3)
+        task.cancel()
+
+    asyncio.run(run())
+    assert scheduled.stats.ticks == 1
+    assert scheduled.stats.missed == 2
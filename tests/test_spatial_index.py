@@ -0,0 +1,194 @@
+"""Tests for viz3.render.spatial_index."""
+
+from __future__ import annotations
+
+import math
+from typing import TYPE_CHECKING, Iterator
+
+import numpy as np
+import pytest
+
+from viz3.render.spatial_index import SpatialGrid
+
+if TYPE_CHECKING:
+    from _pytest.capture import CaptureFixture
+    from _pytest.fixtures import FixtureRequest
+    from _pytest.logging import LogCaptureFixture
+    from _pytest.monkeypatch import MonkeyPatch
+    from pytest_mock.plugin import MockerFixture
+
+
+@pytest.fixture
+def points() -> dict[str, np.ndarray]:
+    """Create random points around the origin, some in negative cells.
+
+    Returns:
+        dict: 500 positions by name
+    """
+    rng = np.random.default_rng(0)
+    return {
+        f"p{i}": position for i, position in enumerate(rng.uniform(-10, 10, (500, 3)))
+    }
+
+
+@pytest.fixture
+def grid(points: dict[str, np.ndarray]) -> SpatialGrid:
+    """Create a grid holding the random points.
+
+    Args:
+        points: The points to insert
+
+    Returns:
+        SpatialGrid: The grid, with cells of side 2
+    """
+    grid = SpatialGrid(cell_size=2.0)
+    for name, position in points.items():
+        grid.insert(name, position)
+    return grid
+
+
+@pytest.fixture
+def shells(monkeypatch: MonkeyPatch) -> Iterator[list[int]]:
+    """Record the shells of cells `nearest` visits.
+
+    Args:
+        monkeypatch: Used to wrap SpatialGrid._shell
+
+    Yields:
+        list[int]: The ring of every visited shell, in order
+    """
+    rings: list[int] = []
+    shell = SpatialGrid._shell
+
+    def record(center: tuple[int, int, int], ring: int) -> Iterator:
+        rings.append(ring)
+        return shell(center, ring)
+
+    monkeypatch.setattr(SpatialGrid, "_shell", staticmethod(record))
+    yield rings
+
+
+def _distances(points: dict[str, np.ndarray], point) -> list[tuple[str, float]]:
+    """Get the distance of every point to a point, closest first.
+
+    Args:
+        points: Positions by name
+        point: The (x, y, z) point
+
+    Returns:
+        list: (name, distance) pairs
+    """
+    distances = [
+        (name, float(np.linalg.norm(position - np.asarray(point))))
+        for name, position in points.items()
+    ]
+    return sorted(distances, key=lambda pair: pair[1])
+
+
+@pytest.mark.parametrize("radius", [0.0, 0.5, 3.0, 50.0])
+def test_query_radius_matches_a_scan(
+    grid: SpatialGrid, points: dict[str, np.ndarray], radius: float
+) -> None:
+    """query_radius finds exactly the points within the radius."""
+    center = (-1.5, 0.25, 3.0)
+    expected = {name for name, d in _distances(points, center) if d <= radius}
+    assert set(grid.query_radius(center, radius)) == expected
+
+
+@pytest.mark.parametrize(
+    "min_corner, max_corner",
+    [
+        ((-3, -3, -3), (3, 3, 3)),
+        ((-10.5, 0, -0.1), (-4, 10, 0.1)),
+        # larger than the occupied cells, so they are visited instead
+        ((-100, -100, -100), (100, 100, 100)),
+        ((20, 20, 20), (30, 30, 30)),
+    ],
+)
+def test_query_box_matches_a_scan(
+    grid: SpatialGrid,
+    points: dict[str, np.ndarray],
+    min_corner: tuple,
+    max_corner: tuple,
+) -> None:
+    """query_box finds exactly the points inside the box."""
+    low, high = np.asarray(min_corner), np.asarray(max_corner)
+    expected = {
+        name
+        for name, position in points.items()
+        if (low <= position).all() and (position <= high).all()
+    }
+    assert set(grid.query_box(min_corner, max_corner)) == expected
+
+
+@pytest.mark.parametrize("k", [1, 5, 600])
+@pytest.mark.parametrize("point", [(0, 0, 0), (9.9, -9.9, 3), (40, 40, 40)])
+def test_nearest_matches_a_scan(
+    grid: SpatialGrid, points: dict[str, np.ndarray], k: int, point: tuple
+) -> None:
+    """nearest finds the k closest points, closest first."""
+    expected = _distances(points, point)[:k]
+    found = grid.nearest(point, k)
+    assert [name for name, _ in found] == [name for name, _ in expected]
+    assert [d for _, d in found] == pytest.approx([d for _, d in expected])
+
+
+def test_nearest_respects_max_distance(
+    grid: SpatialGrid, points: dict[str, np.ndarray]
+) -> None:
+    """Points further away than max_distance are not returned."""
+    point = (0.5, 0.5, 0.5)
+    expected = [pair for pair in _distances(points, point) if pair[1] <= 1.5][:10]
+    found = grid.nearest(point, 10, max_distance=1.5)
+    assert [name for name, _ in found] == [name for name, _ in expected]
+
+
+def test_nearest_stops_once_the_closest_points_are_found(
+    grid: SpatialGrid, shells: list[int]
+) -> None:
+    """A query inside a dense region only searches the shells close to it."""
+    grid.nearest((0, 0, 0), 1)
+    # the closest point is found in the first shells, and the next one only
+    # rules out closer points, out of the 10 shells the points span
+    assert shells == [0, 1, 2]
+
+
+def test_nearest_stops_past_max_distance(grid: SpatialGrid, shells: list[int]) -> None:
+    """Shells beyond max_distance are not searched, even with nothing found."""
+    assert grid.nearest((500, 500, 500), 1, max_distance=3.0) == []
+    assert shells == [0, 1, 2]
+
+
+def test_nearest_far_from_every_point_scans_instead_of_growing_shells(
+    grid: SpatialGrid, points: dict[str, np.ndarray], shells: list[int]
+) -> None:
+    """Shells stop growing once they would be larger than the occupied cells."""
+    ((name, distance),) = grid.nearest((1000, 0, 0), 1)
+    assert (name, distance) == pytest.approx(_distances(points, (1000, 0, 0))[0])
+    # the shells would reach the points at ring 495; (2 * ring + 1) ** 3
+    # outgrows 8 times the 390 occupied cells at ring 7, which scans instead
+    assert len(grid._cells) == 390
+    assert shells == list(range(7))
+
+
+def test_nearest_in_an_empty_grid() -> None:
+    """An empty grid, or k of 0, finds nothing."""
+    grid = SpatialGrid()
+    assert grid.nearest((0, 0, 0), 3) == []
+    grid.insert("a", (1, 2, 3))
+    assert grid.nearest((0, 0, 0), 0) == []
+    assert grid.nearest((0, 0, 0), 3) == [("a", pytest.approx(math.sqrt(14)))]
+
+
+def test_moved_and_removed_points_leave_their_cells() -> None:
+    """Moving a point to another cell or removing it updates the queries."""
+    grid = SpatialGrid(cell_size=1.0)
+    grid.insert("a", (0.5, 0.5, 0.5))
+    grid.insert("a", (5.5, 0.5, 0.5))
+    assert grid.query_box((0, 0, 0), (1, 1, 1)) == []
+    assert grid.query_radius((5.5, 0.5, 0.5), 0.1) == ["a"]
+
+    grid.remove("a")
+    grid.remove("unknown")
+    assert len(grid) == 0
+    assert grid._cells == {}
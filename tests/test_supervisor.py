@@ -0,0 +1,220 @@
+"""Tests for viz3.supervisor."""
+
+from __future__ import annotations
+
+import os
+import re
+from types import SimpleNamespace
+from typing import TYPE_CHECKING
+
+import pytest
+
+from viz3 import supervisor as supervisor_module
+from viz3.supervisor import WindowSupervisor
+
+if TYPE_CHECKING:
+    from _pytest.capture import CaptureFixture
+    from _pytest.fixtures import FixtureRequest
+    from _pytest.logging import LogCaptureFixture
+    from _pytest.monkeypatch import MonkeyPatch
+    from pytest_mock.plugin import MockerFixture
+
+
+class _Clock:
+    """A monotonic clock that only moves when the supervisor sleeps."""
+
+    def __init__(self) -> None:
+        """Start the clock at zero."""
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        """Get the current time.
+
+        Returns:
+            float: The time in seconds
+        """
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        """Advance the clock instead of sleeping.
+
+        Args:
+            seconds: How far to advance it
+        """
+        self.now += seconds
+
+
+class _FakeProcess:
+    """A window process that exits with a code after running for a while."""
+
+    def __init__(self, pid: int, clock: _Clock, run_s: float, exit_code: int):
+        """Initialize the process.
+
+        Args:
+            pid: The process ID
+            clock: The clock the process runs on
+            run_s: How long the process runs before it exits
+            exit_code: The code it exits with
+        """
+        self.pid = pid
+        self.clock = clock
+        self.exit_at = clock() + run_s
+        self.exit_code = exit_code
+
+    def poll(self) -> int | None:
+        """Check whether the process exited.
+
+        Returns:
+            int | None: The exit code, or None while it runs
+        """
+        return self.exit_code if self.clock() >= self.exit_at else None
+
+    def terminate(self) -> None:
+        """Exit now."""
+        self.exit_at = self.clock()
+
+    def wait(self) -> int:
+        """Wait for the process to exit.
+
+        Returns:
+            int: The exit code
+        """
+        return self.exit_code
+
+
+class _FakeStarter:
+    """A `start_window` whose processes follow a script of runs."""
+
+    def __init__(self, clock: _Clock, runs: list[tuple[float, int]]) -> None:
+        """Initialize the starter.
+
+        Args:
+            clock: The clock the processes run on
+            runs: How long each started process runs and its exit code
+        """
+        self.clock = clock
+        self.runs = list(runs)
+        self.start_times: list[float] = []
+
+    def __call__(self, index: int, telemetry_fd: int | None) -> _FakeProcess:
+        """Start the next process of the script.
+
+        Args:
+            index: The window's index
+            telemetry_fd: Unused; telemetry is disabled
+
+        Returns:
+            _FakeProcess: The process
+        """
+        self.start_times.append(self.clock())
+        run_s, exit_code = self.runs.pop(0)
+        return _FakeProcess(len(self.start_times), self.clock, run_s, exit_code)
+
+
+@pytest.fixture
+def clock(monkeypatch: MonkeyPatch) -> _Clock:
+    """Make the supervisor use a clock the test controls.
+
+    Without exit sentinels the supervisor polls the processes, sleeping on the
+    clock in between, so a supervised run takes no real time.
+
+    Args:
+        monkeypatch: Used to replace the supervisor's time module
+
+    Returns:
+        _Clock: The clock, at zero
+    """
+    clock = _Clock()
+    monkeypatch.setattr(
+        supervisor_module,
+        "time",
+        SimpleNamespace(monotonic=clock, sleep=clock.sleep, time=clock),
+    )
+    monkeypatch.delattr(os, "pidfd_open", raising=False)
+    return clock
+
+
+def _supervise(
+    clock: _Clock, runs: list[tuple[float, int]], **kwargs: float
+) -> tuple[WindowSupervisor, _FakeStarter]:
+    """Supervise one window until it closes or is given up on.
+
+    Args:
+        clock: The supervisor's clock
+        runs: How long each started process runs and its exit code
+        **kwargs: Passed to WindowSupervisor
+
+    Returns:
+        tuple: The supervisor and the starter, with the start times
+    """
+    starter = _FakeStarter(clock, runs)
+    supervisor = WindowSupervisor(starter, 1, telemetry_interval_s=0, **kwargs)
+    supervisor.run()
+    return supervisor, starter
+
+
+def _restart_delays(capsys: CaptureFixture) -> list[float]:
+    """Get the restart delays the supervisor printed.
+
+    Args:
+        capsys: Captures the supervisor's output
+
+    Returns:
+        list[float]: The delays, in seconds
+    """
+    output = capsys.readouterr().out
+    return [float(delay) for delay in re.findall(r"restarting in ([\d.]+) s", output)]
+
+
+def test_backoff_doubles_up_to_the_limit(clock: _Clock, capsys: CaptureFixture) -> None:
+    """Every crash in a row doubles the delay, until it reaches the limit."""
+    supervisor, starter = _supervise(
+        clock, [(0.1, 1)] * 5 + [(0.1, 0)], backoff_s=1.0, max_backoff_s=4.0
+    )
+
+    assert _restart_delays(capsys) == [1.0, 2.0, 4.0, 4.0, 4.0]
+    # each crash is seen at the next poll, half a second after the start
+    gaps = [b - a for a, b in zip(starter.start_times, starter.start_times[1:])]
+    assert gaps == pytest.approx([1.5, 2.5, 4.5, 4.5, 4.5])
+    assert supervisor.windows[0].restarts == 5
+    assert supervisor.windows[0].state == "closed"
+
+
+def test_failures_reset_after_a_healthy_run(
+    clock: _Clock, capsys: CaptureFixture
+) -> None:
+    """A crash after the window ran for a while counts as a first crash."""
+    supervisor, _ = _supervise(
+        clock,
+        [(0.1, 1), (0.1, 1), (40.0, 1), (0.1, 1), (0.1, 0)],
+        backoff_s=1.0,
+        healthy_after_s=30.0,
+    )
+
+    assert _restart_delays(capsys) == [1.0, 2.0, 1.0, 2.0]
+    assert supervisor.windows[0].failures == 2
+    assert supervisor.windows[0].state == "closed"
+
+
+def test_window_is_given_up_on_after_max_restarts(
+    clock: _Clock, capsys: CaptureFixture
+) -> None:
+    """A window that keeps crashing stops being restarted."""
+    supervisor, starter = _supervise(clock, [(0.1, 1)] * 3, max_restarts=2)
+
+    output = capsys.readouterr().out
+    assert "giving up after 2 restarts in a row" in output
+    assert len(starter.start_times) == 3
+    assert supervisor.windows[0].restarts == 2
+    assert supervisor.windows[0].state == "failed"
+
+
+def test_window_closed_by_the_user_is_not_restarted(
+    clock: _Clock, capsys: CaptureFixture
+) -> None:
+    """A window that exits with code 0 stays closed."""
+    supervisor, starter = _supervise(clock, [(5.0, 0)])
+
+    assert "Window 1 closed" in capsys.readouterr().out
+    assert len(starter.start_times) == 1
+    assert supervisor.windows[0].restart_at is None
@@ -0,0 +1,32 @@
+"""Tests for viz3.viz3."""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from _pytest.capture import CaptureFixture
+    from _pytest.fixtures import FixtureRequest
+    from _pytest.logging import LogCaptureFixture
+    from _pytest.monkeypatch import MonkeyPatch
+    from pytest_mock.plugin import MockerFixture
+
+
+def test_import_does_not_import_ursina() -> None:
+    """Ursina and Panda3D are only imported when a window is set up."""
+    code = (
+        "import sys, viz3.viz3;"
+        " print(sorted({m.split('.')[0] for m in sys.modules}"
+        " & {'ursina', 'panda3d', 'direct'}))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+        check=True,
+    )
+    assert result.stdout.strip() == "[]"
@@ -0,0 +1,240 @@
+"""Tests for viz3.render.world."""
+
+from __future__ import annotations
+
+import time
+from types import SimpleNamespace
+from typing import TYPE_CHECKING
+
+import pytest
+from ursina import Entity, scene
+
+from viz3.render import world as world_module
+from viz3.render.entity_pool import EntityPool
+from viz3.render.world import World
+
+if TYPE_CHECKING:
+    from _pytest.capture import CaptureFixture
+    from _pytest.fixtures import FixtureRequest
+    from _pytest.logging import LogCaptureFixture
+    from _pytest.monkeypatch import MonkeyPatch
+    from pytest_mock.plugin import MockerFixture
+
+
+def test_clear_objects_destroys_entities(app: object) -> None:
+    """Cleared objects are removed from the scene, not only from the world."""
+    world = World(add_base_objects=False)
+    entities = [Entity(), Entity()]
+    for i, entity in enumerate(entities):
+        world.add_object(f"object_{i}", entity)
+
+    world.clear_objects()
+
+    assert not world.objects
+    assert not any(entity in scene.entities for entity in entities)
+
+
+def test_add_object_replaces_an_object_with_the_same_name(app: object) -> None:
+    """Adding a name twice destroys the first entity instead of leaking it."""
+    world = World(add_base_objects=False)
+    first, second = Entity(), Entity()
+    world.add_object("duplicate", first)
+    world.add_object("duplicate", second)
+
+    assert world.get_object("duplicate").get_entity() is second
+    assert first not in scene.entities
+    world.clear_objects()
+
+
+def test_add_object_releases_a_pooled_entity_with_the_same_name(app: object) -> None:
+    """A replaced pooled entity goes back to its pool."""
+    world = World(add_base_objects=False)
+    pool = EntityPool(Entity, reset=lambda entity, **kwargs: None)
+    world.set_pool(pool)
+    first = world.add_pooled_object("duplicate", Entity)
+    world.add_pooled_object("duplicate", Entity)
+
+    assert len(pool) == 1
+    assert not first.enabled
+    world.clear_objects()
+    pool.clear()
+
+
+def test_duplicate_queued_adds_create_one_entity(app: object) -> None:
+    """Adds of the same name queued before they are applied are merged."""
+    world = World(add_base_objects=False)
+    created = []
+
+    def create() -> Entity:
+        entity = Entity()
+        created.append(entity)
+        return entity
+
+    world.queue_add_object("duplicate", create)
+    world.queue_add_object("duplicate", create)
+    assert world.pending_command_count() == 1
+    world.process_commands()
+
+    assert len(created) == 1
+    assert world.get_object("duplicate").get_entity() is created[0]
+    world.clear_objects()
+
+
+def test_add_queued_after_a_removal_is_not_merged(app: object) -> None:
+    """Add, remove and add again of one name are applied in order."""
+    world = World(add_base_objects=False)
+    world.queue_add_object("name", Entity)
+    world.queue_remove_object("name")
+    world.queue_add_object("name", Entity)
+    while world.pending_command_count():
+        world.process_commands()
+
+    assert world.contains_object("name")
+    world.clear_objects()
+
+
+def test_bounding_radius_is_recomputed_only_when_the_object_changes(
+    app: object, monkeypatch: MonkeyPatch
+) -> None:
+    """Updates that only move an object reuse its cached bounding radius."""
+    world = World(add_base_objects=False)
+    computed: list[float] = []
+    bounding_radius = World._bounding_radius
+
+    def count(children_bounds: list, scale: object) -> float:
+        radius = bounding_radius(children_bounds, scale)
+        computed.append(radius)
+        return radius
+
+    monkeypatch.setattr(World, "_bounding_radius", staticmethod(count))
+    try:
+        entity = Entity(model="sphere", scale=2)
+        model_radius = entity.model.get_bounds().get_radius()
+        world.add_object("sphere", entity)
+        assert world.spatial_index.radii["sphere"] == pytest.approx(2 * model_radius)
+
+        world.queue_update_object("sphere", lambda e: setattr(e, "x", 5))
+        world.process_commands()
+        assert world.spatial_index.positions["sphere"][0] == pytest.approx(5)
+        assert len(computed) == 1
+
+        world.queue_update_object("sphere", lambda e: setattr(e, "scale", 4))
+        world.process_commands()
+        assert len(computed) == 2
+        assert world.spatial_index.radii["sphere"] == pytest.approx(4 * model_radius)
+
+        world.queue_update_object("sphere", lambda e: setattr(e, "model", "cube"))
+        world.process_commands()
+        assert len(computed) == 3
+    finally:
+        world.clear_objects()
+    assert not world._bounding_radii
+
+
+class _Clock:
+    """A time.time that only moves when a test advances it."""
+
+    def __init__(self) -> None:
+        """Start the clock at 1000 s."""
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        """Get the current time.
+
+        Returns:
+            float: The timestamp in seconds
+        """
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: MonkeyPatch) -> _Clock:
+    """Make the world use a clock the test controls.
+
+    Args:
+        monkeypatch: Used to replace the world's time module
+
+    Returns:
+        _Clock: The clock
+    """
+    clock = _Clock()
+    monkeypatch.setattr(
+        world_module,
+        "time",
+        SimpleNamespace(time=clock, perf_counter=time.perf_counter),
+    )
+    return clock
+
+
+def test_objects_expire_in_deadline_order(app: object, clock: _Clock) -> None:
+    """Objects are removed once their TTL runs out, and not before."""
+    world = World(add_base_objects=False)
+    entities = {name: Entity() for name in ("short", "long", "forever")}
+    world.add_object("long", entities["long"], ttl=5)
+    world.add_object("short", entities["short"], ttl=1)
+    world.add_object("forever", entities["forever"])
+    try:
+        # objects without a TTL never enter the heap
+        assert len(world._expiry_heap) == 2
+        assert world.expire_objects(now=1000.5) == []
+
+        assert world.expire_objects(now=1001) == ["short"]
+        assert entities["short"] not in scene.entities
+        assert world.expire_objects(now=1004) == []
+
+        clock.now = 1010
+        assert world.expire_objects() == ["long"]
+        assert list(world.objects) == ["forever"]
+        assert world._expiry_heap == []
+    finally:
+        world.clear_objects()
+
+
+def test_touch_postpones_expiry(app: object, clock: _Clock) -> None:
+    """A touched object gets a new deadline instead of expiring."""
+    world = World(add_base_objects=False)
+    world.add_object("touched", Entity(), ttl=2)
+    try:
+        clock.now = 1001.5
+        world.touch_object("touched")
+        world.touch_object("unknown")
+
+        # the stale entry is pushed back with the new deadline
+        assert world.expire_objects(now=1002) == []
+        assert [entry[0] for entry in world._expiry_heap] == [1003.5]
+        assert world.expire_objects(now=1003.5) == ["touched"]
+    finally:
+        world.clear_objects()
+
+
+def test_applied_update_touches_the_object(app: object, clock: _Clock) -> None:
+    """Updating an object through the command queue keeps it alive."""
+    world = World(add_base_objects=False)
+    world.add_object("updated", Entity(), ttl=2)
+    try:
+        clock.now = 1001.5
+        world.queue_update_object("updated", lambda entity: setattr(entity, "x", 1))
+        world.process_commands()
+
+        assert world.get_object("updated").get_deadline() == 1003.5
+        assert world.expire_objects(now=1002) == []
+        assert "updated" in world.objects
+    finally:
+        world.clear_objects()
+
+
+def test_replaced_object_leaves_only_the_new_deadline(
+    app: object, clock: _Clock
+) -> None:
+    """The heap entry of a replaced object does not expire its replacement."""
+    world = World(add_base_objects=False)
+    world.add_object("replaced", Entity(), ttl=1)
+    clock.now = 1000.5
+    replacement = Entity()
+    world.add_object("replaced", replacement, ttl=1)
+    try:
+        assert world.expire_objects(now=1001) == []
+        assert world.get_object("replaced").get_entity() is replacement
+        assert world.expire_objects(now=1001.5) == ["replaced"]
+    finally:
+        world.clear_objects()